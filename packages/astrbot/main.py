@@ -267,6 +267,11 @@ class Main(star.Star):
         if plugin is None:
             event.set_result(MessageEventResult().message("未找到此插件。"))
             return
+        if self.context._star_manager and plugin.star_cls is None:
+            # 延迟载入的插件需要先载入, 才能列出它的指令
+            star_mgr: PluginManager = self.context._star_manager
+            await star_mgr.load_lazy_plugin(plugin.module_path)
+            plugin = self.context.get_registered_star(plugin_name) or plugin
         help_msg = ""
         help_msg += f"\n\n✨ 作者: {plugin.author}\n✨ 版本: {plugin.version}"
         command_handlers = []
@@ -24,8 +24,13 @@ def _prepare_config(config: dict) -> dict:
     """准备配置，处理嵌套格式"""
     if "mcpServers" in config and config["mcpServers"]:
         first_key = next(iter(config["mcpServers"]))
-        config = config["mcpServers"][first_key]
+        # 复制一份, 避免修改调用方的配置
+        config = dict(config["mcpServers"][first_key])
     config.pop("active", None)
+    # AstrBot 自己的缓存配置, 不属于 MCP 服务的连接参数
+    config.pop("cache_ttl", None)
+    config.pop("cache_scope", None)
+    config.pop("cache_tools", None)
     return config
 
 
@@ -1,8 +1,10 @@
+import asyncio
 import sys
 import traceback
 import typing as T
 from .base import BaseAgentRunner, AgentResponse, AgentState
 from ..hooks import BaseAgentRunHooks
+from ..tool import FunctionTool
 from ..tool_executor import BaseFunctionToolExecutor
 from ..run_context import ContextWrapper, TContext
 from ..response import AgentResponseData
@@ -26,6 +28,7 @@ from mcp.types import (
     CallToolResult,
 )
 from astrbot import logger
+from astrbot.core.utils.tracing import tracer, trace_async_gen
 
 if sys.version_info >= (3, 12):
     from typing import override
@@ -52,6 +55,10 @@ class ToolLoopAgentRunner(BaseAgentRunner[TContext]):
         self.tool_executor = tool_executor
         self.agent_hooks = agent_hooks
         self.run_context = run_context
+        self.tool_call_concurrency = max(1, kwargs.get("tool_call_concurrency", 1))
+        """同一轮中同时执行的工具调用数量上限"""
+        self.tool_call_timeout = kwargs.get("tool_call_timeout", 0)
+        """工具调用的默认超时时间(秒), 0 表示不限制"""
 
     def _transition_state(self, new_state: AgentState) -> None:
         """转换 Agent 状态"""
@@ -61,12 +68,18 @@ class ToolLoopAgentRunner(BaseAgentRunner[TContext]):
 
     async def _iter_llm_responses(self) -> T.AsyncGenerator[LLMResponse, None]:
         """Yields chunks *and* a final LLMResponse."""
+        provider_id = self.provider.meta().id
+        session_id = self.req.session_id or ""
         if self.streaming:
             stream = self.provider.text_chat_stream(**self.req.__dict__)
-            async for resp in stream:
+            async for resp in trace_async_gen(
+                stream, "provider_stream", provider_id, session_id
+            ):
                 yield resp
         else:
-            yield await self.provider.text_chat(**self.req.__dict__)
+            with tracer.span("provider", provider_id, session_id):
+                resp = await self.provider.text_chat(**self.req.__dict__)
+            yield resp
 
     @override
     async def step(self):
@@ -182,48 +195,183 @@ class ToolLoopAgentRunner(BaseAgentRunner[TContext]):
         req: ProviderRequest,
         llm_response: LLMResponse,
     ) -> T.AsyncGenerator[MessageChain | list[ToolCallMessageSegment], None]:
-        """处理函数工具调用。"""
-        tool_call_result_blocks: list[ToolCallMessageSegment] = []
+        """处理函数工具调用。
+
+        同一轮中声明为可并发(parallel=True)的连续工具调用会并发执行, 并发数量不超过 tool_call_concurrency。
+        其余工具(本地工具默认如此)会等待之前的工具执行完成后单独执行。
+        工具的输出按照完成顺序发送, 返回给模型的结果按照 tool_call_id 的原始顺序排列。
+        """
         logger.info(f"Agent 使用工具: {llm_response.tools_call_name}")
+        if not req.func_tool:
+            return
 
-        # 执行函数调用
-        for func_tool_name, func_tool_args, func_tool_id in zip(
-            llm_response.tools_call_name,
-            llm_response.tools_call_args,
-            llm_response.tools_call_ids,
-        ):
-            try:
-                if not req.func_tool:
-                    return
-                func_tool = req.func_tool.get_func(func_tool_name)
-                logger.info(f"使用工具：{func_tool_name}，参数：{func_tool_args}")
+        tool_calls = list(
+            zip(
+                llm_response.tools_call_name,
+                llm_response.tools_call_args,
+                llm_response.tools_call_ids,
+            )
+        )
+        results: list[list[ToolCallMessageSegment]] = [[] for _ in tool_calls]
+        semaphore = asyncio.Semaphore(self.tool_call_concurrency)
+        queue: asyncio.Queue[MessageChain | object] = asyncio.Queue()
+        batch_done = object()
 
+        async def run_tool(index: int):
+            func_tool_name, func_tool_args, func_tool_id = tool_calls[index]
+            func_tool = req.func_tool.get_func(func_tool_name)
+            timeout = (func_tool and func_tool.timeout) or self.tool_call_timeout
+            async with semaphore:
                 try:
-                    await self.agent_hooks.on_tool_start(
-                        self.run_context, func_tool, func_tool_args
+                    await asyncio.wait_for(
+                        self._drain_function_tool(
+                            req,
+                            func_tool_name,
+                            func_tool,
+                            func_tool_args,
+                            func_tool_id,
+                            results[index],
+                            queue,
+                        ),
+                        timeout or None,
                     )
-                except Exception as e:
-                    logger.error(f"Error in on_tool_start hook: {e}", exc_info=True)
+                except asyncio.TimeoutError:
+                    logger.warning(f"工具 {func_tool_name} 调用超时({timeout}s)。")
+                    if not results[index]:
+                        results[index].append(
+                            ToolCallMessageSegment(
+                                role="tool",
+                                tool_call_id=func_tool_id,
+                                content=f"error: tool call timed out after {timeout}s",
+                            )
+                        )
+
+        async def run_batch(batch: list[int]):
+            try:
+                await asyncio.gather(*(run_tool(i) for i in batch))
+            finally:
+                await queue.put(batch_done)
+
+        for batch in self._plan_tool_batches(req, tool_calls):
+            task = asyncio.create_task(run_batch(batch))
+            try:
+                while (item := await queue.get()) is not batch_done:
+                    yield item
+                await task
+            finally:
+                if not task.done():
+                    task.cancel()
+            # 每个不可并发的工具单独成批, 执行完成后清空事件结果, 避免工具设置的结果被后续工具当作自己的结果发送
+            self.run_context.event.clear_result()
+
+        # 处理函数调用响应
+        tool_call_result_blocks = [block for blocks in results for block in blocks]
+        if tool_call_result_blocks:
+            yield tool_call_result_blocks
+
+    def _plan_tool_batches(
+        self, req: ProviderRequest, tool_calls: list[tuple]
+    ) -> list[list[int]]:
+        """将工具调用分批: 连续的可并发工具为一批, 不可并发的工具单独为一批"""
+        if self.tool_call_concurrency <= 1:
+            return [[i] for i in range(len(tool_calls))]
+        batches: list[list[int]] = []
+        current: list[int] = []
+        for i, (func_tool_name, _, _) in enumerate(tool_calls):
+            func_tool = req.func_tool.get_func(func_tool_name)
+            if func_tool is None or func_tool.parallel:
+                current.append(i)
+                continue
+            if current:
+                batches.append(current)
+                current = []
+            batches.append([i])
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _drain_function_tool(
+        self,
+        req: ProviderRequest,
+        func_tool_name: str,
+        func_tool: FunctionTool | None,
+        func_tool_args: dict,
+        func_tool_id: str,
+        blocks: list[ToolCallMessageSegment],
+        queue: asyncio.Queue,
+    ):
+        """执行一个工具调用, 将返回给模型的结果写入 blocks, 发送给用户的消息写入 queue"""
+        async for result in self._call_function_tool(
+            req, func_tool_name, func_tool, func_tool_args, func_tool_id, blocks
+        ):
+            await queue.put(result)
 
-                executor = self.tool_executor.execute(
-                    tool=func_tool,
-                    run_context=self.run_context,
-                    **func_tool_args,
+    async def _call_function_tool(
+        self,
+        req: ProviderRequest,
+        func_tool_name: str,
+        func_tool: FunctionTool | None,
+        func_tool_args: dict,
+        func_tool_id: str,
+        blocks: list[ToolCallMessageSegment],
+    ) -> T.AsyncGenerator[MessageChain, None]:
+        try:
+            logger.info(f"使用工具：{func_tool_name}，参数：{func_tool_args}")
+
+            try:
+                await self.agent_hooks.on_tool_start(
+                    self.run_context, func_tool, func_tool_args
                 )
-                async for resp in executor:
-                    if isinstance(resp, CallToolResult):
-                        res = resp
-                        if isinstance(res.content[0], TextContent):
-                            tool_call_result_blocks.append(
+            except Exception as e:
+                logger.error(f"Error in on_tool_start hook: {e}", exc_info=True)
+
+            executor = self.tool_executor.execute(
+                tool=func_tool,
+                run_context=self.run_context,
+                **func_tool_args,
+            )
+            async for resp in trace_async_gen(
+                executor, "tool", func_tool_name, req.session_id or ""
+            ):
+                if isinstance(resp, CallToolResult):
+                    res = resp
+                    if isinstance(res.content[0], TextContent):
+                        blocks.append(
+                            ToolCallMessageSegment(
+                                role="tool",
+                                tool_call_id=func_tool_id,
+                                content=res.content[0].text,
+                            )
+                        )
+                        yield MessageChain().message(res.content[0].text)
+                    elif isinstance(res.content[0], ImageContent):
+                        blocks.append(
+                            ToolCallMessageSegment(
+                                role="tool",
+                                tool_call_id=func_tool_id,
+                                content="返回了图片(已直接发送给用户)",
+                            )
+                        )
+                        yield MessageChain(type="tool_direct_result").base64_image(
+                            res.content[0].data
+                        )
+                    elif isinstance(res.content[0], EmbeddedResource):
+                        resource = res.content[0].resource
+                        if isinstance(resource, TextResourceContents):
+                            blocks.append(
                                 ToolCallMessageSegment(
                                     role="tool",
                                     tool_call_id=func_tool_id,
-                                    content=res.content[0].text,
+                                    content=resource.text,
                                 )
                             )
-                            yield MessageChain().message(res.content[0].text)
-                        elif isinstance(res.content[0], ImageContent):
-                            tool_call_result_blocks.append(
+                            yield MessageChain().message(resource.text)
+                        elif (
+                            isinstance(resource, BlobResourceContents)
+                            and resource.mimeType
+                            and resource.mimeType.startswith("image/")
+                        ):
+                            blocks.append(
                                 ToolCallMessageSegment(
                                     role="tool",
                                     tool_call_id=func_tool_id,
@@ -231,79 +379,47 @@ class ToolLoopAgentRunner(BaseAgentRunner[TContext]):
                                 )
                             )
                             yield MessageChain(type="tool_direct_result").base64_image(
-                                res.content[0].data
+                                resource.blob
                             )
-                        elif isinstance(res.content[0], EmbeddedResource):
-                            resource = res.content[0].resource
-                            if isinstance(resource, TextResourceContents):
-                                tool_call_result_blocks.append(
-                                    ToolCallMessageSegment(
-                                        role="tool",
-                                        tool_call_id=func_tool_id,
-                                        content=resource.text,
-                                    )
-                                )
-                                yield MessageChain().message(resource.text)
-                            elif (
-                                isinstance(resource, BlobResourceContents)
-                                and resource.mimeType
-                                and resource.mimeType.startswith("image/")
-                            ):
-                                tool_call_result_blocks.append(
-                                    ToolCallMessageSegment(
-                                        role="tool",
-                                        tool_call_id=func_tool_id,
-                                        content="返回了图片(已直接发送给用户)",
-                                    )
-                                )
-                                yield MessageChain(
-                                    type="tool_direct_result"
-                                ).base64_image(resource.blob)
-                            else:
-                                tool_call_result_blocks.append(
-                                    ToolCallMessageSegment(
-                                        role="tool",
-                                        tool_call_id=func_tool_id,
-                                        content="返回的数据类型不受支持",
-                                    )
-                                )
-                                yield MessageChain().message("返回的数据类型不受支持。")
-
-                    elif resp is None:
-                        # Tool 直接请求发送消息给用户
-                        # 这里我们将直接结束 Agent Loop。
-                        self._transition_state(AgentState.DONE)
-                        if res := self.run_context.event.get_result():
-                            if res.chain:
-                                yield MessageChain(
-                                    chain=res.chain, type="tool_direct_result"
+                        else:
+                            blocks.append(
+                                ToolCallMessageSegment(
+                                    role="tool",
+                                    tool_call_id=func_tool_id,
+                                    content="返回的数据类型不受支持",
                                 )
-                    else:
-                        logger.warning(
-                            f"Tool 返回了不支持的类型: {type(resp)}，将忽略。"
-                        )
+                            )
+                            yield MessageChain().message("返回的数据类型不受支持。")
 
-                try:
-                    await self.agent_hooks.on_tool_end(
-                        self.run_context, func_tool, func_tool_args, None
-                    )
-                except Exception as e:
-                    logger.error(f"Error in on_tool_end hook: {e}", exc_info=True)
+                elif resp is None:
+                    # Tool 直接请求发送消息给用户
+                    # 这里我们将直接结束 Agent Loop。
+                    self._transition_state(AgentState.DONE)
+                    # 其他工具可能在并发执行, 立即取出并清空事件结果, 避免不同工具的结果相互覆盖
+                    if res := self.run_context.event.get_result():
+                        self.run_context.event.clear_result()
+                        if res.chain:
+                            yield MessageChain(
+                                chain=res.chain, type="tool_direct_result"
+                            )
+                else:
+                    logger.warning(f"Tool 返回了不支持的类型: {type(resp)}，将忽略。")
 
-                self.run_context.event.clear_result()
+            try:
+                await self.agent_hooks.on_tool_end(
+                    self.run_context, func_tool, func_tool_args, None
+                )
             except Exception as e:
-                logger.warning(traceback.format_exc())
-                tool_call_result_blocks.append(
-                    ToolCallMessageSegment(
-                        role="tool",
-                        tool_call_id=func_tool_id,
-                        content=f"error: {str(e)}",
-                    )
+                logger.error(f"Error in on_tool_end hook: {e}", exc_info=True)
+        except Exception as e:
+            logger.warning(traceback.format_exc())
+            blocks.append(
+                ToolCallMessageSegment(
+                    role="tool",
+                    tool_call_id=func_tool_id,
+                    content=f"error: {str(e)}",
                 )
-
-        # 处理函数调用响应
-        if tool_call_result_blocks:
-            yield tool_call_result_blocks
+            )
 
     def done(self) -> bool:
         """检查 Agent 是否已完成工作"""
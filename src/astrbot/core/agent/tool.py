@@ -20,6 +20,17 @@ class FunctionTool:
     """
     active: bool = True
     """是否激活"""
+    parallel: bool = False
+    """是否可以与同一轮的其他工具调用并发执行。
+
+    本地工具共享同一个事件对象(例如通过 set_result 直接回复), 默认不并发, 只读、互不影响的工具可以声明为 True。MCP 工具默认并发。
+    """
+    timeout: float | None = None
+    """调用超时时间(秒), 为空时使用全局配置"""
+    cache_ttl: float = 0
+    """结果缓存时间(秒), 0 表示不缓存。只应该为只读、结果只与参数有关的工具开启"""
+    cache_scope: Literal["global", "session"] = "global"
+    """缓存范围, global 为所有会话共享, session 为每个会话单独缓存"""
 
     origin: Literal["local", "mcp"] = "local"
     """函数工具的来源, local 为本地函数工具, mcp 为 MCP 服务"""
@@ -42,6 +53,8 @@ class FunctionTool:
             "active": self.active,
             "origin": self.origin,
             "mcp_server_name": self.mcp_server_name,
+            "cache_ttl": self.cache_ttl,
+            "cache_scope": self.cache_scope,
         }
 
 
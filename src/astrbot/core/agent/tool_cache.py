@@ -0,0 +1,97 @@
+"""
+函数工具结果缓存
+
+只读、结果只与参数有关的工具(如查询天气、搜索)可以声明缓存时间。在缓存时间内, 相同工具、相同参数的调用直接返回上一次的结果,
+不再执行工具。参数会先规范化(按键排序后序列化), 键的顺序不同的参数视为相同。
+缓存范围为 session 时, 不同会话之间不共享结果。
+"""
+
+import json
+import time
+import typing as T
+from collections import OrderedDict
+from dataclasses import dataclass
+from mcp.types import CallToolResult
+
+
+@dataclass
+class ToolCacheCounter:
+    hits: int = 0
+    misses: int = 0
+
+
+@dataclass
+class _CacheEntry:
+    results: list[CallToolResult]
+    expire_at: float
+
+
+class ToolResultCache:
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._counters: dict[str, ToolCacheCounter] = {}
+
+    @staticmethod
+    def make_key(tool_name: str, tool_args: dict, scope: str | None = None) -> str:
+        """根据工具名、规范化后的参数与会话范围生成缓存键"""
+        args = json.dumps(
+            tool_args,
+            ensure_ascii=False,
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return f"{scope or ''}\x00{tool_name}\x00{args}"
+
+    def counter(self, tool_name: str) -> ToolCacheCounter:
+        if tool_name not in self._counters:
+            self._counters[tool_name] = ToolCacheCounter()
+        return self._counters[tool_name]
+
+    def get(self, tool_name: str, key: str) -> list[CallToolResult] | None:
+        counter = self.counter(tool_name)
+        entry = self._entries.get(key)
+        if entry is None or entry.expire_at < time.monotonic():
+            if entry is not None:
+                self._entries.pop(key, None)
+            counter.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        counter.hits += 1
+        return entry.results
+
+    def set(self, key: str, results: list[CallToolResult], ttl: float):
+        if ttl <= 0:
+            return
+        self._entries[key] = _CacheEntry(results, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self, tool_name: str | None = None):
+        """清空缓存。指定工具名时只清空这个工具的缓存"""
+        if tool_name is None:
+            self._entries.clear()
+            return
+        marker = f"\x00{tool_name}\x00"
+        for key in [k for k in self._entries if marker in k]:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict[str, T.Any]:
+        hits = sum(c.hits for c in self._counters.values())
+        misses = sum(c.misses for c in self._counters.values())
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "tools": {
+                name: {"hits": c.hits, "misses": c.misses}
+                for name, c in self._counters.items()
+            },
+        }
+
+
+tool_result_cache = ToolResultCache()
@@ -45,6 +45,14 @@ DEFAULT_CONFIG = {
         "friend_message_needs_wake_prefix": False,
         "ignore_bot_self_message": False,
         "ignore_at_all": False,
+        "event_dispatch": {
+            "max_in_flight": 0,
+            "queue_size": 1000,
+            "overflow_policy": "drop_oldest",  # drop_oldest, coalesce, reject
+            "reject_notice": "当前消息过多，请稍后再试。",
+            "drain_timeout": 15,
+            "spool_max_age": 600,
+        },
     },
     "provider": [],
     "provider_settings": {
@@ -67,10 +75,14 @@ DEFAULT_CONFIG = {
         "prompt_prefix": "",
         "max_context_length": -1,
         "dequeue_context_length": 1,
+        "max_context_tokens": 0,
+        "context_tokenizer": "auto",
         "streaming_response": False,
         "show_tool_use_status": False,
         "streaming_segmented": False,
         "max_agent_step": 30,
+        "tool_call_concurrency": 4,
+        "tool_call_timeout": 0,
     },
     "provider_stt_settings": {
         "enable": False,
@@ -97,6 +109,14 @@ DEFAULT_CONFIG = {
         "also_use_in_response": False,
         "internal_keywords": {"enable": True, "extra_keywords": []},
         "baidu_aip": {"enable": False, "app_id": "", "api_key": "", "secret_key": ""},
+        "remote": {
+            "timeout": 5,
+            "cache_ttl": 600,
+            "max_concurrency": 4,
+            "failure_threshold": 5,
+            "recovery_time": 30,
+            "fail_open": True,
+        },
     },
     "admins_id": ["astrbot"],
     "t2i": False,
@@ -105,8 +125,26 @@ DEFAULT_CONFIG = {
     "t2i_endpoint": "",
     "t2i_use_file_service": False,
     "t2i_active_template": "base",
+    "t2i_local_render": {"workers": 2, "cache_ttl": 3600},
     "http_proxy": "",
     "no_proxy": ["localhost", "127.0.0.1", "::1"],
+    "http_client": {
+        "limit": 100,
+        "limit_per_host": 10,
+        "keepalive_timeout": 30,
+        "dns_cache_ttl": 300,
+        "connect_timeout": 10,
+        "timeout": 60,
+        "download_read_timeout": 60,
+    },
+    "startup_concurrency": 8,
+    "plugin_lazy_load": False,
+    "media_cache": {
+        "max_size_mb": 1024,
+        "max_age_hours": 12,
+        "url_ttl": 3600,
+        "janitor_interval": 600,
+    },
     "dashboard": {
         "enable": True,
         "username": "astrbot",
@@ -575,6 +613,36 @@ CONFIG_METADATA_2 = {
                         "type": "bool",
                         "hint": "启用后，机器人回复消息时会引用原消息。实际效果以具体的平台适配器为准。",
                     },
+                    "event_dispatch": {
+                        "type": "object",
+                        "items": {
+                            "max_in_flight": {
+                                "type": "int",
+                                "hint": "同时处理的消息事件数量上限。小于等于 0 时不限制。",
+                            },
+                            "queue_size": {
+                                "type": "int",
+                                "hint": "等待处理的消息事件队列长度上限。最大并发处理数小于等于 0 时不限制。",
+                            },
+                            "overflow_policy": {
+                                "type": "string",
+                                "options": ["drop_oldest", "coalesce", "reject"],
+                                "hint": "队列满时的处理策略。drop_oldest 丢弃最旧的事件；coalesce 只保留同一会话同一发送者最新的事件；reject 拒绝新事件并回复提示。",
+                            },
+                            "reject_notice": {
+                                "type": "string",
+                                "hint": "reject 策略下回复给发送者的提示。为空时不回复。",
+                            },
+                            "drain_timeout": {
+                                "type": "int",
+                                "hint": "停止或重启时等待正在处理的消息事件完成的最长时间(秒)。",
+                            },
+                            "spool_max_age": {
+                                "type": "int",
+                                "hint": "停止或重启时尚未处理的消息事件会被暂存, 下次启动后重新处理。暂存超过该时间(秒)的事件会被丢弃, 小于等于 0 时不丢弃。",
+                            },
+                        },
+                    },
                     "path_mapping": {
                         "type": "list",
                         "items": {"type": "string"},
@@ -616,6 +684,35 @@ CONFIG_METADATA_2 = {
                             },
                         },
                     },
+                    "remote": {
+                        "type": "object",
+                        "items": {
+                            "timeout": {
+                                "type": "float",
+                                "hint": "远程审核服务的超时时间(秒)，包括排队等待的时间。",
+                            },
+                            "cache_ttl": {
+                                "type": "int",
+                                "hint": "相同内容的审核结果的缓存时间(秒)，0 表示不缓存。",
+                            },
+                            "max_concurrency": {
+                                "type": "int",
+                                "hint": "同时进行的远程审核请求数上限。",
+                            },
+                            "failure_threshold": {
+                                "type": "int",
+                                "hint": "连续失败多少次后暂停请求远程审核服务。",
+                            },
+                            "recovery_time": {
+                                "type": "int",
+                                "hint": "暂停请求远程审核服务的时间(秒)。",
+                            },
+                            "fail_open": {
+                                "type": "bool",
+                                "hint": "远程审核服务超时或者不可用时是否放行消息。关闭后将拦截消息。",
+                            },
+                        },
+                    },
                 },
             },
         },
@@ -1103,6 +1200,7 @@ CONFIG_METADATA_2 = {
                         "embedding_api_base": "",
                         "embedding_model": "",
                         "embedding_dimensions": 1024,
+                        "embedding_batch_size": 32,
                         "timeout": 20,
                     },
                     "Gemini Embedding": {
@@ -1115,6 +1213,7 @@ CONFIG_METADATA_2 = {
                         "embedding_api_base": "",
                         "embedding_model": "gemini-embedding-exp-03-07",
                         "embedding_dimensions": 768,
+                        "embedding_batch_size": 32,
                         "timeout": 20,
                     },
                     "vLLM Rerank": {
@@ -1288,6 +1387,11 @@ CONFIG_METADATA_2 = {
                         "type": "int",
                         "hint": "嵌入向量的维度。根据模型不同，可能需要调整，请参考具体模型的文档。此配置项请务必填写正确，否则将导致向量数据库无法正常工作。",
                     },
+                    "embedding_batch_size": {
+                        "description": "批量嵌入大小",
+                        "type": "int",
+                        "hint": "批量导入文档时, 单次请求嵌入的最大文本数量。请不要超过提供商的限制。",
+                    },
                     "embedding_model": {
                         "description": "嵌入模型",
                         "type": "string",
@@ -1640,6 +1744,11 @@ CONFIG_METADATA_2 = {
                         "type": "int",
                         "hint": "超时时间，单位为秒。",
                     },
+                    "key_rpm_limit": {
+                        "description": "单个 Key 每分钟请求数限制",
+                        "type": "int",
+                        "hint": "仅对 OpenAI 兼容的提供商生效。每个 API Key 每分钟最多发出的请求数, 超出时会选择其他 Key 或者等待。0 表示不限制。",
+                    },
                     "openai-tts-voice": {
                         "description": "voice",
                         "type": "string",
@@ -1792,6 +1901,18 @@ CONFIG_METADATA_2 = {
                         "description": "工具调用轮数上限",
                         "type": "int",
                     },
+                    "tool_call_concurrency": {
+                        "type": "int",
+                    },
+                    "tool_call_timeout": {
+                        "type": "int",
+                    },
+                    "max_context_tokens": {
+                        "type": "int",
+                    },
+                    "context_tokenizer": {
+                        "type": "string",
+                    },
                 },
             },
             "provider_stt_settings": {
@@ -1888,6 +2009,29 @@ CONFIG_METADATA_2 = {
             "timezone": {
                 "type": "string",
             },
+            "http_client": {
+                "type": "object",
+                "items": {
+                    "limit": {"type": "int"},
+                    "limit_per_host": {"type": "int"},
+                    "keepalive_timeout": {"type": "int"},
+                    "dns_cache_ttl": {"type": "int"},
+                    "connect_timeout": {"type": "int"},
+                    "timeout": {"type": "int"},
+                    "download_read_timeout": {"type": "int"},
+                },
+            },
+            "startup_concurrency": {"type": "int"},
+            "plugin_lazy_load": {"type": "bool"},
+            "media_cache": {
+                "type": "object",
+                "items": {
+                    "max_size_mb": {"type": "int"},
+                    "max_age_hours": {"type": "int"},
+                    "url_ttl": {"type": "int"},
+                    "janitor_interval": {"type": "int"},
+                },
+            },
             "callback_api_base": {
                 "type": "string",
             },
@@ -1905,6 +2049,13 @@ CONFIG_METADATA_2 = {
             "t2i_use_file_service": {
                 "type": "bool",
             },
+            "t2i_local_render": {
+                "type": "object",
+                "items": {
+                    "workers": {"type": "int"},
+                    "cache_ttl": {"type": "int"},
+                },
+            },
             "pip_install_arg": {
                 "type": "string",
             },
@@ -2054,6 +2205,16 @@ CONFIG_METADATA_3 = {
                         "description": "工具调用轮数上限",
                         "type": "int",
                     },
+                    "provider_settings.tool_call_concurrency": {
+                        "description": "工具并发调用数",
+                        "type": "int",
+                        "hint": "模型在一次回复中请求调用多个工具时，同时执行的工具数量上限。只有 MCP 工具和声明了 parallel=True 的插件工具会并发执行。1 为逐个执行。",
+                    },
+                    "provider_settings.tool_call_timeout": {
+                        "description": "工具调用超时时间(秒)",
+                        "type": "int",
+                        "hint": "单个工具调用的超时时间，超时后将错误信息返回给模型。0 为不限制。",
+                    },
                     "provider_settings.streaming_response": {
                         "description": "流式回复",
                         "type": "bool",
@@ -2072,6 +2233,22 @@ CONFIG_METADATA_3 = {
                         "type": "int",
                         "hint": "超出最多携带对话轮数时, 一次丢弃的聊天轮数。",
                     },
+                    "provider_settings.max_context_tokens": {
+                        "description": "上下文 Token 预算",
+                        "type": "int",
+                        "hint": "请求前估算上下文(包括系统提示词和本轮输入)的 Token 数, 超出时从最旧的对话开始丢弃。建议设置为略小于模型上下文长度的值。0 为不限制。",
+                    },
+                    "provider_settings.context_tokenizer": {
+                        "description": "Token 估算方式",
+                        "type": "string",
+                        "options": [
+                            "auto",
+                            "heuristic",
+                            "tiktoken:cl100k_base",
+                            "tiktoken:o200k_base",
+                        ],
+                        "hint": "auto: 安装了 tiktoken 时使用 tiktoken, 否则按字符数快速估算。",
+                    },
                     "provider_settings.wake_prefix": {
                         "description": "LLM 聊天额外唤醒前缀 ",
                         "type": "string",
@@ -2219,6 +2396,29 @@ CONFIG_METADATA_3 = {
                             "content_safety.baidu_aip.enable": True,
                         },
                     },
+                    "content_safety.remote.timeout": {
+                        "description": "审核服务超时时间(秒)",
+                        "type": "float",
+                        "condition": {
+                            "content_safety.baidu_aip.enable": True,
+                        },
+                    },
+                    "content_safety.remote.cache_ttl": {
+                        "description": "审核结果缓存时间(秒)",
+                        "type": "int",
+                        "hint": "相同内容在缓存时间内不会重复请求审核服务。0 表示不缓存。",
+                        "condition": {
+                            "content_safety.baidu_aip.enable": True,
+                        },
+                    },
+                    "content_safety.remote.fail_open": {
+                        "description": "审核服务不可用时放行消息",
+                        "type": "bool",
+                        "hint": "审核服务超时、出错或者连续失败被暂停时，启用则放行消息，关闭则拦截消息。",
+                        "condition": {
+                            "content_safety.baidu_aip.enable": True,
+                        },
+                    },
                     "content_safety.internal_keywords.enable": {
                         "description": "关键词检查",
                         "type": "bool",
@@ -2263,6 +2463,45 @@ CONFIG_METADATA_3 = {
                     },
                 },
             },
+            "event_dispatch": {
+                "description": "事件调度",
+                "type": "object",
+                "items": {
+                    "platform_settings.event_dispatch.max_in_flight": {
+                        "description": "最大并发处理数",
+                        "type": "int",
+                        "hint": "同时处理的消息事件数量上限。小于等于 0 时不限制。",
+                    },
+                    "platform_settings.event_dispatch.queue_size": {
+                        "description": "等待队列长度",
+                        "type": "int",
+                        "hint": "等待处理的消息事件队列长度上限。最大并发处理数小于等于 0 时不限制。修改后重启生效。",
+                    },
+                    "platform_settings.event_dispatch.overflow_policy": {
+                        "description": "队列溢出策略",
+                        "type": "string",
+                        "options": ["drop_oldest", "coalesce", "reject"],
+                        "hint": "drop_oldest 丢弃最旧的事件；coalesce 只保留同一会话同一发送者最新的事件；reject 拒绝新事件并回复提示。",
+                    },
+                    "platform_settings.event_dispatch.reject_notice": {
+                        "description": "拒绝提示",
+                        "type": "string",
+                        "condition": {
+                            "platform_settings.event_dispatch.overflow_policy": "reject",
+                        },
+                    },
+                    "platform_settings.event_dispatch.drain_timeout": {
+                        "description": "停止时等待时间(秒)",
+                        "type": "int",
+                        "hint": "停止或重启时不再派发新的消息事件, 并等待正在处理的消息事件完成, 超时后取消。",
+                    },
+                    "platform_settings.event_dispatch.spool_max_age": {
+                        "description": "暂存事件有效期(秒)",
+                        "type": "int",
+                        "hint": "停止或重启时尚未处理的消息事件会被暂存到 data/event_spool.json, 下次启动后重新处理(Discord、飞书等需要原始消息对象才能回复的平台除外)。暂存超过该时间的事件会被丢弃, 小于等于 0 时不丢弃。",
+                    },
+                },
+            },
         },
     },
     "plugin_group": {
@@ -2416,6 +2655,22 @@ CONFIG_METADATA_3_SYSTEM = {
                         },
                         "_special": "t2i_template",
                     },
+                    "t2i_local_render.workers": {
+                        "description": "本地文本转图像进程数",
+                        "type": "int",
+                        "hint": "本地渲染在独立的进程中进行，避免渲染长文本时阻塞其他会话。0 表示在线程中渲染。",
+                        "condition": {
+                            "t2i_strategy": "local",
+                        },
+                    },
+                    "t2i_local_render.cache_ttl": {
+                        "description": "本地文本转图像缓存时间(秒)",
+                        "type": "int",
+                        "hint": "相同的文本在缓存时间内直接复用已经渲染的图片。0 表示不缓存。",
+                        "condition": {
+                            "t2i_strategy": "local",
+                        },
+                    },
                     "t2i_active_template": {
                         "description": "当前应用的文转图渲染模板",
                         "type": "string",
@@ -2458,6 +2713,46 @@ CONFIG_METADATA_3_SYSTEM = {
                         "type": "list",
                         "items": {"type": "string"},
                     },
+                    "http_client.limit": {
+                        "description": "HTTP 连接池大小",
+                        "type": "int",
+                        "hint": "下载图片、文件等对外 HTTP 请求共享的连接池的最大连接数。修改后重启生效。",
+                    },
+                    "http_client.limit_per_host": {
+                        "description": "单个主机的最大连接数",
+                        "type": "int",
+                        "hint": "对同一个主机的最大并发连接数。修改后重启生效。",
+                    },
+                    "http_client.timeout": {
+                        "description": "HTTP 请求超时时间(秒)",
+                        "type": "int",
+                        "hint": "调用外部 API 等对外 HTTP 请求的默认总超时时间。下载图片、文件时不限制总时间。修改后重启生效。",
+                    },
+                    "http_client.download_read_timeout": {
+                        "description": "下载读取超时时间(秒)",
+                        "type": "int",
+                        "hint": "下载图片、文件时, 超过该时间没有收到数据则认为下载失败。修改后重启生效。",
+                    },
+                    "startup_concurrency": {
+                        "description": "启动并发数",
+                        "type": "int",
+                        "hint": "启动时同时初始化的提供商、平台适配器和插件数量上限。修改后重启生效。",
+                    },
+                    "plugin_lazy_load": {
+                        "description": "延迟载入插件",
+                        "type": "bool",
+                        "hint": "启用后, 只注册了指令的插件在启动时不会被导入, 直到第一次收到它的指令时才载入, 以加快启动速度、减少内存占用。插件的指令信息来自上一次载入时生成的插件清单(data/plugin_manifest.json), 插件文件发生变化后会重新载入并更新清单。修改后重启生效。",
+                    },
+                    "media_cache.max_size_mb": {
+                        "description": "媒体缓存大小上限(MB)",
+                        "type": "int",
+                        "hint": "下载、解码得到的图片和语音按内容缓存在 data/temp/media 下, 超过上限时删除最久未使用的文件。修改后重启生效。",
+                    },
+                    "media_cache.max_age_hours": {
+                        "description": "媒体缓存过期时间(小时)",
+                        "type": "int",
+                        "hint": "超过该时间未被使用的缓存文件会被删除。修改后重启生效。",
+                    },
                 },
             }
         },
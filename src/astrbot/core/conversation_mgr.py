@@ -118,16 +118,20 @@ class ConversationManager:
         unified_msg_origin: str,
         conversation_id: str,
         create_if_not_exists: bool = False,
+        last_turns: int | None = None,
     ) -> Conversation | None:
         """获取会话的对话
 
         Args:
             unified_msg_origin (str): 统一的消息来源字符串。格式为 platform_name:message_type:session_id
             conversation_id (str): 对话 ID, 是 uuid 格式的字符串
+            last_turns (int): 只读取最近的若干轮对话(以用户消息计), 为 None 时读取全部历史记录
         Returns:
             conversation (Conversation): 对话对象
         """
-        conv = await self.db.get_conversation_by_id(cid=conversation_id)
+        conv = await self.db.get_conversation_by_id(
+            cid=conversation_id, last_turns=last_turns
+        )
         if not conv and create_if_not_exists:
             # 如果对话不存在且需要创建，则新建一个对话
             conversation_id = await self.new_conversation(unified_msg_origin)
@@ -214,6 +218,26 @@ class ConversationManager:
                 content=history,
             )
 
+    async def append_conversation_history(
+        self,
+        unified_msg_origin: str,
+        conversation_id: str | None = None,
+        messages: list[dict] | None = None,
+    ):
+        """向会话的对话追加历史记录, 不会重写已有的历史记录
+
+        Args:
+            unified_msg_origin (str): 统一的消息来源字符串。格式为 platform_name:message_type:session_id
+            conversation_id (str): 对话 ID, 是 uuid 格式的字符串
+            messages (list[dict]): 要追加的消息, 每个字典包含 role 和 content 字段
+        """
+        if not conversation_id:
+            conversation_id = await self.get_curr_conversation_id(unified_msg_origin)
+        if conversation_id and messages:
+            await self.db.append_conversation_messages(
+                cid=conversation_id, messages=messages
+            )
+
     async def update_conversation_title(
         self, unified_msg_origin: str, title: str, conversation_id: str | None = None
     ):
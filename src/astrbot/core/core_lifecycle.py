@@ -14,9 +14,9 @@ import asyncio
 import time
 import threading
 import os
-from .event_bus import EventBus
+from .event_bus import EventBus, EventQueue, get_dispatch_settings
+from .event_spool import event_spool
 from . import astrbot_config, html_renderer
-from asyncio import Queue
 from astrbot.core.pipeline.scheduler import PipelineScheduler, PipelineContext
 from astrbot.core.star import PluginManager
 from astrbot.core.platform.manager import PlatformManager
@@ -33,6 +33,9 @@ from astrbot.core.platform_message_history_mgr import PlatformMessageHistoryMana
 from astrbot.core.astrbot_config_mgr import AstrBotConfigManager
 from astrbot.core.star.star_handler import star_handlers_registry, EventType
 from astrbot.core.star.star_handler import star_map
+from astrbot.core.utils.http_client import http_client
+from astrbot.core.utils.media_cache import media_cache
+from astrbot.core.utils.startup import startup_report, DEFAULT_STARTUP_CONCURRENCY
 
 
 class AstrBotCoreLifecycle:
@@ -79,21 +82,47 @@ class AstrBotCoreLifecycle:
         else:
             logger.setLevel(self.astrbot_config["log_level"])  # 设置日志级别
 
-        await self.db.initialize()
+        # 互不依赖的提供商、平台适配器、插件并发初始化, 并记录各个组件的启动耗时
+        startup_report.reset(
+            self.astrbot_config.get("startup_concurrency", DEFAULT_STARTUP_CONCURRENCY)
+        )
+        self.startup_report = startup_report
+
+        # 配置共享的 HTTP 连接池
+        http_client.configure(self.astrbot_config.get("http_client", {}))
+        media_cache.configure(self.astrbot_config.get("media_cache", {}))
+        media_cache.start_janitor()
 
-        await html_renderer.initialize()
+        async with startup_report.phase("数据库"):
+            await self.db.initialize()
+
+        html_renderer.local_strategy.configure(
+            self.astrbot_config.get("t2i_local_render", {})
+        )
+        if self.astrbot_config["t2i_strategy"] == "local":
+            html_renderer.local_strategy.start()
+        async with startup_report.phase("文本转图像"):
+            await html_renderer.initialize()
 
         # 初始化 AstrBot 配置管理器
         self.astrbot_config_mgr = AstrBotConfigManager(
             default_config=self.astrbot_config, sp=sp
         )
 
-        # 初始化事件队列
-        self.event_queue = Queue()
+        # 初始化事件队列。max_in_flight <= 0 时保持原来的行为, 队列不设上限
+        dispatch_settings = get_dispatch_settings(self.astrbot_config)
+        self.event_queue = EventQueue(
+            max(0, dispatch_settings["queue_size"])
+            if dispatch_settings["max_in_flight"] > 0
+            else 0,
+            dispatch_settings["overflow_policy"],
+            dispatch_settings["reject_notice"],
+        )
 
         # 初始化人格管理器
         self.persona_mgr = PersonaManager(self.db, self.astrbot_config_mgr)
-        await self.persona_mgr.initialize()
+        async with startup_report.phase("人格"):
+            await self.persona_mgr.initialize()
 
         # 初始化供应商管理器
         self.provider_manager = ProviderManager(
@@ -125,15 +154,17 @@ class AstrBotCoreLifecycle:
         # 初始化插件管理器
         self.plugin_manager = PluginManager(self.star_context, self.astrbot_config)
 
-        # 扫描、注册插件、实例化插件类
-        await self.plugin_manager.reload()
+        # 扫描、注册插件、实例化插件类。插件可能注册提供商和平台适配器, 因此需要最先载入
+        async with startup_report.phase("插件"):
+            await self.plugin_manager.reload()
 
         # 根据配置实例化各个 Provider
-        await self.provider_manager.initialize()
+        async with startup_report.phase("提供商"):
+            await self.provider_manager.initialize()
 
         # 初始化消息事件流水线调度器
-
-        self.pipeline_scheduler_mapping = await self.load_pipeline_scheduler()
+        async with startup_report.phase("流水线"):
+            self.pipeline_scheduler_mapping = await self.load_pipeline_scheduler()
 
         # 初始化更新器
         self.astrbot_updater = AstrBotUpdater()
@@ -149,8 +180,12 @@ class AstrBotCoreLifecycle:
         # 初始化当前任务列表
         self.curr_tasks: list[asyncio.Task] = []
 
-        # 根据配置实例化各个平台适配器
-        await self.platform_manager.initialize()
+        # 根据配置实例化各个平台适配器。在 start() 启动事件总线之前收到的消息会留在事件队列中
+        async with startup_report.phase("平台适配器"):
+            await self.platform_manager.initialize()
+
+        startup_report.finish()
+        startup_report.log_summary()
 
         # 初始化关闭控制面板的事件
         self.dashboard_shutdown_event = asyncio.Event()
@@ -169,6 +204,17 @@ class AstrBotCoreLifecycle:
         for task in self.star_context._register_tasks:
             extra_tasks.append(asyncio.create_task(task, name=task.__name__))
 
+        # 重新提交上次停止时暂存的事件
+        extra_tasks.append(
+            asyncio.create_task(
+                event_spool.replay(
+                    self.platform_manager.get_insts(),
+                    get_dispatch_settings(self.astrbot_config)["spool_max_age"],
+                ),
+                name="event_spool_replay",
+            )
+        )
+
         tasks_ = [event_bus_task, *extra_tasks]
         for task in tasks_:
             self.curr_tasks.append(
@@ -215,8 +261,24 @@ class AstrBotCoreLifecycle:
         # 同时运行curr_tasks中的所有任务
         await asyncio.gather(*self.curr_tasks, return_exceptions=True)
 
+    async def _drain_events(self):
+        """停止派发事件, 等待正在处理的事件完成, 并暂存还没有开始处理的事件"""
+        timeout = get_dispatch_settings(self.astrbot_config)["drain_timeout"]
+        self._spool_events(await self.event_bus.drain(timeout))
+
+    def _spool_events(self, events: list):
+        if not events:
+            return
+        try:
+            count = event_spool.save(events)
+            logger.info(f"已暂存 {count} 个尚未处理的事件, 将在下次启动后重新处理。")
+        except Exception as e:
+            logger.error(f"暂存尚未处理的事件失败: {e}")
+
     async def stop(self):
         """停止 AstrBot 核心生命周期管理类, 取消所有当前任务并终止各个管理器"""
+        await self._drain_events()
+
         # 请求停止所有正在运行的异步任务
         for task in self.curr_tasks:
             task.cancel()
@@ -232,6 +294,12 @@ class AstrBotCoreLifecycle:
 
         await self.provider_manager.terminate()
         await self.platform_manager.terminate()
+        # 平台适配器停止前提交的事件
+        self._spool_events(self.event_bus.take_pending())
+        await sp.flush()
+        await http_client.close()
+        await media_cache.close()
+        html_renderer.local_strategy.close()
         self.dashboard_shutdown_event.set()
 
         # 再次遍历curr_tasks等待每个任务真正结束
@@ -245,8 +313,11 @@ class AstrBotCoreLifecycle:
 
     async def restart(self):
         """重启 AstrBot 核心生命周期管理类, 终止各个管理器并重新加载平台实例"""
+        await self._drain_events()
         await self.provider_manager.terminate()
         await self.platform_manager.terminate()
+        self._spool_events(self.event_bus.take_pending())
+        await sp.flush()
         self.dashboard_shutdown_event.set()
         threading.Thread(
             target=self.astrbot_updater._reboot, name="restart", daemon=True
@@ -294,3 +365,4 @@ class AstrBotCoreLifecycle:
         )
         await scheduler.initialize()
         self.pipeline_scheduler_mapping[conf_id] = scheduler
+        self.event_bus.reload_pool(conf_id)
@@ -7,6 +7,7 @@ from astrbot.core.db.po import (
     Stats,
     PlatformStat,
     ConversationV2,
+    ConversationMessage,
     PlatformMessageHistory,
     Attachment,
     Persona,
@@ -100,8 +101,14 @@ class BaseDatabase(abc.ABC):
         ...
 
     @abc.abstractmethod
-    async def get_conversation_by_id(self, cid: str) -> ConversationV2:
-        """Get a specific conversation by its ID."""
+    async def get_conversation_by_id(
+        self, cid: str, last_turns: int | None = None
+    ) -> ConversationV2:
+        """Get a specific conversation by its ID.
+
+        `content` is filled with the conversation messages. If `last_turns` is given,
+        only the messages since the last `last_turns` user messages are included.
+        """
         ...
 
     @abc.abstractmethod
@@ -154,6 +161,24 @@ class BaseDatabase(abc.ABC):
         """Delete a conversation by its ID."""
         ...
 
+    @abc.abstractmethod
+    async def append_conversation_messages(
+        self, cid: str, messages: list[dict]
+    ) -> None:
+        """Append messages to a conversation's history without rewriting it."""
+        ...
+
+    @abc.abstractmethod
+    async def get_conversation_messages(
+        self, cid: str, last_turns: int | None = None
+    ) -> list[ConversationMessage]:
+        """Get the messages of a conversation in order.
+
+        If `last_turns` is given, only the messages since the last `last_turns` user
+        messages are returned.
+        """
+        ...
+
     @abc.abstractmethod
     async def insert_platform_message_history(
         self,
@@ -67,6 +67,27 @@ class ConversationV2(SQLModel, table=True):
     )
 
 
+class ConversationMessage(SQLModel, table=True):
+    """A single LLM message of a conversation.
+
+    Conversation history is stored row by row so that a new turn only appends rows
+    instead of rewriting the whole history. `id` grows monotonically and is used as
+    the order of the messages.
+
+    Note: In earlier versions, the history was stored as a JSON blob in
+    `conversations.content`. It is moved into this table when first accessed.
+    """
+
+    __tablename__ = "conversation_messages"
+
+    id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": True})
+    conversation_id: str = Field(max_length=36, nullable=False, index=True)
+    role: str = Field(nullable=False)
+    content: dict = Field(sa_type=JSON, nullable=False)
+    """an OpenAI-format message, such as {"role": "user", "content": "hello"}"""
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
 class Persona(SQLModel, table=True):
     """Persona is a set of instructions for LLMs to follow.
 
@@ -1,10 +1,11 @@
 import asyncio
 import typing as T
 import threading
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from astrbot.core.db import BaseDatabase
 from astrbot.core.db.po import (
     ConversationV2,
+    ConversationMessage,
     PlatformStat,
     PlatformMessageHistory,
     Attachment,
@@ -15,7 +16,7 @@ from astrbot.core.db.po import (
     SQLModel,
 )
 
-from sqlalchemy import select, update, delete, text
+from sqlalchemy import select, update, delete, text, null
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import func
 
@@ -114,14 +115,80 @@ class SQLiteDatabase(BaseDatabase):
             query = query.order_by(ConversationV2.created_at.desc())
             result = await session.execute(query)
 
-            return result.scalars().all()
+            return await self._fill_contents(session, result.scalars().all())
 
-    async def get_conversation_by_id(self, cid):
+    async def get_conversation_by_id(self, cid, last_turns=None):
         async with self.get_db() as session:
             session: AsyncSession
             query = select(ConversationV2).where(ConversationV2.conversation_id == cid)
             result = await session.execute(query)
-            return result.scalar_one_or_none()
+            conv = result.scalar_one_or_none()
+        if not conv:
+            return None
+        if conv.content is not None:
+            async with self.get_db() as session:
+                session: AsyncSession
+                async with session.begin():
+                    await self._migrate_conversation_content(session, cid)
+        messages = await self.get_conversation_messages(cid, last_turns)
+        conv.content = [message.content for message in messages]
+        return conv
+
+    async def _migrate_conversation_content(self, session: AsyncSession, cid: str):
+        """将旧版本以整块 JSON 存储在 conversations.content 中的历史记录迁移到 conversation_messages 表。
+
+        需要在事务中调用。
+        """
+        result = await session.execute(
+            select(ConversationV2.content).where(ConversationV2.conversation_id == cid)
+        )
+        content = result.scalar_one_or_none()
+        if content is None:
+            return
+        # 旧版本默认的 content 为 [], 同样清空, 之后只从 conversation_messages 表中读取
+        # 带条件地清空旧字段, 只有一个并发的迁移能够成功, 防止重复插入
+        result = await session.execute(
+            update(ConversationV2)
+            .where(
+                ConversationV2.conversation_id == cid,
+                ConversationV2.content.isnot(None),
+            )
+            .values(content=null())
+        )
+        if result.rowcount == 0 or not content:
+            return
+        session.add_all(self._to_message_rows(cid, content))
+
+    async def _fill_contents(self, session: AsyncSession, conversations: list):
+        """已迁移的会话的 content 为空, 从 conversation_messages 表中读取历史记录填充到 content。
+
+        旧版本创建的会话的 content 可能是 [], 之后追加的消息同样在 conversation_messages 表中。
+        """
+        cids = [conv.conversation_id for conv in conversations if not conv.content]
+        if not cids:
+            return conversations
+        result = await session.execute(
+            select(ConversationMessage)
+            .where(ConversationMessage.conversation_id.in_(cids))
+            .order_by(ConversationMessage.id)
+        )
+        histories: dict[str, list] = {cid: [] for cid in cids}
+        for message in result.scalars():
+            histories[message.conversation_id].append(message.content)
+        for conv in conversations:
+            if not conv.content:
+                conv.content = histories[conv.conversation_id]
+        return conversations
+
+    def _to_message_rows(self, cid: str, messages: list[dict]):
+        return [
+            ConversationMessage(
+                conversation_id=cid,
+                role=message.get("role", ""),
+                content=message,
+            )
+            for message in messages
+        ]
 
     async def get_all_conversations(self, page=1, page_size=20):
         async with self.get_db() as session:
@@ -133,7 +200,7 @@ class SQLiteDatabase(BaseDatabase):
                 .offset(offset)
                 .limit(page_size)
             )
-            return result.scalars().all()
+            return await self._fill_contents(session, result.scalars().all())
 
     async def get_filtered_conversations(
         self,
@@ -170,7 +237,7 @@ class SQLiteDatabase(BaseDatabase):
                 .limit(page_size)
             )
             result = await session.execute(result_query)
-            conversations = result.scalars().all()
+            conversations = await self._fill_contents(session, result.scalars().all())
 
             return conversations, total
 
@@ -197,16 +264,21 @@ class SQLiteDatabase(BaseDatabase):
             async with session.begin():
                 new_conversation = ConversationV2(
                     user_id=user_id,
-                    content=content or [],
+                    content=None,
                     platform_id=platform_id,
                     title=title,
                     persona_id=persona_id,
                     **kwargs,
                 )
                 session.add(new_conversation)
+                if content:
+                    session.add_all(
+                        self._to_message_rows(new_conversation.conversation_id, content)
+                    )
                 return new_conversation
 
     async def update_conversation(self, cid, title=None, persona_id=None, content=None):
+        """Update a conversation. If `content` is given, the whole history is replaced."""
         async with self.get_db() as session:
             session: AsyncSession
             async with session.begin():
@@ -219,7 +291,14 @@ class SQLiteDatabase(BaseDatabase):
                 if persona_id is not None:
                     values["persona_id"] = persona_id
                 if content is not None:
-                    values["content"] = content
+                    values["content"] = null()
+                    values["updated_at"] = datetime.now(timezone.utc)
+                    await session.execute(
+                        delete(ConversationMessage).where(
+                            ConversationMessage.conversation_id == cid
+                        )
+                    )
+                    session.add_all(self._to_message_rows(cid, content))
                 if not values:
                     return
                 query = query.values(**values)
@@ -233,6 +312,53 @@ class SQLiteDatabase(BaseDatabase):
                 await session.execute(
                     delete(ConversationV2).where(ConversationV2.conversation_id == cid)
                 )
+                await session.execute(
+                    delete(ConversationMessage).where(
+                        ConversationMessage.conversation_id == cid
+                    )
+                )
+
+    async def append_conversation_messages(self, cid, messages):
+        """Append messages to a conversation's history without rewriting it."""
+        if not messages:
+            return
+        async with self.get_db() as session:
+            session: AsyncSession
+            async with session.begin():
+                # 先迁移旧的历史记录, 保证消息顺序
+                await self._migrate_conversation_content(session, cid)
+                session.add_all(self._to_message_rows(cid, messages))
+                await session.execute(
+                    update(ConversationV2)
+                    .where(ConversationV2.conversation_id == cid)
+                    .values(updated_at=datetime.now(timezone.utc))
+                )
+
+    async def get_conversation_messages(self, cid, last_turns=None):
+        """Get the messages of a conversation in order."""
+        async with self.get_db() as session:
+            session: AsyncSession
+            query = select(ConversationMessage).where(
+                ConversationMessage.conversation_id == cid
+            )
+            if last_turns is not None and last_turns > 0:
+                # 倒数第 last_turns 条用户消息的 id, 不足时从头开始
+                boundary = (
+                    select(ConversationMessage.id)
+                    .where(
+                        ConversationMessage.conversation_id == cid,
+                        ConversationMessage.role == "user",
+                    )
+                    .order_by(ConversationMessage.id.desc())
+                    .offset(last_turns - 1)
+                    .limit(1)
+                    .scalar_subquery()
+                )
+                query = query.where(
+                    ConversationMessage.id >= func.coalesce(boundary, 0)
+                )
+            result = await session.execute(query.order_by(ConversationMessage.id))
+            return result.scalars().all()
 
     async def insert_platform_message_history(
         self,
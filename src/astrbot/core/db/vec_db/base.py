@@ -22,6 +22,19 @@ class BaseVecDB:
         """
         ...
 
+    @abc.abstractmethod
+    async def insert_batch(
+        self,
+        contents: list[str],
+        metadatas: list[dict] | None = None,
+        ids: list[str] | None = None,
+        batch_size: int | None = None,
+    ) -> list[int]:
+        """
+        批量插入文本和其对应向量。
+        """
+        ...
+
     @abc.abstractmethod
     async def retrieve(self, query: str, top_k: int = 5) -> list[Result]:
         """
@@ -0,0 +1,203 @@
+import aiosqlite
+import hashlib
+import time
+import numpy as np
+from collections import OrderedDict
+from astrbot.core.provider.provider import EmbeddingProvider
+
+
+class EmbeddingCache:
+    """持久化的 Embedding 缓存。
+
+    以 (提供商 ID, 模型, 维度, 文本哈希) 作为键, 将向量以 float32 二进制存储在 SQLite 中,
+    并在内存中保留一个较小的 LRU 缓存用于高频的查询(如 "help")。
+    超过 max_entries 时按最近访问时间淘汰, 一次淘汰到 max_entries 的 90%, 避免缓存满后每次写入都淘汰。
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        provider: EmbeddingProvider,
+        max_entries: int = 100000,
+        memory_entries: int = 1024,
+    ):
+        self.db_path = db_path
+        self.provider = provider
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.connection = None
+        self.dimension = provider.get_dim()
+        self._namespace = "|".join(
+            [
+                str(provider.provider_config.get("id", "")),
+                str(
+                    provider.provider_config.get("embedding_model")
+                    or provider.get_model()
+                ),
+                str(self.dimension),
+            ]
+        )
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        # 命中的键, 在下一次写入时批量更新访问时间, 避免每次命中都写数据库
+        self._touched: set[str] = set()
+        # 数据库中条目数量的估计值(只会偏大), 超过 max_entries 时才查询准确数量
+        self._count = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def initialize(self):
+        self.connection = await aiosqlite.connect(self.db_path)
+        await self.connection.execute("PRAGMA journal_mode=WAL")
+        await self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        await self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_access ON embedding_cache(last_access)"
+        )
+        await self.connection.commit()
+        self._count = await self._count_entries()
+
+    async def _count_entries(self) -> int:
+        async with self.connection.execute(
+            "SELECT COUNT(*) FROM embedding_cache"
+        ) as cursor:
+            return (await cursor.fetchone())[0]
+
+    def _key(self, text: str) -> str:
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{self._namespace}|{text_hash}".encode()).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    async def get_embedding(self, text: str) -> list[float]:
+        """获取文本的向量, 未命中缓存时请求 Embedding 提供商"""
+        return (await self.get_embeddings([text]))[0]
+
+    async def get_embeddings(
+        self, texts: list[str], batch_size: int | None = None
+    ) -> list[list[float]]:
+        """批量获取文本的向量, 只有未命中缓存的文本会被发送给 Embedding 提供商
+
+        Args:
+            texts (list[str]): 文本列表
+            batch_size (int): 每次请求 Embedding 的文本数量, 默认使用 Embedding 提供商的配置
+        """
+        keys = [self._key(text) for text in texts]
+        found = await self._lookup(keys)
+
+        # 相同的文本只请求一次
+        missing: dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        miss_count = sum(1 for key in keys if key not in found)
+        self.hits += len(keys) - miss_count
+        self.misses += miss_count
+
+        if missing:
+            batch_size = batch_size or self.provider.get_batch_size()
+            miss_keys = list(missing.keys())
+            miss_texts = list(missing.values())
+            vectors = []
+            for i in range(0, len(miss_texts), batch_size):
+                vectors.extend(
+                    await self.provider.get_embeddings(miss_texts[i : i + batch_size])
+                )
+            new = {
+                key: np.asarray(vector, dtype=np.float32)
+                for key, vector in zip(miss_keys, vectors)
+            }
+            await self._store(new)
+            found.update(new)
+
+        return [found[key].tolist() for key in keys]
+
+    async def _lookup(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found = {}
+        db_keys = []
+        for key in keys:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                found[key] = self._memory[key]
+            else:
+                db_keys.append(key)
+        # SQLite 默认最多 999 个参数
+        for i in range(0, len(db_keys), 500):
+            chunk = db_keys[i : i + 500]
+            async with self.connection.execute(
+                "SELECT key, vector FROM embedding_cache WHERE key IN ({})".format(
+                    ",".join("?" * len(chunk))
+                ),
+                chunk,
+            ) as cursor:
+                for key, blob in await cursor.fetchall():
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._remember(key, vector)
+        self._touched.update(key for key in db_keys if key in found)
+        return found
+
+    async def _store(self, vectors: dict[str, np.ndarray]):
+        now = time.time()
+        await self.connection.executemany(
+            "INSERT OR REPLACE INTO embedding_cache (key, vector, last_access) VALUES (?, ?, ?)",
+            [(key, vector.tobytes(), now) for key, vector in vectors.items()],
+        )
+        if self._touched:
+            await self.connection.executemany(
+                "UPDATE embedding_cache SET last_access = ? WHERE key = ?",
+                [(now, key) for key in self._touched],
+            )
+            self._touched.clear()
+        self._count += len(vectors)
+        if self._count > self.max_entries:
+            await self._evict()
+        await self.connection.commit()
+        for key, vector in vectors.items():
+            self._remember(key, vector)
+
+    async def _evict(self):
+        # 估计值可能包含被覆盖写入的条目, 淘汰前先校正
+        count = await self._count_entries()
+        if count > self.max_entries:
+            target = self.max_entries - self.max_entries // 10
+            await self.connection.execute(
+                "DELETE FROM embedding_cache WHERE key IN "
+                "(SELECT key FROM embedding_cache ORDER BY last_access LIMIT ?)",
+                (count - target,),
+            )
+            count = target
+        self._count = count
+
+    def stats(self) -> dict:
+        """获取缓存命中率等指标"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    async def close(self):
+        if self.connection:
+            if self._touched:
+                now = time.time()
+                await self.connection.executemany(
+                    "UPDATE embedding_cache SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in self._touched],
+                )
+                self._touched.clear()
+                await self.connection.commit()
+            await self.connection.close()
+            self.connection = None
@@ -1,5 +1,6 @@
 import aiosqlite
 import os
+import re
 
 
 class DocumentStorage:
@@ -9,6 +10,8 @@ class DocumentStorage:
         self.sqlite_init_path = os.path.join(
             os.path.dirname(__file__), "sqlite_init.sql"
         )
+        # 已经建立了表达式索引的 metadata 键
+        self._indexed_keys: set[str] = {"user_id", "group_id"}
 
     async def initialize(self):
         """Initialize the SQLite database and create the documents table if it doesn't exist."""
@@ -55,6 +58,49 @@ class DocumentStorage:
                 result.append(await self.tuple_to_dict(row))
         return result
 
+    async def ensure_metadata_index(self, key: str):
+        """为 metadata 中的某个键建立索引(SQLite 表达式索引), 使按该键过滤时不需要扫描全表。
+
+        索引需要由调用方事先声明, 查询时不会自动建立。
+
+        Args:
+            key (str): metadata 的键, 只能包含字母、数字与下划线
+        """
+        if key in self._indexed_keys:
+            return
+        if not re.fullmatch(r"\w+", key):
+            raise ValueError(f"不合法的 metadata 键: {key}")
+        await self.connection.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_documents_meta_{key} "
+            f"ON documents(json_extract(metadata, '$.{key}'))"
+        )
+        await self.connection.commit()
+        self._indexed_keys.add(key)
+
+    async def get_ids_by_metadata(self, metadata_filters: dict) -> list[int]:
+        """获取满足 metadata 过滤条件的所有文档的 ID(主键)。
+
+        Args:
+            metadata_filters (dict): The metadata filters to apply.
+        """
+        where_clauses = []
+        values = []
+        for key, val in metadata_filters.items():
+            if key in ("user_id", "group_id"):
+                # 使用生成列及其索引
+                where_clauses.append(f"{key} = ?")
+            elif key in self._indexed_keys:
+                # 表达式需要和建立索引时完全一致才能使用索引
+                where_clauses.append(f"json_extract(metadata, '$.{key}') = ?")
+            else:
+                where_clauses.append("json_extract(metadata, ?) = ?")
+                values.append(f'$."{key}"')
+            values.append(val)
+        where_sql = " AND ".join(where_clauses) or "1=1"
+        async with self.connection.cursor() as cursor:
+            await cursor.execute("SELECT id FROM documents WHERE " + where_sql, values)
+            return [row[0] for row in await cursor.fetchall()]
+
     async def get_document_by_doc_id(self, doc_id: str):
         """Retrieve a document by its doc_id.
 
@@ -4,21 +4,81 @@ except ModuleNotFoundError:
     raise ImportError(
         "faiss 未安装。请使用 'pip install faiss-cpu' 或 'pip install faiss-gpu' 安装。"
     )
+import asyncio
 import os
 import numpy as np
+from astrbot.core import logger
+from .index_factory import (
+    apply_search_params,
+    build_index,
+    create_index,
+    export_vectors,
+    get_index_type,
+    is_wrapped_ivf,
+    make_search_params,
+    min_train_size,
+    remove_vectors,
+    supports_remove,
+    widen_search_params,
+)
 
 
 class EmbeddingStorage:
-    def __init__(self, dimension: int, path: str = None):
+    def __init__(
+        self,
+        dimension: int,
+        path: str = None,
+        save_delay: float = 5.0,
+        index_type: str = "flat",
+        index_params: dict | None = None,
+        compact_threshold: float = 0.2,
+        max_requery: int = 3,
+    ):
+        """
+        Args:
+            dimension (int): 向量维度
+            path (str): 索引文件路径
+            save_delay (float): 写入后延迟保存索引的秒数。在此期间的多次写入只会保存一次。
+            index_type (str): 索引类型, 可选 flat, hnsw, ivf_flat, ivf_pq
+            index_params (dict): 索引参数, 见 index_factory.DEFAULT_INDEX_PARAMS
+            compact_threshold (float): 已删除(墓碑)向量占比超过该值时, 在后台重建索引
+            max_requery (int): 带过滤条件的搜索结果不足时, 最多扩大搜索范围重新搜索的次数
+        """
         self.dimension = dimension
         self.path = path
+        self.save_delay = save_delay
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        self.compact_threshold = compact_threshold
+        self.max_requery = max_requery
         self.index = None
+        # 不支持 remove_ids 的索引(HNSW)中已删除的向量 ID, 搜索时会被排除
+        self._tombstones: set[int] = set()
+        self.tombstone_path = f"{path}.tombstones.npy" if path else None
         if path and os.path.exists(path):
             self.index = faiss.read_index(path)
+            apply_search_params(self.index, self.index_params)
+            if os.path.exists(self.tombstone_path):
+                self._tombstones = set(np.load(self.tombstone_path).tolist())
         else:
-            base_index = faiss.IndexFlatL2(dimension)
-            self.index = faiss.IndexIDMap(base_index)
-        self.storage = {}
+            # 需要训练的索引在向量数量足够之前先使用 flat 索引
+            initial_type = (
+                "flat" if min_train_size(index_type, self.index_params) else index_type
+            )
+            self.index = create_index(dimension, initial_type, self.index_params)
+        self._dirty = False
+        self._save_task: asyncio.Task | None = None
+        self._compact_task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def current_index_type(self) -> str:
+        """当前实际使用的索引类型。需要训练的索引在数据量不足时会是 flat"""
+        return get_index_type(self.index)
+
+    async def initialize(self):
+        """如果已有的索引与配置的索引类型不一致, 则迁移到配置的类型"""
+        await self._maybe_migrate()
 
     async def insert(self, vector: np.ndarray, id: int):
         """插入向量
@@ -29,31 +89,215 @@ class EmbeddingStorage:
         Raises:
             ValueError: 如果向量的维度与存储的维度不匹配
         """
-        if vector.shape[0] != self.dimension:
+        await self.insert_batch(vector.reshape(1, -1), [id])
+
+    async def insert_batch(self, vectors: np.ndarray, ids: list[int]):
+        """批量插入向量, 只调用一次 add_with_ids。索引会在 save_delay 秒后保存, 或者在 checkpoint() 时保存。
+
+        Args:
+            vectors (np.ndarray): 形状为 (n, dimension) 的向量矩阵
+            ids (list[int]): 向量的ID, 与 vectors 一一对应
+        Raises:
+            ValueError: 如果向量的维度与存储的维度不匹配, 或者向量数量与 ID 数量不一致
+        """
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            raise ValueError(
+                f"向量维度不匹配, 期望: {self.dimension}, 实际: {vectors.shape[-1]}"
+            )
+        if vectors.shape[0] != len(ids):
             raise ValueError(
-                f"向量维度不匹配, 期望: {self.dimension}, 实际: {vector.shape[0]}"
+                f"向量数量与 ID 数量不一致: {vectors.shape[0]} != {len(ids)}"
             )
-        self.index.add_with_ids(vector.reshape(1, -1), np.array([id]))
-        self.storage[id] = vector
-        await self.save_index()
+        if not ids:
+            return
+        async with self._lock:
+            self.index.add_with_ids(
+                np.ascontiguousarray(vectors, dtype=np.float32),
+                np.array(ids, dtype=np.int64),
+            )
+            self._mark_dirty()
+        await self._maybe_migrate()
+
+    async def delete(self, ids: list[int]):
+        """删除向量。支持 remove_ids 的索引直接删除, 否则记录为墓碑, 并在墓碑占比超过阈值时在后台重建索引
+
+        Args:
+            ids (list[int]): 要删除的向量 ID
+        """
+        if not ids:
+            return
+        async with self._lock:
+            if supports_remove(self.index):
+                remove_vectors(self.index, np.array(ids, dtype=np.int64))
+            else:
+                self._tombstones.update(int(i) for i in ids)
+            self._mark_dirty()
+        if self.dead_ratio() >= self.compact_threshold and (
+            self._compact_task is None or self._compact_task.done()
+        ):
+            self._compact_task = asyncio.create_task(self._compact())
+
+    def dead_ratio(self) -> float:
+        if not self.index.ntotal:
+            return 0.0
+        return len(self._tombstones) / self.index.ntotal
 
-    async def search(self, vector: np.ndarray, k: int) -> tuple:
+    async def _compact(self):
+        try:
+            logger.info(
+                f"FAISS 索引中已删除的向量占比 {self.dead_ratio():.0%}, 开始压缩索引"
+            )
+            await self.rebuild()
+        except Exception as e:
+            logger.error(f"压缩 FAISS 索引失败: {e}")
+
+    def stats(self) -> dict:
+        """获取索引的统计信息"""
+        return {
+            "index_type": self.current_index_type,
+            "configured_index_type": self.index_type,
+            "live_vectors": self.index.ntotal - len(self._tombstones),
+            "dead_vectors": len(self._tombstones),
+            "dead_ratio": round(self.dead_ratio(), 4),
+            "index_size_on_disk": os.path.getsize(self.path)
+            if self.path and os.path.exists(self.path)
+            else 0,
+            "unsaved_changes": self._dirty,
+        }
+
+    async def _maybe_migrate(self):
+        if is_wrapped_ivf(self.index):
+            # 旧版本的 IVF 索引包装在 IndexIDMap 中, 重建为原生 IVF 索引
+            await self.rebuild()
+            return
+        if self.current_index_type == self.index_type:
+            return
+        if self.index.ntotal < min_train_size(self.index_type, self.index_params):
+            return
+        await self.rebuild()
+
+    async def rebuild(
+        self, index_type: str | None = None, index_params: dict | None = None
+    ):
+        """使用当前索引中的全部向量重建索引。
+
+        可用于从 flat 索引迁移到其他索引类型, 或者在数据分布变化后重新训练 IVF 索引。已删除(墓碑)的向量会被清理。
+        重建在线程中进行, 期间仍然可以搜索旧的索引, 写入会等待重建完成。
+
+        Args:
+            index_type (str): 新的索引类型, 默认使用当前配置
+            index_params (dict): 新的索引参数, 默认使用当前配置
+        """
+        if index_type:
+            self.index_type = index_type
+        if index_params is not None:
+            self.index_params = index_params
+        async with self._lock:
+            vectors, ids = export_vectors(self.index)
+            dead = self._tombstones
+            if dead:
+                live = ~np.isin(ids, np.fromiter(dead, dtype=np.int64))
+                vectors, ids = vectors[live], ids[live]
+            target = self.index_type
+            if len(ids) < min_train_size(target, self.index_params):
+                # 数据量不足以训练, 继续使用 flat 索引
+                target = "flat"
+            logger.info(
+                f"开始重建 FAISS 索引: {self.current_index_type} -> {target}, 向量数量: {len(ids)}"
+            )
+            self.index = await asyncio.to_thread(
+                build_index, vectors, ids, target, self.index_params
+            )
+            self._tombstones = set()
+            self._mark_dirty()
+
+    async def search(
+        self, vector: np.ndarray, k: int, ids: list[int] | None = None
+    ) -> tuple:
         """搜索最相似的向量
 
         Args:
             vector (np.ndarray): 查询向量
             k (int): 返回的最相似向量的数量
+            ids (list[int]): 只在这些 ID 中搜索。通过 IDSelector 在索引内过滤, 只要候选数量足够就会返回 k 个结果
         Returns:
             tuple: (距离, 索引)
         """
         faiss.normalize_L2(vector)
-        distances, indices = self.index.search(vector, k)
+        if ids is None:
+            if not self._tombstones:
+                return self.index.search(vector, k)
+            dead = faiss.IDSelectorBatch(np.fromiter(self._tombstones, dtype=np.int64))
+            sel = faiss.IDSelectorNot(dead)
+            return self.index.search(
+                vector, k, params=make_search_params(self.index, sel)
+            )
+
+        candidates = np.asarray(ids, dtype=np.int64)
+        if self._tombstones:
+            dead = np.fromiter(self._tombstones, dtype=np.int64)
+            candidates = candidates[~np.isin(candidates, dead)]
+        if not len(candidates):
+            return (
+                np.full((len(vector), k), np.inf, dtype=np.float32),
+                np.full((len(vector), k), -1, dtype=np.int64),
+            )
+        sel = faiss.IDSelectorBatch(candidates)
+        params = make_search_params(self.index, sel)
+        expected = min(k, len(candidates))
+        # 近似索引在过滤条件较严格时可能找不到足够的结果, 逐步扩大搜索范围重新搜索
+        for _ in range(self.max_requery + 1):
+            distances, indices = self.index.search(vector, k, params=params)
+            found = int((indices >= 0).sum(axis=1).min())
+            if found >= expected or not widen_search_params(self.index, params):
+                break
         return distances, indices
 
+    def _mark_dirty(self):
+        self._dirty = True
+        if self.save_delay <= 0:
+            self._write_index()
+            return
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._delayed_save())
+
+    async def _delayed_save(self):
+        await asyncio.sleep(self.save_delay)
+        try:
+            self._write_index()
+        except Exception as e:
+            logger.error(f"保存 FAISS 索引失败: {e}")
+
+    def _write_index(self):
+        if not self._dirty or not self.path:
+            return
+        # 先清除标记, 写入失败时再恢复, 以便下次继续保存
+        self._dirty = False
+        try:
+            faiss.write_index(self.index, self.path)
+            if self._tombstones:
+                np.save(
+                    self.tombstone_path,
+                    np.fromiter(self._tombstones, dtype=np.int64),
+                )
+            elif os.path.exists(self.tombstone_path):
+                os.remove(self.tombstone_path)
+        except Exception:
+            self._dirty = True
+            raise
+
+    async def checkpoint(self):
+        """立即保存尚未落盘的索引"""
+        if self._save_task and not self._save_task.done():
+            self._save_task.cancel()
+        self._save_task = None
+        self._write_index()
+
     async def save_index(self):
         """保存索引
 
         Args:
             path (str): 保存索引的路径
         """
-        faiss.write_index(self.index, self.path)
+        self._dirty = True
+        self._write_index()
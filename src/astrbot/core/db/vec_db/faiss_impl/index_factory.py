@@ -0,0 +1,249 @@
+"""
+FAISS 索引的构建与迁移工具
+
+支持的索引类型:
+    flat: 暴力搜索, 召回率 100%, 延迟随数据量线性增长
+    hnsw: 基于图的近似搜索, 无需训练, 内存占用略高于 flat
+    ivf_flat: 倒排索引, 需要训练, 通过 nprobe 平衡召回率与延迟
+    ivf_pq: 倒排索引 + 乘积量化, 需要训练, 向量以压缩编码存储, 适合大规模知识库
+
+flat 与 hnsw 索引包装在 IndexIDMap 中, 以便使用文档的主键作为向量 ID。
+IVF 索引的倒排列表本身就存储向量 ID, 直接使用其原生的 add_with_ids / remove_ids,
+不能包装在 IndexIDMap 中: IVF 删除向量后不会重新编号, IndexIDMap 的 id_map 会与倒排列表错位。
+"""
+
+try:
+    import faiss
+except ModuleNotFoundError:
+    raise ImportError(
+        "faiss 未安装。请使用 'pip install faiss-cpu' 或 'pip install faiss-gpu' 安装。"
+    )
+import numpy as np
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+
+DEFAULT_INDEX_PARAMS = {
+    "hnsw_m": 32,
+    "ef_construction": 40,
+    "ef_search": 64,
+    "nlist": 100,
+    "nprobe": 8,
+    "pq_m": 16,
+    "pq_nbits": 8,
+    "max_train_size": 100000,
+}
+
+
+def _params(params: dict | None) -> dict:
+    return {**DEFAULT_INDEX_PARAMS, **(params or {})}
+
+
+def create_index(
+    dimension: int, index_type: str = "flat", params: dict | None = None
+) -> "faiss.Index":
+    """创建一个空的索引
+
+    Args:
+        dimension (int): 向量维度
+        index_type (str): 索引类型, 见 INDEX_TYPES
+        params (dict): 索引参数, 未提供的参数使用 DEFAULT_INDEX_PARAMS
+    Raises:
+        ValueError: 如果索引类型不支持, 或者参数不合法
+    """
+    p = _params(params)
+    if index_type == "flat":
+        base = faiss.IndexFlatL2(dimension)
+    elif index_type == "hnsw":
+        base = faiss.IndexHNSWFlat(dimension, p["hnsw_m"])
+        base.hnsw.efConstruction = p["ef_construction"]
+    elif index_type == "ivf_flat":
+        quantizer = faiss.IndexFlatL2(dimension)
+        base = faiss.IndexIVFFlat(quantizer, dimension, p["nlist"])
+    elif index_type == "ivf_pq":
+        if dimension % p["pq_m"] != 0:
+            raise ValueError(f"向量维度 {dimension} 必须能被 pq_m({p['pq_m']}) 整除")
+        quantizer = faiss.IndexFlatL2(dimension)
+        base = faiss.IndexIVFPQ(
+            quantizer, dimension, p["nlist"], p["pq_m"], p["pq_nbits"]
+        )
+    else:
+        raise ValueError(f"不支持的索引类型: {index_type}, 可选: {INDEX_TYPES}")
+    index = base if isinstance(base, faiss.IndexIVF) else faiss.IndexIDMap(base)
+    apply_search_params(index, params)
+    return index
+
+
+def get_base_index(index: "faiss.Index") -> "faiss.Index":
+    """获取 IndexIDMap 包装的实际索引, 未包装的索引原样返回"""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return faiss.downcast_index(index)
+
+
+def get_index_type(index: "faiss.Index") -> str:
+    """识别索引的类型"""
+    base = get_base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(base, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(base, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    if isinstance(base, faiss.IndexFlat):
+        return "flat"
+    return "unknown"
+
+
+def apply_search_params(index: "faiss.Index", params: dict | None):
+    """设置搜索参数。这些参数不影响索引内容, 可以随时调整"""
+    p = _params(params)
+    base = get_base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = p["ef_search"]
+    elif isinstance(base, faiss.IndexIVF):
+        base.nprobe = p["nprobe"]
+
+
+def supports_remove(index: "faiss.Index") -> bool:
+    """索引是否支持 remove_ids。HNSW 不支持删除, 只能通过墓碑标记并在重建时清理"""
+    return not isinstance(get_base_index(index), faiss.IndexHNSW)
+
+
+def is_wrapped_ivf(index: "faiss.Index") -> bool:
+    """是否是旧版本创建的、包装在 IndexIDMap 中的 IVF 索引。这类索引删除向量后 ID 会错位, 需要重建"""
+    return isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) and isinstance(
+        get_base_index(index), faiss.IndexIVF
+    )
+
+
+def remove_vectors(index: "faiss.Index", ids: np.ndarray) -> int:
+    """从支持 remove_ids 的索引中删除向量
+
+    Returns:
+        int: 实际删除的向量数量
+    """
+    base = get_base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        # 数组类型的 direct map 不支持删除, 删除前先清除
+        base.set_direct_map_type(faiss.DirectMap.NoMap)
+    return index.remove_ids(np.asarray(ids, dtype=np.int64))
+
+
+def make_search_params(
+    index: "faiss.Index", sel: "faiss.IDSelector"
+) -> "faiss.SearchParameters":
+    """构造带有 IDSelector 的搜索参数, 并保留索引当前的 efSearch / nprobe。
+
+    注意: 返回值不持有 sel 的引用, 调用方需要在搜索结束前保持 sel 存活。
+    """
+    base = get_base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = base.hnsw.efSearch
+    elif isinstance(base, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = base.nprobe
+    else:
+        params = faiss.SearchParameters()
+    params.sel = sel
+    return params
+
+
+def widen_search_params(index: "faiss.Index", params: "faiss.SearchParameters") -> bool:
+    """扩大搜索范围(efSearch / nprobe), 用于过滤条件较严格时重新搜索
+
+    Returns:
+        bool: 是否还能继续扩大。flat 索引总是精确搜索, 返回 False
+    """
+    base = get_base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        if params.efSearch >= base.ntotal:
+            return False
+        params.efSearch = min(params.efSearch * 4, base.ntotal)
+        return True
+    if isinstance(base, faiss.IndexIVF):
+        if params.nprobe >= base.nlist:
+            return False
+        params.nprobe = min(params.nprobe * 4, base.nlist)
+        return True
+    return False
+
+
+def min_train_size(index_type: str, params: dict | None = None) -> int:
+    """训练索引所需的最少向量数量。flat 与 hnsw 无需训练"""
+    p = _params(params)
+    if index_type not in ("ivf_flat", "ivf_pq"):
+        return 0
+    if "train_size" in p:
+        return p["train_size"]
+    # faiss 建议每个聚类中心至少 39 个训练样本
+    size = p["nlist"] * 39
+    if index_type == "ivf_pq":
+        size = max(size, 2 ** p["pq_nbits"] * 39)
+    return size
+
+
+def export_vectors(index: "faiss.Index") -> tuple[np.ndarray, np.ndarray]:
+    """导出索引中的全部向量与 ID。ivf_pq 索引导出的是有损的重建向量
+
+    Returns:
+        tuple: (向量矩阵, ID 数组)
+    """
+    base = get_base_index(index)
+    dimension = index.d
+    if index.ntotal == 0:
+        return np.empty((0, dimension), dtype=np.float32), np.empty(0, dtype=np.int64)
+    if isinstance(index, faiss.IndexIVF):
+        # IVF 删除向量后内部编号不再连续, 从倒排列表中读取 ID, 再通过哈希表 direct map 按 ID 重建向量
+        ids = []
+        invlists = index.invlists
+        for list_no in range(index.nlist):
+            size = invlists.list_size(list_no)
+            if size:
+                ids.append(faiss.rev_swig_ptr(invlists.get_ids(list_no), size).copy())
+        ids = np.concatenate(ids).astype(np.int64)
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        try:
+            vectors = index.reconstruct_batch(ids)
+        finally:
+            index.set_direct_map_type(faiss.DirectMap.NoMap)
+        return vectors, ids
+    if isinstance(base, faiss.IndexIVF):
+        base.make_direct_map()
+    vectors = base.reconstruct_n(0, base.ntotal)
+    ids = faiss.vector_to_array(index.id_map).astype(np.int64)
+    return vectors, ids
+
+
+def build_index(
+    vectors: np.ndarray,
+    ids: np.ndarray,
+    index_type: str,
+    params: dict | None = None,
+) -> "faiss.Index":
+    """使用给定的向量构建(必要时训练)一个新的索引。这是一个 CPU 密集的同步操作
+
+    Raises:
+        ValueError: 如果索引需要训练而向量数量不足
+    """
+    p = _params(params)
+    dimension = vectors.shape[1]
+    index = create_index(dimension, index_type, params)
+    if not index.is_trained:
+        need = min_train_size(index_type, params)
+        if len(vectors) < need:
+            raise ValueError(
+                f"训练 {index_type} 索引至少需要 {need} 个向量, 当前只有 {len(vectors)} 个"
+            )
+        train_vectors = vectors
+        if len(vectors) > p["max_train_size"]:
+            rng = np.random.default_rng(0)
+            sample = rng.choice(len(vectors), p["max_train_size"], replace=False)
+            train_vectors = vectors[sample]
+        index.train(np.ascontiguousarray(train_vectors, dtype=np.float32))
+    if len(ids):
+        index.add_with_ids(
+            np.ascontiguousarray(vectors, dtype=np.float32),
+            np.asarray(ids, dtype=np.int64),
+        )
+    return index
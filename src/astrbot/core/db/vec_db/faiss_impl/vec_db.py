@@ -1,9 +1,13 @@
+import os
 import uuid
 import json
 import numpy as np
 from .document_storage import DocumentStorage
 from .embedding_storage import EmbeddingStorage
+from .index_factory import export_vectors
 from ..base import Result, BaseVecDB
+from ..embedding_cache import EmbeddingCache
+from astrbot.core.utils.astrbot_path import get_astrbot_data_path
 from astrbot.core.provider.provider import EmbeddingProvider
 from astrbot.core.provider.provider import RerankProvider
 
@@ -19,19 +23,54 @@ class FaissVecDB(BaseVecDB):
         index_store_path: str,
         embedding_provider: EmbeddingProvider,
         rerank_provider: RerankProvider | None = None,
+        index_type: str = "flat",
+        index_params: dict | None = None,
+        use_embedding_cache: bool = True,
+        embedding_cache_path: str | None = None,
+        metadata_index_keys: list[str] | None = None,
     ):
+        """
+        Args:
+            index_type (str): FAISS 索引类型, 可选 flat, hnsw, ivf_flat, ivf_pq。
+                ivf_* 索引需要训练, 在向量数量足够之前会使用 flat 索引, 之后自动迁移。
+            index_params (dict): 索引参数, 如 hnsw_m, ef_search, nlist, nprobe, pq_m
+            use_embedding_cache (bool): 是否缓存文本的向量, 重复的查询和文档不会再次请求 Embedding 提供商
+            embedding_cache_path (str): 缓存数据库路径, 默认在 data 目录下, 由所有知识库共享
+            metadata_index_keys (list[str]): 需要建立索引的 metadata 键, 用于经常按该键过滤的场景。只能包含字母、数字与下划线
+        """
         self.doc_store_path = doc_store_path
         self.index_store_path = index_store_path
         self.embedding_provider = embedding_provider
         self.document_storage = DocumentStorage(doc_store_path)
         self.embedding_storage = EmbeddingStorage(
-            embedding_provider.get_dim(), index_store_path
+            embedding_provider.get_dim(),
+            index_store_path,
+            index_type=index_type,
+            index_params=index_params,
         )
         self.embedding_provider = embedding_provider
         self.rerank_provider = rerank_provider
+        self.metadata_index_keys = metadata_index_keys or []
+        self.embedding_cache = None
+        if use_embedding_cache:
+            self.embedding_cache = EmbeddingCache(
+                embedding_cache_path
+                or os.path.join(get_astrbot_data_path(), "embedding_cache.db"),
+                embedding_provider,
+            )
 
     async def initialize(self):
         await self.document_storage.initialize()
+        for key in self.metadata_index_keys:
+            await self.document_storage.ensure_metadata_index(key)
+        await self.embedding_storage.initialize()
+        if self.embedding_cache:
+            await self.embedding_cache.initialize()
+
+    async def _get_embedding(self, text: str) -> list[float]:
+        if self.embedding_cache:
+            return await self.embedding_cache.get_embedding(text)
+        return await self.embedding_provider.get_embedding(text)
 
     async def insert(
         self, content: str, metadata: dict | None = None, id: str | None = None
@@ -42,7 +81,7 @@ class FaissVecDB(BaseVecDB):
         metadata = metadata or {}
         str_id = id or str(uuid.uuid4())  # 使用 UUID 作为原始 ID
 
-        vector = await self.embedding_provider.get_embedding(content)
+        vector = await self._get_embedding(content)
         vector = np.array(vector, dtype=np.float32)
         async with self.document_storage.connection.cursor() as cursor:
             await cursor.execute(
@@ -57,6 +96,62 @@ class FaissVecDB(BaseVecDB):
             await self.embedding_storage.insert(vector, int_id)
             return int_id
 
+    async def insert_batch(
+        self,
+        contents: list[str],
+        metadatas: list[dict] | None = None,
+        ids: list[str] | None = None,
+        batch_size: int | None = None,
+    ) -> list[int]:
+        """
+        批量插入文本和其对应向量。
+
+        按照 batch_size 分批请求 Embedding, 全部成功后在一个事务中写入文档, 并一次性将向量加入 FAISS 索引。
+
+        Args:
+            contents (list[str]): 文本列表
+            metadatas (list[dict]): 与 contents 一一对应的元数据
+            ids (list[str]): 与 contents 一一对应的原始 ID, 不提供时使用 UUID
+            batch_size (int): 每次请求 Embedding 的文本数量, 默认使用 Embedding 提供商的配置
+
+        Returns:
+            list[int]: 插入的文档的 ID(主键)
+        """
+        if not contents:
+            return []
+        metadatas = metadatas or [{} for _ in contents]
+        str_ids = ids or [str(uuid.uuid4()) for _ in contents]
+        if len(metadatas) != len(contents) or len(str_ids) != len(contents):
+            raise ValueError("contents、metadatas 与 ids 的长度必须一致")
+        batch_size = batch_size or self.embedding_provider.get_batch_size()
+
+        if self.embedding_cache:
+            vectors = await self.embedding_cache.get_embeddings(contents, batch_size)
+        else:
+            vectors = []
+            for i in range(0, len(contents), batch_size):
+                batch = contents[i : i + batch_size]
+                vectors.extend(await self.embedding_provider.get_embeddings(batch))
+        vectors = np.array(vectors, dtype=np.float32)
+
+        conn = self.document_storage.connection
+        int_ids = []
+        try:
+            async with conn.cursor() as cursor:
+                for content, metadata, str_id in zip(contents, metadatas, str_ids):
+                    await cursor.execute(
+                        "INSERT INTO documents (doc_id, text, metadata) VALUES (?, ?, ?)",
+                        (str_id, content, json.dumps(metadata or {})),
+                    )
+                    int_ids.append(cursor.lastrowid)
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+
+        await self.embedding_storage.insert_batch(vectors, int_ids)
+        return int_ids
+
     async def retrieve(
         self,
         query: str,
@@ -71,25 +166,32 @@ class FaissVecDB(BaseVecDB):
         Args:
             query (str): 查询文本
             k (int): 返回的最相似文档的数量
-            fetch_k (int): 在根据 metadata 过滤前从 FAISS 中获取的数量
+            fetch_k (int): 已废弃。metadata 过滤会在 FAISS 索引内完成, 不再需要多取结果
             rerank (bool): 是否使用重排序。这需要在实例化时提供 rerank_provider, 如果未提供并且 rerank 为 True, 不会抛出异常。
             metadata_filters (dict): 元数据过滤器
 
         Returns:
             list[Result]: 查询结果
         """
-        embedding = await self.embedding_provider.get_embedding(query)
+        embedding = await self._get_embedding(query)
+        candidate_ids = None
+        if metadata_filters:
+            candidate_ids = await self.document_storage.get_ids_by_metadata(
+                metadata_filters
+            )
+            if not candidate_ids:
+                return []
         scores, indices = await self.embedding_storage.search(
             vector=np.array([embedding]).astype("float32"),
-            k=fetch_k if metadata_filters else k,
+            k=k,
+            ids=candidate_ids,
         )
         if len(indices[0]) == 0 or indices[0][0] == -1:
             return []
         # normalize scores
         scores[0] = 1.0 - (scores[0] / 2.0)
-        # NOTE: maybe the size is less than k.
         fetched_docs = await self.document_storage.get_documents(
-            metadata_filters=metadata_filters or {}, ids=indices[0]
+            metadata_filters={}, ids=indices[0]
         )
         if not fetched_docs:
             return []
@@ -119,17 +221,64 @@ class FaissVecDB(BaseVecDB):
 
         return top_k_results
 
-    async def delete(self, doc_id: int):
+    async def delete(self, doc_id: str):
         """
-        删除一条文档
+        删除一条文档, 并从 FAISS 索引中删除其向量
         """
-        await self.document_storage.connection.execute(
-            "DELETE FROM documents WHERE doc_id = ?", (doc_id,)
-        )
-        await self.document_storage.connection.commit()
+        conn = self.document_storage.connection
+        async with conn.cursor() as cursor:
+            await cursor.execute("SELECT id FROM documents WHERE doc_id = ?", (doc_id,))
+            int_ids = [row[0] for row in await cursor.fetchall()]
+            await cursor.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+        await conn.commit()
+        await self.embedding_storage.delete(int_ids)
+
+    async def compact(self):
+        """
+        清理 FAISS 索引中已经没有对应文档的向量(例如旧版本删除文档时遗留的向量), 并重建索引
+        """
+        _, index_ids = export_vectors(self.embedding_storage.index)
+        async with self.document_storage.connection.cursor() as cursor:
+            await cursor.execute("SELECT id FROM documents")
+            doc_ids = np.array(
+                [row[0] for row in await cursor.fetchall()], dtype=np.int64
+            )
+        orphans = index_ids[~np.isin(index_ids, doc_ids)]
+        if len(orphans):
+            await self.embedding_storage.delete(orphans.tolist())
+        await self.embedding_storage.rebuild()
+
+    async def stats(self) -> dict:
+        """
+        获取向量数据库的统计信息, 包括存活/已删除的向量数量与索引文件大小
+        """
+        return {
+            "documents": await self.count_documents(),
+            **self.embedding_storage.stats(),
+            "embedding_cache": self.embedding_cache.stats()
+            if self.embedding_cache
+            else None,
+        }
+
+    async def rebuild_index(
+        self, index_type: str | None = None, index_params: dict | None = None
+    ):
+        """
+        重建 FAISS 索引, 用于切换索引类型或重新训练
+        """
+        await self.embedding_storage.rebuild(index_type, index_params)
+
+    async def checkpoint(self):
+        """
+        立即将 FAISS 索引保存到磁盘
+        """
+        await self.embedding_storage.checkpoint()
 
     async def close(self):
+        await self.embedding_storage.checkpoint()
         await self.document_storage.close()
+        if self.embedding_cache:
+            await self.embedding_cache.close()
 
     async def count_documents(self) -> int:
         """
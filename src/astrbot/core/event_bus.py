@@ -1,24 +1,250 @@
 """
 事件总线, 用于处理事件的分发和处理
 事件总线是一个异步队列, 用于接收各种消息事件, 并将其发送到Scheduler调度器进行处理
-其中包含了一个无限循环的调度函数, 用于从事件队列中获取新的事件, 并创建一个新的异步任务来执行管道调度器的处理逻辑
+其中包含了一个无限循环的调度函数, 用于从事件队列中获取新的事件, 并交给对应配置文件的处理池执行管道调度器的处理逻辑
 
 class:
+    EventQueue: 有界的事件队列, 队列满时按照溢出策略处理新事件
     EventBus: 事件总线, 用于处理事件的分发和处理
 
 工作流程:
-1. 维护一个异步队列, 来接受各种消息事件
-2. 无限循环的调度函数, 从事件队列中获取新的事件, 打印日志并创建一个新的异步任务来执行管道调度器的处理逻辑
+1. 维护一个有界异步队列, 来接受各种消息事件
+2. 无限循环的调度函数, 从事件队列中获取新的事件, 打印日志并路由到对应配置文件的处理池
+3. 处理池维护自己的有界队列, 并限制同时执行的 pipeline 数量(max_in_flight)。max_in_flight <= 0 时不做限制, 每个事件直接创建一个异步任务
+4. 停止或重启时调用 drain(): 停止派发事件, 等待正在执行的 pipeline 完成, 返回还没有开始处理的事件
 """
 
 import asyncio
+import collections
+import enum
+import time
 from asyncio import Queue
+from typing import Any
 from astrbot.core.pipeline.scheduler import PipelineScheduler
 from astrbot.core import logger
+from astrbot.core.message.message_event_result import MessageChain
 from .platform import AstrMessageEvent
 from astrbot.core.astrbot_config_mgr import AstrBotConfigManager
 
 
+class OverflowPolicy(enum.Enum):
+    """事件队列满时的处理策略"""
+
+    DROP_OLDEST = "drop_oldest"
+    """丢弃队列中最旧的事件"""
+    COALESCE = "coalesce"
+    """丢弃队列中同一会话同一发送者的旧事件, 只保留最新的一条。找不到时退化为 drop_oldest"""
+    REJECT = "reject"
+    """拒绝新事件, 并向发送者回复一条提示"""
+
+
+class EventQueue(Queue):
+    """有界的事件队列。
+
+    - `put_nowait` 在队列满时不会抛出 `QueueFull`, 而是按照溢出策略处理, 因此消息平台适配器可以继续直接调用 `put_nowait`。
+    - 记录每个事件在队列中的等待时间(lag)以及被丢弃、合并、拒绝的事件数量。
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        policy: OverflowPolicy | str = OverflowPolicy.DROP_OLDEST,
+        reject_notice: str = "",
+    ):
+        super().__init__(maxsize)
+        self.policy = OverflowPolicy(policy)
+        self.reject_notice = reject_notice
+        self.dropped = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._lag_sum = 0.0
+        self._lag_cnt = 0
+        # 正在发送的拒绝提示, 保存引用以免任务被回收
+        self._notices: set[asyncio.Task] = set()
+
+    # 以下三个方法是 asyncio.Queue 预留的扩展点, 这里额外记录了入队时间
+    def _init(self, maxsize):
+        self._queue = collections.deque()
+
+    def _put(self, item):
+        self._queue.append((time.monotonic(), item))
+
+    def _get(self):
+        enqueued_at, item = self._queue.popleft()
+        lag = time.monotonic() - enqueued_at
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self._lag_sum += lag
+        self._lag_cnt += 1
+        return item
+
+    def put_nowait(self, item):
+        if self.full():
+            if not self._make_room(item):
+                return
+        super().put_nowait(item)
+
+    def _make_room(self, item) -> bool:
+        """队列满时腾出位置。返回 False 表示新事件被拒绝。"""
+        if self.policy == OverflowPolicy.REJECT:
+            self.rejected += 1
+            logger.warning(f"事件队列已满({self.maxsize}), 拒绝事件: {_outline(item)}")
+            if self.reject_notice and isinstance(item, AstrMessageEvent):
+                task = asyncio.create_task(
+                    item.send(MessageChain().message(self.reject_notice))
+                )
+                self._notices.add(task)
+                task.add_done_callback(self._on_notice_done)
+            return False
+
+        if self.policy == OverflowPolicy.COALESCE and isinstance(
+            item, AstrMessageEvent
+        ):
+            for queued in self._queue:
+                old = queued[1]
+                if (
+                    isinstance(old, AstrMessageEvent)
+                    and old.unified_msg_origin == item.unified_msg_origin
+                    and old.get_sender_id() == item.get_sender_id()
+                ):
+                    self._queue.remove(queued)
+                    self.coalesced += 1
+                    logger.debug(f"事件队列已满, 合并事件: {_outline(old)}")
+                    return True
+
+        _, old = self._queue.popleft()
+        self.dropped += 1
+        logger.warning(f"事件队列已满({self.maxsize}), 丢弃最旧事件: {_outline(old)}")
+        return True
+
+    def _on_notice_done(self, task: asyncio.Task):
+        self._notices.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.warning(f"发送事件队列已满的提示失败: {task.exception()}")
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queue_depth": self.qsize(),
+            "queue_size": self.maxsize,
+            "overflow_policy": self.policy.value,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "lag_last_ms": round(self.last_lag * 1000, 2),
+            "lag_avg_ms": round(self._lag_sum / self._lag_cnt * 1000, 2)
+            if self._lag_cnt
+            else 0.0,
+            "lag_max_ms": round(self.max_lag * 1000, 2),
+        }
+
+
+def _outline(event) -> str:
+    if isinstance(event, AstrMessageEvent):
+        return f"{event.unified_msg_origin} {event.get_message_outline()[:50]}"
+    return str(event)
+
+
+def get_dispatch_settings(conf: dict) -> dict[str, Any]:
+    """从配置文件中读取事件调度相关的配置"""
+    settings = conf.get("platform_settings", {}).get("event_dispatch", {})
+    return {
+        "max_in_flight": settings.get("max_in_flight", 0),
+        "queue_size": settings.get("queue_size", 1000),
+        "overflow_policy": settings.get("overflow_policy", "drop_oldest"),
+        "reject_notice": settings.get("reject_notice", ""),
+        "drain_timeout": settings.get("drain_timeout", 15),
+        "spool_max_age": settings.get("spool_max_age", 600),
+    }
+
+
+def _take_all(queue: Queue) -> list[AstrMessageEvent]:
+    """取出队列中的全部事件"""
+    events = []
+    while not queue.empty():
+        item = queue.get_nowait()
+        if item is not None:
+            events.append(item)
+    return events
+
+
+class DispatchPool:
+    """一个配置文件(即一个 PipelineScheduler)对应的事件处理池。
+
+    维护一个有界的事件队列, 并保证同时执行的 pipeline 数量不超过 max_in_flight。
+    """
+
+    def __init__(self, conf_id: str, bus: "EventBus", settings: dict[str, Any]):
+        self.conf_id = conf_id
+        self.bus = bus
+        self.max_in_flight = max(1, settings["max_in_flight"])
+        self.queue = EventQueue(
+            max(0, settings["queue_size"]),
+            settings["overflow_policy"],
+            settings["reject_notice"],
+        )
+        self.in_flight = 0
+        self.processed = 0
+        self._slot_freed = asyncio.Event()
+        self._closing = False
+        self._pending: AstrMessageEvent | None = None
+        """已经从队列中取出、正在等待空闲位置的事件"""
+        self._feeder = asyncio.create_task(
+            self._feed(), name=f"event_dispatch_pool_{conf_id}"
+        )
+
+    def submit(self, event: AstrMessageEvent):
+        self.queue.put_nowait(event)
+
+    def close(self):
+        """不再接收新的事件, 已排队的事件执行完毕后退出"""
+        self._closing = True
+        if self.queue.empty():
+            self.queue.put_nowait(None)  # 唤醒正在等待的 _feed
+
+    async def _feed(self):
+        while not (self._closing and self.queue.empty()):
+            event = await self.queue.get()
+            if event is None:
+                continue
+            self._pending = event
+            while self.in_flight >= self.max_in_flight:
+                self._slot_freed.clear()
+                await self._slot_freed.wait()
+            self._pending = None
+            self.in_flight += 1
+            task = self.bus._spawn(self.conf_id, event)
+            task.add_done_callback(self._on_done)
+
+    def drain(self) -> list[AstrMessageEvent]:
+        """立即停止派发事件, 返回还没有开始处理的事件"""
+        self._closing = True
+        self._feeder.cancel()
+        events = [self._pending] if self._pending else []
+        self._pending = None
+        events.extend(_take_all(self.queue))
+        return events
+
+    def _on_done(self, _: asyncio.Task):
+        self.in_flight -= 1
+        self.processed += 1
+        self._slot_freed.set()
+
+    @property
+    def finished(self) -> bool:
+        """已经关闭, 并且已排队的事件都执行完毕"""
+        return self._feeder.done() and self.in_flight == 0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self.queue.stats(),
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "processed": self.processed,
+        }
+
+
 class EventBus:
     """用于处理事件的分发和处理"""
 
@@ -32,14 +258,118 @@ class EventBus:
         # abconf uuid -> scheduler
         self.pipeline_scheduler_mapping = pipeline_scheduler_mapping
         self.astrbot_config_mgr = astrbot_config_mgr
+        # abconf uuid -> 处理池。仅在 max_in_flight > 0 时创建
+        self.pools: dict[str, DispatchPool] = {}
+        # 配置变更后被替换、仍在处理已排队事件的处理池
+        self._retired_pools: set[DispatchPool] = set()
+        self.unbounded_in_flight = 0
+        # 正在执行的 pipeline, 停止时等待它们完成
+        self._in_flight: set[asyncio.Task] = set()
+        self._dispatch_task: asyncio.Task | None = None
+        self.draining = False
 
     async def dispatch(self):
+        self._dispatch_task = asyncio.current_task()
         while True:
             event: AstrMessageEvent = await self.event_queue.get()
             conf_info = self.astrbot_config_mgr.get_conf_info(event.unified_msg_origin)
             self._print_event(event, conf_info["name"])
-            scheduler = self.pipeline_scheduler_mapping.get(conf_info["id"])
-            asyncio.create_task(scheduler.execute(event))
+            conf_id = conf_info["id"]
+            pool = self._get_pool(conf_id)
+            if pool:
+                pool.submit(event)
+            else:
+                self.unbounded_in_flight += 1
+                self._spawn(conf_id, event).add_done_callback(self._on_unbounded_done)
+
+    def _on_unbounded_done(self, _: asyncio.Task):
+        self.unbounded_in_flight -= 1
+
+    def _spawn(self, conf_id: str, event: AstrMessageEvent) -> asyncio.Task:
+        # 每次执行时重新获取调度器, 以便使用 reload_pipeline_scheduler 之后的新实例
+        scheduler = self.pipeline_scheduler_mapping.get(conf_id)
+        task = asyncio.create_task(scheduler.execute(event))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+        return task
+
+    def _get_pool(self, conf_id: str) -> DispatchPool | None:
+        if conf_id in self.pools:
+            return self.pools[conf_id]
+        scheduler = self.pipeline_scheduler_mapping.get(conf_id)
+        settings = get_dispatch_settings(scheduler.ctx.astrbot_config)
+        if settings["max_in_flight"] <= 0:
+            return None
+        pool = DispatchPool(conf_id, self, settings)
+        self.pools[conf_id] = pool
+        return pool
+
+    def reload_pool(self, conf_id: str):
+        """配置变更后重建处理池。旧的处理池会在执行完已排队的事件后退出。"""
+        self._prune_retired_pools()
+        pool = self.pools.pop(conf_id, None)
+        if pool:
+            pool.close()
+            self._retired_pools.add(pool)
+
+    def _prune_retired_pools(self):
+        self._retired_pools = {p for p in self._retired_pools if not p.finished}
+
+    async def drain(self, timeout: float) -> list[AstrMessageEvent]:
+        """停止派发事件, 并等待正在执行的 pipeline 完成。
+
+        超过 timeout 秒仍未完成的 pipeline 会被取消。
+
+        Returns:
+            list[AstrMessageEvent]: 已经收到但还没有开始处理的事件, 包括等待期间消息平台适配器新提交的事件
+        """
+        self.draining = True
+        if self._dispatch_task and not self._dispatch_task.done():
+            self._dispatch_task.cancel()
+        pending: list[AstrMessageEvent] = []
+        for pool in [*self.pools.values(), *self._retired_pools]:
+            pending.extend(pool.drain())
+        pending.extend(_take_all(self.event_queue))
+
+        in_flight = set(self._in_flight)
+        if in_flight:
+            logger.info(
+                f"正在等待 {len(in_flight)} 个正在处理的事件完成, 最多等待 {timeout} 秒..."
+            )
+            _, not_done = await asyncio.wait(in_flight, timeout=max(0.0, timeout))
+            if not_done:
+                logger.warning(
+                    f"{len(not_done)} 个事件未能在 {timeout} 秒内处理完毕, 将被取消。"
+                )
+                for task in not_done:
+                    task.cancel()
+                await asyncio.gather(*not_done, return_exceptions=True)
+
+        pending.extend(self.take_pending())
+        return pending
+
+    def take_pending(self) -> list[AstrMessageEvent]:
+        """取出事件总线队列中还没有派发的事件"""
+        return _take_all(self.event_queue)
+
+    def get_metrics(self) -> dict[str, Any]:
+        """获取事件总线的队列深度、等待时间等指标"""
+        self._prune_retired_pools()
+        if isinstance(self.event_queue, EventQueue):
+            bus_stats = self.event_queue.stats()
+        else:
+            bus_stats = {"queue_depth": self.event_queue.qsize()}
+        return {
+            **bus_stats,
+            "unbounded_in_flight": self.unbounded_in_flight,
+            "draining": self.draining,
+            "pools": {conf_id: pool.stats() for conf_id, pool in self.pools.items()},
+            # 被替换后仍在处理已排队事件的处理池
+            "retired_pools": [
+                {"conf_id": pool.conf_id, **pool.stats()}
+                for pool in self._retired_pools
+            ],
+        }
 
     def _print_event(self, event: AstrMessageEvent, conf_name: str):
         """用于记录事件信息
@@ -0,0 +1,239 @@
+"""
+事件暂存
+
+停止或重启 AstrBot 时, 事件总线会先停止派发新的事件, 等待正在处理的事件处理完毕。
+已经收到但还没有开始处理的事件会被写入 data/event_spool.json, 下次启动、平台适配器就绪后重新提交给对应的平台适配器处理,
+因此修改配置后重启不会丢失消息。
+
+暂存文件只保存 AstrBotMessage 的字段和消息链(JSON), 还原时不会执行任何代码。
+平台原始消息对象(raw_message)只有在可以被 JSON 序列化时才会保留,
+回复时依赖原始消息对象的平台(如 Discord、飞书)的事件不会被暂存。
+
+重新提交依赖平台适配器的 handle_msg(AstrBotMessage) 方法, 没有这个方法的平台适配器的事件会被丢弃。
+"""
+
+import asyncio
+import dataclasses
+import json
+import os
+import time
+from dataclasses import dataclass
+
+from astrbot.core import logger
+from astrbot.core.message.components import BaseMessageComponent, ComponentTypes
+from astrbot.core.platform import (
+    AstrBotMessage,
+    AstrMessageEvent,
+    Group,
+    MessageMember,
+    MessageType,
+)
+from astrbot.core.utils.astrbot_path import get_astrbot_data_path
+
+# 平台适配器启动后需要一段时间连接到消息平台, 之后再重新提交暂存的事件
+SPOOL_REPLAY_DELAY = 5
+
+SPOOL_VERSION = 1
+
+# 回复消息时需要原始消息对象(通常无法序列化)的平台, 这些平台的事件不会被暂存
+RAW_MESSAGE_REQUIRED_PLATFORMS = {
+    "discord",
+    "lark",
+    "dingtalk",
+    "weixin_official_account",
+    "qq_official",
+    "qq_official_webhook",
+}
+
+_COMPONENT_CLASSES: dict[str, type[BaseMessageComponent]] = {
+    cls.model_fields["type"].default.value: cls for cls in ComponentTypes.values()
+}
+
+
+@dataclass
+class SpooledEvent:
+    platform_id: str
+    message_obj: AstrBotMessage
+    spooled_at: float
+
+
+def _dump_value(value):
+    if isinstance(value, BaseMessageComponent):
+        return _dump_component(value)
+    if isinstance(value, (list, tuple)):
+        return [_dump_value(v) for v in value]
+    return value
+
+
+def _dump_component(comp: BaseMessageComponent) -> dict:
+    data = {k: _dump_value(v) for k, v in comp.__dict__.items() if k != "type"}
+    return {"component": comp.type.value, "data": data}
+
+
+def _load_value(value):
+    if isinstance(value, dict) and value.keys() == {"component", "data"}:
+        return _load_component(value)
+    if isinstance(value, list):
+        return [_load_value(v) for v in value]
+    return value
+
+
+def _load_component(record: dict) -> BaseMessageComponent:
+    cls = _COMPONENT_CLASSES.get(record["component"])
+    if cls is None:
+        raise ValueError(f"未知的消息段类型 {record['component']}")
+    data = {k: _load_value(v) for k, v in record["data"].items()}
+    # 不经过各个消息段的 __init__, 直接按字段还原
+    return cls.model_construct(**data)
+
+
+def dump_message(message_obj: AstrBotMessage) -> dict:
+    """把 AstrBotMessage 转换为可以被 JSON 序列化的字典"""
+    raw_message = message_obj.raw_message
+    try:
+        json.dumps(raw_message)
+    except (TypeError, ValueError):
+        # 平台原始消息对象通常引用了连接等无法序列化的对象
+        raw_message = None
+    group = getattr(message_obj, "group", None)
+    sender = getattr(message_obj, "sender", None)
+    return {
+        "type": message_obj.type.value,
+        "self_id": message_obj.self_id,
+        "session_id": message_obj.session_id,
+        "message_id": message_obj.message_id,
+        "group": dataclasses.asdict(group) if group else None,
+        "sender": dataclasses.asdict(sender) if sender else None,
+        "message": [_dump_component(comp) for comp in message_obj.message],
+        "message_str": message_obj.message_str,
+        "raw_message": raw_message,
+        "timestamp": message_obj.timestamp,
+    }
+
+
+def load_message(data: dict) -> AstrBotMessage:
+    """从 dump_message 的结果还原 AstrBotMessage"""
+    message_obj = AstrBotMessage()
+    message_obj.type = MessageType(data["type"])
+    message_obj.self_id = data["self_id"]
+    message_obj.session_id = data["session_id"]
+    message_obj.message_id = data["message_id"]
+    if data["group"]:
+        group = Group(**data["group"])
+        if group.members:
+            group.members = [MessageMember(**m) for m in group.members]
+        message_obj.group = group
+    if data["sender"]:
+        message_obj.sender = MessageMember(**data["sender"])
+    message_obj.message = [_load_component(comp) for comp in data["message"]]
+    message_obj.message_str = data["message_str"]
+    message_obj.raw_message = data["raw_message"]
+    message_obj.timestamp = data["timestamp"]
+    return message_obj
+
+
+class EventSpool:
+    def __init__(self, path: str | None = None):
+        self.path = path or os.path.join(get_astrbot_data_path(), "event_spool.json")
+
+    @staticmethod
+    def _dump(event: AstrMessageEvent) -> dict | None:
+        if event.platform_meta.name in RAW_MESSAGE_REQUIRED_PLATFORMS:
+            logger.debug(
+                f"平台 {event.platform_meta.name} 回复时需要原始消息对象, 不暂存事件 {event.unified_msg_origin}"
+            )
+            return None
+        try:
+            record = {
+                "platform_id": event.platform_meta.id,
+                "spooled_at": time.time(),
+                "message_obj": dump_message(event.message_obj),
+            }
+            # 提前检查能否序列化, 避免一个事件导致全部事件无法暂存
+            json.dumps(record)
+            return record
+        except Exception as e:
+            logger.warning(f"无法暂存事件 {event.unified_msg_origin}: {e}")
+            return None
+
+    def save(self, events: list[AstrMessageEvent]) -> int:
+        """暂存事件, 返回成功暂存的事件数量。会追加到尚未重新提交的暂存事件之后"""
+        records = [r for r in (self._dump(event) for event in events) if r]
+        if not records:
+            return 0
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": SPOOL_VERSION, "events": self._read() + records},
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, self.path)
+        return len(records)
+
+    def _read(self) -> list[dict]:
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != SPOOL_VERSION:
+                logger.warning(f"暂存事件文件 {self.path} 的版本不受支持, 已忽略。")
+                return []
+            return data["events"]
+        except Exception as e:
+            logger.warning(f"读取暂存事件文件 {self.path} 失败: {e}")
+            return []
+
+    def pop_all(self, max_age: float = 0) -> list[SpooledEvent]:
+        """取出全部暂存的事件并删除暂存文件。max_age 大于 0 时丢弃暂存时间超过 max_age 秒的事件"""
+        records = self._read()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        now = time.time()
+        events = []
+        for record in records:
+            try:
+                event = SpooledEvent(
+                    platform_id=record["platform_id"],
+                    message_obj=load_message(record["message_obj"]),
+                    spooled_at=record["spooled_at"],
+                )
+            except Exception as e:
+                logger.warning(f"无法还原暂存的事件: {e}")
+                continue
+            if max_age > 0 and now - event.spooled_at > max_age:
+                continue
+            events.append(event)
+        if len(events) < len(records):
+            logger.info(
+                f"丢弃了 {len(records) - len(events)} 个过期或无法还原的暂存事件。"
+            )
+        return events
+
+    async def replay(self, platform_insts: list, max_age: float = 0) -> int:
+        """把暂存的事件重新提交给对应的平台适配器, 返回重新提交的事件数量"""
+        events = self.pop_all(max_age)
+        if not events:
+            return 0
+        await asyncio.sleep(SPOOL_REPLAY_DELAY)
+        insts = {inst.meta().id: inst for inst in platform_insts}
+        replayed = 0
+        for event in events:
+            inst = insts.get(event.platform_id)
+            handle_msg = getattr(inst, "handle_msg", None)
+            if handle_msg is None:
+                logger.warning(
+                    f"平台适配器 {event.platform_id} 不存在或者不支持重新提交事件, 丢弃暂存的事件。"
+                )
+                continue
+            try:
+                await handle_msg(event.message_obj)
+                replayed += 1
+            except Exception as e:
+                logger.warning(f"重新提交暂存的事件到 {event.platform_id} 失败: {e}")
+        logger.info(f"已重新提交 {replayed} 个暂存的事件。")
+        return replayed
+
+
+event_spool = EventSpool()
@@ -34,7 +34,13 @@ from pydantic import BaseModel
 
 from astrbot.core import astrbot_config, file_token_service, logger
 from astrbot.core.utils.astrbot_path import get_astrbot_data_path
-from astrbot.core.utils.io import download_file, download_image_by_url, file_to_base64
+from astrbot.core.utils.io import (
+    download_file,
+    download_image_by_url,
+    file_to_base64_async,
+    run_in_media_pool,
+)
+from astrbot.core.utils.media_cache import media_cache
 
 
 class ComponentType(str, Enum):
@@ -191,11 +197,7 @@ class Record(BaseMessageComponent):
             return os.path.abspath(file_path)
         elif self.file.startswith("base64://"):
             bs64_data = self.file.removeprefix("base64://")
-            image_bytes = base64.b64decode(bs64_data)
-            temp_dir = os.path.join(get_astrbot_data_path(), "temp")
-            file_path = os.path.join(temp_dir, f"{uuid.uuid4()}.jpg")
-            with open(file_path, "wb") as f:
-                f.write(image_bytes)
+            file_path = await run_in_media_pool(media_cache.put_base64, bs64_data)
             return os.path.abspath(file_path)
         elif os.path.exists(self.file):
             return os.path.abspath(self.file)
@@ -212,14 +214,14 @@ class Record(BaseMessageComponent):
         if not self.file:
             raise Exception(f"not a valid file: {self.file}")
         if self.file.startswith("file:///"):
-            bs64_data = file_to_base64(self.file[8:])
+            bs64_data = await file_to_base64_async(self.file[8:])
         elif self.file.startswith("http"):
             file_path = await download_image_by_url(self.file)
-            bs64_data = file_to_base64(file_path)
+            bs64_data = await file_to_base64_async(file_path)
         elif self.file.startswith("base64://"):
             bs64_data = self.file
         elif os.path.exists(self.file):
-            bs64_data = file_to_base64(self.file)
+            bs64_data = await file_to_base64_async(self.file)
         else:
             raise Exception(f"not a valid file: {self.file}")
         bs64_data = bs64_data.removeprefix("base64://")
@@ -490,11 +492,7 @@ class Image(BaseMessageComponent):
             return os.path.abspath(image_file_path)
         elif url.startswith("base64://"):
             bs64_data = url.removeprefix("base64://")
-            image_bytes = base64.b64decode(bs64_data)
-            temp_dir = os.path.join(get_astrbot_data_path(), "temp")
-            image_file_path = os.path.join(temp_dir, f"{uuid.uuid4()}.jpg")
-            with open(image_file_path, "wb") as f:
-                f.write(image_bytes)
+            image_file_path = await run_in_media_pool(media_cache.put_base64, bs64_data)
             return os.path.abspath(image_file_path)
         elif os.path.exists(url):
             return os.path.abspath(url)
@@ -512,14 +510,14 @@ class Image(BaseMessageComponent):
         if not url:
             raise ValueError("No valid file or URL provided")
         if url.startswith("file:///"):
-            bs64_data = file_to_base64(url[8:])
+            bs64_data = await file_to_base64_async(url[8:])
         elif url.startswith("http"):
             image_file_path = await download_image_by_url(url)
-            bs64_data = file_to_base64(image_file_path)
+            bs64_data = await file_to_base64_async(image_file_path)
         elif url.startswith("base64://"):
             bs64_data = url
         elif os.path.exists(url):
-            bs64_data = file_to_base64(url)
+            bs64_data = await file_to_base64_async(url)
         else:
             raise Exception(f"not a valid file: {url}")
         bs64_data = bs64_data.removeprefix("base64://")
@@ -18,12 +18,16 @@ class ContentSafetyCheckStage(Stage):
         config = ctx.astrbot_config["content_safety"]
         self.strategy_selector = StrategySelector(config)
 
+    def is_noop(self) -> bool:
+        # 修改配置后会重建调度器并重新初始化本阶段, 因此可以只根据 initialize 时的配置判断
+        return not self.strategy_selector.enabled_strategies
+
     async def process(
         self, event: AstrMessageEvent, check_text: str = None
     ) -> None | AsyncGenerator[None, None]:
         """检查内容安全"""
         text = check_text if check_text else event.get_message_str()
-        ok, info = self.strategy_selector.check(text)
+        ok, info = await self.strategy_selector.check(text)
         if not ok:
             if event.is_at_or_wake_command:
                 event.set_result(
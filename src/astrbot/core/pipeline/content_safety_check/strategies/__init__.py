@@ -5,3 +5,7 @@ class ContentSafetyStrategy(abc.ABC):
     @abc.abstractmethod
     def check(self, content: str) -> tuple[bool, str]:
         raise NotImplementedError
+
+    async def check_async(self, content: str) -> tuple[bool, str]:
+        """异步检查。默认直接调用 check, 需要请求远程服务的策略应该重写此方法, 避免阻塞事件循环"""
+        return self.check(content)
@@ -2,18 +2,24 @@
 使用此功能应该先 pip install baidu-aip
 """
 
-from . import ContentSafetyStrategy
+from .remote import RemoteContentSafetyStrategy
 from aip import AipContentCensor
 
 
-class BaiduAipStrategy(ContentSafetyStrategy):
-    def __init__(self, appid: str, ak: str, sk: str) -> None:
+class BaiduAipStrategy(RemoteContentSafetyStrategy):
+    name = "baidu_aip"
+
+    def __init__(
+        self, appid: str, ak: str, sk: str, settings: dict | None = None
+    ) -> None:
+        super().__init__(settings)
         self.app_id = appid
         self.api_key = ak
         self.secret_key = sk
         self.client = AipContentCensor(self.app_id, self.api_key, self.secret_key)
 
     def check(self, content: str):
+        """同步请求百度内容审核。在事件循环中应该使用 check_async"""
         res = self.client.textCensorUserDefined(content)
         if "conclusionType" not in res:
             return False, ""
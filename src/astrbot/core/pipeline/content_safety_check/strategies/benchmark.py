@@ -0,0 +1,100 @@
+"""
+敏感词匹配基准测试
+
+随机生成中文敏感词表(大部分为普通词语, 少量为正则)与聊天消息, 比较逐个 re.search 的旧实现与 KeywordMatcher 的耗时,
+并校验两者的判定结果一致。
+
+用法:
+    python -m astrbot.core.pipeline.content_safety_check.strategies.benchmark --keywords 5000
+"""
+
+import argparse
+import random
+import re
+import time
+from .keyword_matcher import KeywordMatcher
+
+# 常用汉字, 用于生成词语与消息
+_CHARS = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经"
+    "十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处理府研质"
+)
+
+
+def random_word(rng: random.Random, min_len: int = 2, max_len: int = 4) -> str:
+    return "".join(rng.choice(_CHARS) for _ in range(rng.randint(min_len, max_len)))
+
+
+def synthetic_blocklist(
+    num: int, regex_ratio: float = 0.02, seed: int = 0
+) -> list[str]:
+    """生成敏感词表, 其中 regex_ratio 比例的词语是正则(如 "词.{0,3}语")"""
+    rng = random.Random(seed)
+    keywords = []
+    for _ in range(num):
+        if rng.random() < regex_ratio:
+            keywords.append(f"{random_word(rng, 1, 2)}.{{0,3}}{random_word(rng, 1, 2)}")
+        else:
+            keywords.append(random_word(rng))
+    return keywords
+
+
+def synthetic_messages(num: int, length: int = 80, seed: int = 1) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        "".join(rng.choice(_CHARS + "，。！？ abc123") for _ in range(length))
+        for _ in range(num)
+    ]
+
+
+def legacy_check(keywords: list[str], content: str) -> bool:
+    """旧实现: 对每个敏感词执行一次 re.search"""
+    for keyword in keywords:
+        if re.search(keyword, content):
+            return False
+    return True
+
+
+def run_benchmark(
+    num_keywords: int = 5000, num_messages: int = 200, length: int = 80
+) -> dict:
+    keywords = synthetic_blocklist(num_keywords)
+    messages = synthetic_messages(num_messages, length)
+
+    start = time.perf_counter()
+    matcher = KeywordMatcher(keywords)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    legacy = [legacy_check(keywords, m) for m in messages]
+    legacy_ms = (time.perf_counter() - start) * 1000 / num_messages
+
+    start = time.perf_counter()
+    compiled = [matcher.search(m) is None for m in messages]
+    matcher_ms = (time.perf_counter() - start) * 1000 / num_messages
+
+    return {
+        "keywords": num_keywords,
+        "literal": matcher.literal_count,
+        "regex": matcher.pattern_count,
+        "build_ms": round(build_ms, 2),
+        "legacy_ms_per_msg": round(legacy_ms, 4),
+        "matcher_ms_per_msg": round(matcher_ms, 4),
+        "speedup": round(legacy_ms / matcher_ms, 1) if matcher_ms else None,
+        "blocked": sum(not ok for ok in compiled),
+        "consistent": legacy == compiled,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="敏感词匹配基准测试")
+    parser.add_argument("--keywords", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--length", type=int, default=80, help="每条消息的字符数")
+    args = parser.parse_args()
+    for key, value in run_benchmark(args.keywords, args.messages, args.length).items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+多模式敏感词匹配
+
+将敏感词列表编译为一个匹配器, 一次扫描即可检查全部敏感词:
+- 不含正则元字符的普通词语使用 Aho-Corasick 自动机匹配, 耗时与文本长度成正比, 与词语数量无关;
+- 正则表达式合并为一个正则, 只扫描一次文本。含有反向引用等无法安全合并的正则单独匹配。
+"""
+
+import re
+from collections import deque
+from dataclasses import dataclass
+from astrbot import logger
+
+_REGEX_METACHARS = frozenset(".^$*+?{}[]\\|()")
+# 含有反向引用的正则合并后组号会发生变化, 含有全局内联标志的正则合并后会影响其他正则, 都不能合并
+_UNMERGEABLE = re.compile(r"\\\d|\(\?P=|^\(\?[aiLmsux]+\)")
+
+
+@dataclass
+class KeywordMatch:
+    keyword: str
+    """匹配到的敏感词(配置中的原始写法)"""
+    start: int
+    end: int
+
+
+class AhoCorasick:
+    """Aho-Corasick 多模式字符串匹配自动机"""
+
+    def __init__(self, words: list[str]):
+        # 每个状态的转移表、失配指针与输出(在这个状态结束的词语在 words 中的下标)
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[list[int]] = [[]]
+        self.words = words
+        for i, word in enumerate(words):
+            self._add(word, i)
+        self._build()
+
+    def _add(self, word: str, index: int):
+        state = 0
+        for ch in word:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = nxt
+        self._output[state].append(index)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                # 合并失配状态的输出, 匹配时不需要再沿着失配指针查找
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def iter_matches(self, text: str):
+        """按照结束位置的顺序产生 (词语下标, 起始位置, 结束位置)"""
+        goto, fail, output, words = self._goto, self._fail, self._output, self.words
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in output[state]:
+                yield index, pos + 1 - len(words[index]), pos + 1
+
+
+class KeywordMatcher:
+    """敏感词匹配器。匹配结果与对每个敏感词执行 re.search 相同"""
+
+    def __init__(self, keywords: list[str]):
+        literals: list[str] = []
+        patterns: list[str] = []
+        self._separate: list[tuple[str, re.Pattern]] = []
+        self._empty: str | None = None
+        for keyword in dict.fromkeys(k for k in keywords if isinstance(k, str)):
+            if not keyword:
+                # 空字符串可以匹配任何文本
+                self._empty = keyword
+            elif not _REGEX_METACHARS.intersection(keyword):
+                literals.append(keyword)
+            else:
+                try:
+                    compiled = re.compile(keyword)
+                except re.error as e:
+                    logger.warning(
+                        f"敏感词 {keyword} 不是合法的正则表达式({e}), 将按普通词语匹配。"
+                    )
+                    literals.append(keyword)
+                    continue
+                if _UNMERGEABLE.search(keyword):
+                    self._separate.append((keyword, compiled))
+                else:
+                    patterns.append(keyword)
+
+        self.literal_count = len(literals)
+        self.pattern_count = len(patterns) + len(self._separate)
+        self._automaton = AhoCorasick(literals) if literals else None
+        self._patterns = patterns
+        self._combined: re.Pattern | None = None
+        if patterns:
+            try:
+                self._combined = re.compile(
+                    "|".join(f"(?P<k{i}>{p})" for i, p in enumerate(patterns))
+                )
+            except re.error:
+                # 例如含有全局内联标志 (?i) 或者重名分组的正则无法合并, 逐个匹配
+                self._separate.extend((p, re.compile(p)) for p in patterns)
+                self._patterns = []
+
+    def search(self, text: str) -> KeywordMatch | None:
+        """返回任意一个匹配到的敏感词, 没有匹配时返回 None"""
+        if self._empty is not None:
+            return KeywordMatch(self._empty, 0, 0)
+        if self._automaton:
+            for index, start, end in self._automaton.iter_matches(text):
+                return KeywordMatch(self._automaton.words[index], start, end)
+        if self._combined:
+            m = self._combined.search(text)
+            if m:
+                return KeywordMatch(
+                    self._patterns[int(m.lastgroup[1:])], m.start(), m.end()
+                )
+        for keyword, compiled in self._separate:
+            m = compiled.search(text)
+            if m:
+                return KeywordMatch(keyword, m.start(), m.end())
+        return None
+
+    def find_all(self, text: str) -> list[KeywordMatch]:
+        """返回所有匹配到的敏感词及其位置, 按照起始位置排序。
+
+        普通词语会返回所有(可能重叠的)出现位置; 正则返回不重叠的匹配。
+        """
+        matches: list[KeywordMatch] = []
+        if self._empty is not None:
+            matches.append(KeywordMatch(self._empty, 0, 0))
+        if self._automaton:
+            for index, start, end in self._automaton.iter_matches(text):
+                matches.append(KeywordMatch(self._automaton.words[index], start, end))
+        if self._combined:
+            for m in self._combined.finditer(text):
+                matches.append(
+                    KeywordMatch(
+                        self._patterns[int(m.lastgroup[1:])], m.start(), m.end()
+                    )
+                )
+        for keyword, compiled in self._separate:
+            for m in compiled.finditer(text):
+                matches.append(KeywordMatch(keyword, m.start(), m.end()))
+        matches.sort(key=lambda m: (m.start, m.end))
+        return matches
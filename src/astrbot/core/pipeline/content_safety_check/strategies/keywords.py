@@ -1,5 +1,5 @@
-import re
 from . import ContentSafetyStrategy
+from .keyword_matcher import KeywordMatch, KeywordMatcher
 
 
 class KeywordsStrategy(ContentSafetyStrategy):
@@ -15,9 +15,14 @@ class KeywordsStrategy(ContentSafetyStrategy):
         #         self.keywords.extend(
         #             json.loads(base64.b64decode(f.read()).decode("utf-8"))["keywords"]
         #         )
+        # 修改配置后会重建 pipeline, 重新创建本策略, 因此这里只需要编译一次
+        self.matcher = KeywordMatcher(self.keywords)
+
+    def find(self, content: str) -> list[KeywordMatch]:
+        """返回匹配到的所有敏感词及其位置"""
+        return self.matcher.find_all(content)
 
     def check(self, content: str) -> bool:
-        for keyword in self.keywords:
-            if re.search(keyword, content):
-                return False, "内容安全检查不通过，匹配到敏感词。"
+        if self.matcher.search(content):
+            return False, "内容安全检查不通过，匹配到敏感词。"
         return True, ""
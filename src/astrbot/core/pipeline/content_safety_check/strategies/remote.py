@@ -0,0 +1,144 @@
+"""
+远程内容审核策略的基类
+
+远程审核接口一般是同步的 HTTP 请求, 直接在事件循环中调用会阻塞整个机器人。这里:
+- 在所有远程策略共享的线程池中调用同步接口, 并限制每个策略同时进行的请求数;
+- 按照内容的哈希缓存审核结果, 相同的内容在有效期内不会重复请求;
+- 连续失败多次后熔断一段时间, 熔断期间不再请求远程服务, 直接按照 fail_open 处理。
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from astrbot import logger
+from . import ContentSafetyStrategy
+
+DEFAULT_REMOTE_SETTINGS = {
+    "timeout": 5,
+    "cache_ttl": 600,
+    "max_concurrency": 4,
+    "failure_threshold": 5,
+    "recovery_time": 30,
+    "fail_open": True,
+}
+
+# 所有远程策略共享的线程池。修改配置后会重建 pipeline 与其中的策略, 共享线程池避免每次重建都留下一个线程池。
+# 每个策略同时进行的请求数由各自的信号量(max_concurrency)限制
+_remote_executor = ThreadPoolExecutor(thread_name_prefix="astrbot-content-safety")
+
+
+class RemoteContentSafetyStrategy(ContentSafetyStrategy):
+    """请求远程服务的内容安全策略。子类实现同步的 check 方法即可"""
+
+    name = "remote"
+
+    def __init__(self, settings: dict | None = None) -> None:
+        self.settings = {**DEFAULT_REMOTE_SETTINGS, **(settings or {})}
+        max_concurrency = max(1, int(self.settings["max_concurrency"]))
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # 内容哈希 -> (结果, 过期时间)
+        self._cache: OrderedDict[str, tuple[tuple[bool, str], float]] = OrderedDict()
+        self._max_cache_size = 4096
+        # 正在进行的请求, 相同内容的并发请求共享同一个结果
+        self._pending: dict[str, asyncio.Future] = {}
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(content: str) -> str:
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def _get_cached(self, key: str) -> tuple[bool, str] | None:
+        item = self._cache.get(key)
+        if item is None:
+            return None
+        result, expire = item
+        if expire < time.monotonic():
+            self._cache.pop(key, None)
+            return None
+        self._cache.move_to_end(key)
+        return result
+
+    def _set_cached(self, key: str, result: tuple[bool, str]):
+        ttl = self.settings["cache_ttl"]
+        if ttl <= 0:
+            return
+        self._cache[key] = (result, time.monotonic() + ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._max_cache_size:
+            self._cache.popitem(last=False)
+
+    @property
+    def circuit_open(self) -> bool:
+        return time.monotonic() < self._open_until
+
+    def _fallback(self, reason: str) -> tuple[bool, str]:
+        if self.settings["fail_open"]:
+            return True, ""
+        return False, f"内容安全审核服务不可用：{reason}"
+
+    def _record_failure(self):
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= self.settings["failure_threshold"]:
+            self._open_until = time.monotonic() + self.settings["recovery_time"]
+            logger.warning(
+                f"内容安全审核服务 {self.name} 连续失败 {self._consecutive_failures} 次，"
+                f"将在 {self.settings['recovery_time']} 秒内跳过审核。"
+            )
+
+    async def check_async(self, content: str) -> tuple[bool, str]:
+        key = self._key(content)
+        cached = self._get_cached(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        if self.circuit_open:
+            return self._fallback("熔断中")
+        task = self._pending.get(key)
+        if task is None:
+            # 请求在独立的 Task 中进行, 某个等待者被取消不会影响其他等待者
+            task = asyncio.create_task(self._request(key, content))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _call(self, content: str) -> tuple[bool, str]:
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(
+                _remote_executor, self.check, content
+            )
+
+    async def _request(self, key: str, content: str) -> tuple[bool, str]:
+        try:
+            # 排队等待的时间也计入超时, 审核服务变慢时不会让消息无限堆积
+            result = await asyncio.wait_for(
+                self._call(content), self.settings["timeout"]
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"内容安全审核服务 {self.name} 请求超时。")
+            self._record_failure()
+            return self._fallback("请求超时")
+        except Exception as e:
+            logger.warning(f"内容安全审核服务 {self.name} 请求失败: {e}")
+            self._record_failure()
+            return self._fallback(str(e))
+        self._consecutive_failures = 0
+        self._set_cached(key, result)
+        return result
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "cache_size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "circuit_open": self.circuit_open,
+            "consecutive_failures": self._consecutive_failures,
+        }
@@ -1,4 +1,5 @@
 from . import ContentSafetyStrategy
+from .remote import RemoteContentSafetyStrategy
 
 from astrbot import logger
 
@@ -6,6 +7,12 @@ from astrbot import logger
 class StrategySelector:
     def __init__(self, config: dict) -> None:
         self.enabled_strategies: list[ContentSafetyStrategy] = []
+        self.reload(config)
+
+    def reload(self, config: dict) -> None:
+        """根据配置重新创建各个策略"""
+        self.config = config
+        self.enabled_strategies = []
         if config["internal_keywords"]["enable"]:
             from .keywords import KeywordsStrategy
 
@@ -23,12 +30,22 @@ class StrategySelector:
                     config["baidu_aip"]["app_id"],
                     config["baidu_aip"]["api_key"],
                     config["baidu_aip"]["secret_key"],
+                    config.get("remote"),
                 )
             )
 
-    def check(self, content: str) -> tuple[bool, str]:
+    def stats(self) -> list[dict]:
+        """远程策略的缓存与熔断指标"""
+        return [
+            strategy.stats()
+            for strategy in self.enabled_strategies
+            if isinstance(strategy, RemoteContentSafetyStrategy)
+        ]
+
+    async def check(self, content: str) -> tuple[bool, str]:
+        # 本地策略在前, 被本地策略拦截的内容不需要再请求远程服务
         for strategy in self.enabled_strategies:
-            ok, info = strategy.check(content)
+            ok, info = await strategy.check_async(content)
             if not ok:
                 return False, info
         return True, ""
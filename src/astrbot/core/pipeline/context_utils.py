@@ -6,6 +6,7 @@ from astrbot.core.star.star_handler import star_handlers_registry, EventType
 from astrbot.core.star.star import star_map
 from astrbot.core.message.message_event_result import MessageEventResult, CommandResult
 from astrbot.core.platform.astr_message_event import AstrMessageEvent
+from astrbot.core.utils.tracing import tracer, trace_async_gen
 
 
 async def call_handler(
@@ -30,6 +31,9 @@ async def call_handler(
     ready_to_call = None  # 一个协程或者异步生成器
 
     trace_ = None
+    handler_name = (
+        f"{getattr(handler, '__module__', '')}_{getattr(handler, '__name__', '')}"
+    )
 
     try:
         ready_to_call = handler(event, *args, **kwargs)
@@ -39,7 +43,9 @@ async def call_handler(
     if inspect.isasyncgen(ready_to_call):
         _has_yielded = False
         try:
-            async for ret in ready_to_call:
+            async for ret in trace_async_gen(
+                ready_to_call, "star_handler", handler_name, event.unified_msg_origin
+            ):
                 # 这里逐步执行异步生成器, 对于每个 yield 返回的 ret, 执行下面的代码
                 # 返回值只能是 MessageEventResult 或者 None（无返回值）
                 _has_yielded = True
@@ -59,7 +65,8 @@ async def call_handler(
             raise e
     elif inspect.iscoroutine(ready_to_call):
         # 如果只是一个协程, 直接执行
-        ret = await ready_to_call
+        with tracer.span("star_handler", handler_name, event.unified_msg_origin):
+            ret = await ready_to_call
         if isinstance(ret, (MessageEventResult, CommandResult)):
             event.set_result(ret)
             yield
@@ -86,7 +93,10 @@ async def call_event_hook(
             logger.debug(
                 f"hook({hook_type.name}) -> {star_map[handler.handler_module_path].name} - {handler.handler_name}"
             )
-            await handler.handler(event, *args, **kwargs)
+            with tracer.span(
+                "star_handler", handler.handler_full_name, event.unified_msg_origin
+            ):
+                await handler.handler(event, *args, **kwargs)
         except BaseException:
             logger.error(traceback.format_exc())
 
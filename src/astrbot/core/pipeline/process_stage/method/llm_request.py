@@ -16,6 +16,7 @@ from astrbot.core.message.message_event_result import (
 )
 from astrbot.core.platform.astr_message_event import AstrMessageEvent
 from astrbot.core.provider import Provider
+from astrbot.core.provider.tokenizer import IMAGE_TOKENS, TokenCounter, get_tokenizer
 from astrbot.core.provider.entities import (
     LLMResponse,
     ProviderRequest,
@@ -25,10 +26,12 @@ from astrbot.core.agent.runners.tool_loop_agent_runner import ToolLoopAgentRunne
 from astrbot.core.agent.run_context import ContextWrapper
 from astrbot.core.agent.tool import ToolSet, FunctionTool
 from astrbot.core.agent.tool_executor import BaseFunctionToolExecutor
+from astrbot.core.agent.tool_cache import tool_result_cache
 from astrbot.core.agent.handoff import HandoffTool
 from astrbot.core.star.session_llm_manager import SessionServiceManager
 from astrbot.core.star.star_handler import EventType
 from astrbot.core.utils.metrics import Metric
+from astrbot.core.utils.tracing import tracer
 from ...context import PipelineContext, call_event_hook, call_handler
 from ..stage import Stage
 from astrbot.core.provider.register import llm_tools
@@ -63,16 +66,51 @@ class FunctionToolExecutor(BaseFunctionToolExecutor[AstrAgentContext]):
             return
 
         if tool.origin == "local":
-            async for r in cls._execute_local(tool, run_context, **tool_args):
+            execute = cls._execute_local
+        elif tool.origin == "mcp":
+            execute = cls._execute_mcp
+        else:
+            raise Exception(f"Unknown function origin: {tool.origin}")
+
+        async for r in cls._execute_cached(tool, run_context, execute, **tool_args):
+            yield r
+
+    @classmethod
+    async def _execute_cached(
+        cls,
+        tool: FunctionTool,
+        run_context: ContextWrapper[AstrAgentContext],
+        execute,
+        **tool_args,
+    ):
+        """声明了 cache_ttl 的工具, 在缓存时间内相同参数的调用直接返回缓存的结果"""
+        if not tool.cache_ttl or tool.cache_ttl <= 0:
+            async for r in execute(tool, run_context, **tool_args):
                 yield r
             return
 
-        elif tool.origin == "mcp":
-            async for r in cls._execute_mcp(tool, run_context, **tool_args):
+        scope = None
+        if tool.cache_scope == "session" and run_context.event:
+            scope = run_context.event.unified_msg_origin
+        key = tool_result_cache.make_key(tool.name, tool_args, scope)
+        cached = tool_result_cache.get(tool.name, key)
+        if cached is not None:
+            logger.debug(f"工具 {tool.name} 命中结果缓存。")
+            for r in cached:
                 yield r
             return
 
-        raise Exception(f"Unknown function origin: {tool.origin}")
+        results = []
+        # 只缓存成功的、只返回了结果的调用。直接给用户发送了消息的调用不缓存
+        cacheable = True
+        async for r in execute(tool, run_context, **tool_args):
+            if isinstance(r, mcp.types.CallToolResult) and not r.isError:
+                results.append(r)
+            else:
+                cacheable = False
+            yield r
+        if cacheable and results:
+            tool_result_cache.set(key, results, tool.cache_ttl)
 
     @classmethod
     async def _execute_handoff(
@@ -298,8 +336,20 @@ class LLMRequestSubStage(Stage):
             max(1, settings["dequeue_context_length"]),
             self.max_context_length - 1,
         )
+        # 按照 Token 预算截断上下文, 0 为不限制
+        self.max_context_tokens: int = settings.get("max_context_tokens", 0)
+        self.token_counter = None
+        if self.max_context_tokens > 0:
+            self.token_counter = TokenCounter(
+                get_tokenizer(settings.get("context_tokenizer", "auto"))
+            )
+            logger.info(
+                f"上下文 Token 预算: {self.max_context_tokens}, 分词器: {self.token_counter.tokenizer.name}"
+            )
         self.streaming_response: bool = settings["streaming_response"]
         self.max_step: int = settings.get("max_agent_step", 30)
+        self.tool_call_concurrency: int = settings.get("tool_call_concurrency", 4)
+        self.tool_call_timeout: int = settings.get("tool_call_timeout", 0)
         if isinstance(self.max_step, bool):  # workaround: #2622
             self.max_step = 30
         self.show_tool_use: bool = settings.get("show_tool_use_status", True)
@@ -330,10 +380,15 @@ class LLMRequestSubStage(Stage):
         conv_mgr = self.conv_manager
 
         # 获取对话上下文
+        # 限制了对话轮数时, 只读取最近的若干轮
+        last_turns = None
+        if self.max_context_length != -1:
+            last_turns = self.max_context_length
+
         cid = await conv_mgr.get_curr_conversation_id(umo)
         if not cid:
             cid = await conv_mgr.new_conversation(umo, event.get_platform_id())
-        conversation = await conv_mgr.get_conversation(umo, cid)
+        conversation = await conv_mgr.get_conversation(umo, cid, last_turns=last_turns)
         if not conversation:
             cid = await conv_mgr.new_conversation(umo, event.get_platform_id())
             conversation = await conv_mgr.get_conversation(umo, cid)
@@ -396,6 +451,8 @@ class LLMRequestSubStage(Stage):
 
         if isinstance(req.contexts, str):
             req.contexts = json.loads(req.contexts)
+        # 下面的截断只作用于这一次请求, 保存历史记录时使用截断前的上下文
+        untruncated_contexts = req.contexts
 
         # max context length
         if (
@@ -418,6 +475,10 @@ class LLMRequestSubStage(Stage):
             if index is not None and index > 0:
                 req.contexts = req.contexts[index:]
 
+        # max context tokens
+        if self.token_counter and req.contexts:
+            self._truncate_by_tokens(req)
+
         # session_id
         if not req.session_id:
             req.session_id = event.unified_msg_origin
@@ -469,6 +530,8 @@ class LLMRequestSubStage(Stage):
             tool_executor=FunctionToolExecutor(),
             agent_hooks=MAIN_AGENT_HOOKS,
             streaming=self.streaming_response,
+            tool_call_concurrency=self.tool_call_concurrency,
+            tool_call_timeout=self.tool_call_timeout,
         )
 
         if self.streaming_response:
@@ -499,7 +562,9 @@ class LLMRequestSubStage(Stage):
             async for _ in run_agent(agent_runner, self.max_step, self.show_tool_use):
                 yield
 
-        await self._save_to_history(event, req, agent_runner.get_final_llm_resp())
+        await self._save_to_history(
+            event, req, agent_runner.get_final_llm_resp(), untruncated_contexts
+        )
 
         # 异步处理 WebChat 特殊情况
         if event.get_platform_name() == "webchat":
@@ -519,16 +584,17 @@ class LLMRequestSubStage(Stage):
                 return
             cleaned_text = "User: " + latest_pair[0].get("content", "").strip()
             logger.debug(f"WebChat 对话标题生成请求，清理后的文本: {cleaned_text}")
-            llm_resp = await prov.text_chat(
-                system_prompt="You are expert in summarizing user's query.",
-                prompt=(
-                    f"Please summarize the following query of user:\n"
-                    f"{cleaned_text}\n"
-                    "Only output the summary within 10 words, DO NOT INCLUDE any other text."
-                    "You must use the same language as the user."
-                    "If you think the dialog is too short to summarize, only output a special mark: `<None>`"
-                ),
-            )
+            with tracer.span("provider", prov.meta().id, event.unified_msg_origin):
+                llm_resp = await prov.text_chat(
+                    system_prompt="You are expert in summarizing user's query.",
+                    prompt=(
+                        f"Please summarize the following query of user:\n"
+                        f"{cleaned_text}\n"
+                        "Only output the summary within 10 words, DO NOT INCLUDE any other text."
+                        "You must use the same language as the user."
+                        "If you think the dialog is too short to summarize, only output a special mark: `<None>`"
+                    ),
+                )
             if llm_resp and llm_resp.completion_text:
                 logger.debug(
                     f"WebChat 对话标题生成响应: {llm_resp.completion_text.strip()}"
@@ -547,7 +613,13 @@ class LLMRequestSubStage(Stage):
         event: AstrMessageEvent,
         req: ProviderRequest,
         llm_response: LLMResponse | None,
+        contexts: list[dict] | None = None,
     ):
+        """保存这一轮对话。
+
+        Args:
+            contexts: 按照轮数、Token 预算截断之前的上下文, 默认为 req.contexts
+        """
         if (
             not req
             or not req.conversation
@@ -560,23 +632,71 @@ class LLMRequestSubStage(Stage):
             logger.debug("LLM 响应为空，不保存记录。")
             return
 
-        # 历史上下文
-        messages = copy.deepcopy(req.contexts)
         # 这一轮对话请求的用户输入
-        messages.append(await req.assemble_context())
+        new_messages = [await req.assemble_context()]
         # 这一轮对话的 LLM 响应
         if req.tool_calls_result:
             if not isinstance(req.tool_calls_result, list):
-                messages.extend(req.tool_calls_result.to_openai_messages())
+                new_messages.extend(req.tool_calls_result.to_openai_messages())
             elif isinstance(req.tool_calls_result, list):
                 for tcr in req.tool_calls_result:
-                    messages.extend(tcr.to_openai_messages())
-        messages.append({"role": "assistant", "content": llm_response.completion_text})
-        messages = list(filter(lambda item: "_no_save" not in item, messages))
+                    new_messages.extend(tcr.to_openai_messages())
+        new_messages.append(
+            {"role": "assistant", "content": llm_response.completion_text}
+        )
+        new_messages = [item for item in new_messages if "_no_save" not in item]
+
+        # 历史上下文
+        if contexts is None:
+            contexts = req.contexts
+        contexts = [item for item in contexts if "_no_save" not in item]
+        stored = json.loads(req.conversation.history or "[]")
+        if self._is_suffix(contexts, stored):
+            # 上下文仍是已存储的历史记录(或者它的后缀), 只需追加这一轮对话
+            await self.conv_manager.append_conversation_history(
+                event.unified_msg_origin, req.conversation.cid, messages=new_messages
+            )
+            return
+
+        # 上下文被插件等修改过, 重写整个历史记录
+        messages = copy.deepcopy(contexts)
+        messages.extend(new_messages)
+        if self.max_context_length != -1:
+            # 请求时只读取了最近的若干轮对话, 被修改的只是这一部分, 需要保留更早的历史记录
+            full_conv = await self.conv_manager.get_conversation(
+                event.unified_msg_origin, req.conversation.cid
+            )
+            if full_conv:
+                full_history = json.loads(full_conv.history or "[]")
+                messages = full_history[: len(full_history) - len(stored)] + messages
         await self.conv_manager.update_conversation(
             event.unified_msg_origin, req.conversation.cid, history=messages
         )
 
+    def _truncate_by_tokens(self, req: ProviderRequest):
+        """在请求发出之前按照 Token 预算截断上下文, 而不是等待提供商返回上下文超长的错误后再重试"""
+        counter = self.token_counter
+        budget = (
+            self.max_context_tokens
+            - counter.count_text(req.system_prompt or "")
+            - counter.count_text(req.prompt or "")
+            - len(req.image_urls or []) * IMAGE_TOKENS
+        )
+        contexts = counter.truncate(req.contexts, max(budget, 0))
+        if len(contexts) < len(req.contexts):
+            logger.debug(
+                f"上下文超过 Token 预算 {self.max_context_tokens}, 丢弃了 {len(req.contexts) - len(contexts)} 条记录。"
+            )
+            req.contexts = contexts
+
+    @staticmethod
+    def _is_suffix(contexts: list[dict], stored: list[dict]) -> bool:
+        if not contexts:
+            return not stored
+        if len(contexts) > len(stored):
+            return False
+        return stored[len(stored) - len(contexts) :] == contexts
+
     def fix_messages(self, messages: list[dict]) -> list[dict]:
         """验证并且修复上下文"""
         fixed_messages = []
@@ -11,6 +11,7 @@ from astrbot.core.platform.message_type import MessageType
 from astrbot.core.star.session_llm_manager import SessionServiceManager
 from astrbot.core.star.star import star_map
 from astrbot.core.star.star_handler import EventType, star_handlers_registry
+from astrbot.core.utils.tracing import tracer
 
 from ..context import PipelineContext
 from ..stage import Stage, register_stage, registered_stages
@@ -111,7 +112,12 @@ class ResultDecorateStage(Stage):
                     logger.warning(
                         "启用流式输出时，依赖发送消息前事件钩子的插件可能无法正常工作"
                     )
-                await handler.handler(event)
+                with tracer.span(
+                    "star_handler",
+                    handler.handler_full_name,
+                    event.unified_msg_origin,
+                ):
+                    await handler.handler(event)
                 if event.get_result() is None or not event.get_result().chain:
                     logger.debug(
                         f"hook(on_decorating_result) -> {star_map[handler.handler_module_path].name} - {handler.handler_name} 将消息结果清空。"
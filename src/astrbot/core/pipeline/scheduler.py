@@ -1,9 +1,24 @@
+import inspect
+import time
+from dataclasses import dataclass
 from . import STAGES_ORDER
-from .stage import registered_stages
+from .stage import registered_stages, Stage
 from .context import PipelineContext
 from typing import AsyncGenerator
 from astrbot.core.platform import AstrMessageEvent
 from astrbot.core import logger
+from astrbot.core.utils.latency_histogram import LatencyHistogram
+from astrbot.core.utils.tracing import tracer
+
+
+@dataclass
+class PlanStep:
+    """执行计划中的一个阶段"""
+
+    stage: Stage
+    name: str
+    is_generator: bool
+    """process 是否为异步生成器(洋葱模型), 在编译时确定, 执行时不再需要判断"""
 
 
 class PipelineScheduler:
@@ -15,6 +30,9 @@ class PipelineScheduler:
         )  # 按照顺序排序
         self.ctx = context  # 上下文对象
         self.stages = []  # 存储阶段实例
+        self.plan: list[PlanStep] = []  # 编译后的执行计划
+        self.stage_histograms: dict[str, LatencyHistogram] = {}
+        self.total_histogram = LatencyHistogram()
 
     async def initialize(self):
         """初始化管道调度器时, 初始化所有阶段"""
@@ -22,59 +40,133 @@ class PipelineScheduler:
             stage_instance = stage_cls()  # 创建实例
             await stage_instance.initialize(self.ctx)
             self.stages.append(stage_instance)
+        self._compile()
+
+    def _compile(self):
+        """将阶段列表编译为扁平的执行计划, 跳过在当前配置下不会产生影响的阶段"""
+        self.plan = []
+        for stage in self.stages:
+            name = stage.__class__.__name__
+            if stage.is_noop():
+                logger.debug(f"阶段 {name} 在当前配置下不会生效, 已跳过。")
+                continue
+            self.plan.append(
+                PlanStep(
+                    stage=stage,
+                    name=name,
+                    is_generator=inspect.isasyncgenfunction(stage.process),
+                )
+            )
+            self.stage_histograms.setdefault(name, LatencyHistogram())
+
+    @staticmethod
+    async def _advance(gen: AsyncGenerator) -> bool:
+        """让生成器执行到下一个 yield。返回 False 表示生成器已经结束"""
+        try:
+            await gen.__anext__()
+            return True
+        except StopAsyncIteration:
+            return False
 
     async def _process_stages(self, event: AstrMessageEvent, from_stage=0):
-        """依次执行各个阶段
+        """按照执行计划依次执行各个阶段
+
+        异步生成器阶段实现洋葱模型: yield 之前为前置处理, 之后会执行所有后续阶段, 后续阶段执行完毕后再恢复生成器执行后置处理。
+        生成器每 yield 一次, 后续阶段都会被执行一次; 生成器结束后, 继续执行后续阶段。
+        这里用一个显式的栈保存尚未结束的生成器, 代替逐层递归。
+
+        事件被终止时的行为与逐层递归时一致:
+        - 普通阶段终止事件后, 结束当前这一层, 回到外层的生成器;
+        - 生成器阶段终止事件后(或者回到它时事件已被终止), 该生成器不再恢复, 但仍会继续执行它之后的阶段,
+          直到遇到下一个普通阶段。因此插件 `yield event.plain_result(...).stop_event()` 时, 结果仍会经过 ResultDecorateStage 并由 RespondStage 发送。
 
         Args:
             event (AstrMessageEvent): 事件对象
-            from_stage (int): 从第几个阶段开始执行, 默认从0开始
+            from_stage (int): 从执行计划的第几个阶段开始执行, 默认从0开始
         """
-        for i in range(from_stage, len(self.stages)):
-            stage = self.stages[i]  # 获取当前要执行的阶段
-            # logger.debug(f"执行阶段 {stage.__class__.__name__}")
-            coroutine = stage.process(
-                event
-            )  # 调用阶段的process方法, 返回协程或者异步生成器
-
-            if isinstance(coroutine, AsyncGenerator):
-                # 如果返回的是异步生成器, 实现洋葱模型的核心
-                async for _ in coroutine:
-                    # 此处是前置处理完成后的暂停点(yield), 下面开始执行后续阶段
-                    if event.is_stopped():
-                        logger.debug(
-                            f"阶段 {stage.__class__.__name__} 已终止事件传播。"
-                        )
-                        break
-
-                    # 递归调用, 处理所有后续阶段
-                    await self._process_stages(event, i + 1)
+        plan = self.plan
+        timings: dict[str, float] = {}
+        # 尚未结束的生成器: (在执行计划中的位置, 生成器)
+        stack: list[tuple[int, AsyncGenerator]] = []
+        i = from_stage
 
-                    # 此处是后续所有阶段处理完毕后返回的点, 执行后置处理
-                    if event.is_stopped():
-                        logger.debug(
-                            f"阶段 {stage.__class__.__name__} 已终止事件传播。"
-                        )
+        try:
+            while True:
+                # 向前执行阶段, 直到执行到末尾或者普通阶段终止了事件
+                while i < len(plan):
+                    current = plan[i]
+                    start = time.perf_counter()
+                    if current.is_generator:
+                        gen = current.stage.process(event)
+                        if await self._advance(gen):
+                            if event.is_stopped():
+                                logger.debug(f"阶段 {current.name} 已终止事件传播。")
+                                await gen.aclose()
+                            else:
+                                stack.append((i, gen))
+                    else:
+                        await current.stage.process(event)
+                    timings[current.name] = (
+                        timings.get(current.name, 0.0) + time.perf_counter() - start
+                    )
+                    i += 1
+                    if not current.is_generator and event.is_stopped():
+                        logger.debug(f"阶段 {current.name} 已终止事件传播。")
                         break
-            else:
-                # 如果返回的是普通协程(不含yield的async函数), 则不进入下一层(基线条件)
-                # 简单地等待它执行完成, 然后继续执行下一个阶段
-                await coroutine
 
-                if event.is_stopped():
-                    logger.debug(f"阶段 {stage.__class__.__name__} 已终止事件传播。")
+                if not stack:
                     break
 
+                # 回到最内层的生成器。事件未被终止时恢复它执行后置处理, 再次 yield 时重新执行后续阶段
+                pos, gen = stack[-1]
+                i = pos + 1
+                if not event.is_stopped():
+                    current = plan[pos]
+                    start = time.perf_counter()
+                    yielded = await self._advance(gen)
+                    timings[current.name] = (
+                        timings.get(current.name, 0.0) + time.perf_counter() - start
+                    )
+                    if yielded and not event.is_stopped():
+                        continue
+                stack.pop()
+                await gen.aclose()
+        finally:
+            # 出现异常时, 关闭尚未结束的生成器
+            for _, gen in reversed(stack):
+                await gen.aclose()
+            for name, seconds in timings.items():
+                self.stage_histograms[name].observe(seconds * 1000)
+                tracer.record("stage", name, seconds * 1000, event.unified_msg_origin)
+
+        return timings
+
     async def execute(self, event: AstrMessageEvent):
         """执行 pipeline
 
         Args:
             event (AstrMessageEvent): 事件对象
         """
-        await self._process_stages(event)
+        start = time.perf_counter()
+        timings = await self._process_stages(event)
 
         # 如果没有发送操作, 则发送一个空消息, 以便于后续的处理
         if event.get_platform_name() == "webchat":
             await event.send(None)
 
-        logger.debug("pipeline 执行完毕。")
+        total = (time.perf_counter() - start) * 1000
+        self.total_histogram.observe(total)
+        logger.debug(
+            f"pipeline 执行完毕。耗时 {total:.1f}ms: "
+            + ", ".join(f"{k} {v * 1000:.1f}ms" for k, v in timings.items())
+        )
+
+    def get_stage_metrics(self) -> dict:
+        """获取各阶段的耗时直方图"""
+        return {
+            "plan": [step.name for step in self.plan],
+            "total": self.total_histogram.to_dict(),
+            "stages": {
+                name: hist.to_dict() for name, hist in self.stage_histograms.items()
+            },
+        }
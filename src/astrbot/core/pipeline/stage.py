@@ -37,3 +37,10 @@ class Stage(abc.ABC):
             None | AsyncGenerator[None, None]: 处理结果，可能是 None 或者异步生成器, 如果为 None 则表示不需要继续处理, 如果为异步生成器则表示需要继续处理(进入下一个阶段)
         """
         raise NotImplementedError
+
+    def is_noop(self) -> bool:
+        """在当前配置下该阶段是否不会对任何事件产生影响。
+
+        PipelineScheduler 在编译执行计划时会跳过返回 True 的阶段。配置变更会重建调度器, 因此只需要根据 initialize 时的配置判断。
+        """
+        return False
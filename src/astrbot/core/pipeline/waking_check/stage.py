@@ -4,6 +4,7 @@ from astrbot import logger
 from astrbot.core.message.components import At, AtAll, Reply
 from astrbot.core.message.message_event_result import MessageChain, MessageEventResult
 from astrbot.core.platform.astr_message_event import AstrMessageEvent
+from astrbot.core.star.command_index import command_index
 from astrbot.core.star.filter.permission import PermissionTypeFilter
 from astrbot.core.star.session_plugin_manager import SessionPluginManager
 from astrbot.core.star.star import star_map
@@ -46,6 +47,23 @@ class WakingCheckStage(Stage):
             "ignore_at_all", False
         )
 
+    async def _load_lazy_plugins(self, event: AstrMessageEvent):
+        """消息可能匹配延迟载入的插件的指令时, 先载入这些插件"""
+        plugin_manager = self.ctx.plugin_manager
+        module_paths = command_index.match_lazy_plugins(event.message_str)
+        for module_path in module_paths:
+            entry = plugin_manager.lazy_plugins.get(module_path)
+            if entry is None:
+                continue
+            if (
+                event.plugins_name is not None
+                and entry["name"] not in event.plugins_name
+            ):
+                continue
+            await plugin_manager.load_lazy_plugin(module_path)
+        if module_paths:
+            command_index.ensure(star_handlers_registry)
+
     async def process(
         self, event: AstrMessageEvent
     ) -> None | AsyncGenerator[None, None]:
@@ -121,6 +139,16 @@ class WakingCheckStage(Stage):
             event.plugins_name = enabled_plugins_name
         logger.debug(f"enabled_plugins_name: {enabled_plugins_name}")
 
+        # 通过指令索引找出可能匹配的指令, 其他指令 handler 的 filter 不会通过, 直接跳过
+        command_index.ensure(star_handlers_registry)
+        if event.is_at_or_wake_command:
+            await self._load_lazy_plugins(event)
+        matched_commands = (
+            command_index.match(event.message_str)
+            if event.is_at_or_wake_command
+            else set()
+        )
+
         for handler in star_handlers_registry.get_handlers_by_event_type(
             EventType.AdapterMessageEvent, plugins_name=event.plugins_name
         ):
@@ -130,6 +158,11 @@ class WakingCheckStage(Stage):
             permission_filter_raise_error = False
             if len(handler.event_filters) == 0:
                 continue
+            if (
+                command_index.is_command_handler(handler)
+                and handler.handler_full_name not in matched_commands
+            ):
+                continue
 
             for filter in handler.event_filters:
                 try:
@@ -26,6 +26,9 @@ class WhitelistCheckStage(Stage):
         ]
         self.wl_log = ctx.astrbot_config["platform_settings"]["id_whitelist_log"]
 
+    def is_noop(self) -> bool:
+        return not self.enable_whitelist_check or len(self.whitelist) == 0
+
     async def process(
         self, event: AstrMessageEvent
     ) -> None | AsyncGenerator[None, None]:
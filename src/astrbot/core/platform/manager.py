@@ -5,6 +5,7 @@ from .platform import Platform
 from asyncio import Queue
 from .register import platform_cls_map
 from astrbot.core import logger
+from astrbot.core.utils.startup import startup_report
 from astrbot.core.star.star_handler import star_handlers_registry, star_map, EventType
 from .sources.webchat.webchat_adapter import WebChatAdapter
 
@@ -24,12 +25,25 @@ class PlatformManager:
         self.event_queue = event_queue
 
     async def initialize(self):
-        """初始化所有平台适配器"""
-        for platform in self.platforms_config:
-            try:
-                await self.load_platform(platform)
-            except Exception as e:
-                logger.error(f"初始化 {platform} 平台适配器失败: {e}")
+        """初始化所有平台适配器。各个平台并发初始化, 初始化完成的平台立即开始接收消息"""
+        enabled_configs = [cfg for cfg in self.platforms_config if cfg.get("enable")]
+        results = await startup_report.run_all(
+            "platform",
+            [
+                (cfg["id"], lambda cfg=cfg: self.load_platform(cfg))
+                for cfg in enabled_configs
+            ],
+        )
+        for platform, result in zip(enabled_configs, results):
+            if isinstance(result, Exception):
+                logger.error(f"初始化 {platform} 平台适配器失败: {result}")
+        # 并发加载的完成顺序不确定, 按照配置中的顺序排列
+        order = {cfg["id"]: i for i, cfg in enumerate(self.platforms_config)}
+        rank = {
+            id(info["inst"]): order.get(platform_id, len(order))
+            for platform_id, info in self._inst_map.items()
+        }
+        self.platform_insts.sort(key=lambda inst: rank.get(id(inst), len(order)))
 
         # 网页聊天
         webchat_inst = WebChatAdapter({}, self.settings, self.event_queue)
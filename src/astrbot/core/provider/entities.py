@@ -1,7 +1,6 @@
 import enum
-import base64
 import json
-from astrbot.core.utils.io import download_image_by_url
+from astrbot.core.utils.io import download_image_by_url, file_to_base64_async
 from astrbot import logger
 from dataclasses import dataclass, field
 from astrbot.core.agent.tool import ToolSet
@@ -196,10 +195,8 @@ class ProviderRequest:
         """将图片转换为 base64"""
         if image_url.startswith("base64://"):
             return image_url.replace("base64://", "data:image/jpeg;base64,")
-        with open(image_url, "rb") as f:
-            image_bs64 = base64.b64encode(f.read()).decode("utf-8")
-            return "data:image/jpeg;base64," + image_bs64
-        return ""
+        image_bs64 = await file_to_base64_async(image_url)
+        return "data:image/jpeg;base64," + image_bs64.removeprefix("base64://")
 
 
 @dataclass
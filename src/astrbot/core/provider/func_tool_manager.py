@@ -32,8 +32,12 @@ def _prepare_config(config: dict) -> dict:
     """准备配置，处理嵌套格式"""
     if "mcpServers" in config and config["mcpServers"]:
         first_key = next(iter(config["mcpServers"]))
-        config = config["mcpServers"][first_key]
+        # 复制一份, 避免修改调用方的配置
+        config = dict(config["mcpServers"][first_key])
     config.pop("active", None)
+    config.pop("cache_ttl", None)
+    config.pop("cache_scope", None)
+    config.pop("cache_tools", None)
     return config
 
 
@@ -110,6 +114,9 @@ class FunctionToolManager:
         func_args: list,
         desc: str,
         handler: Awaitable,
+        cache_ttl: float = 0,
+        cache_scope: str = "global",
+        parallel: bool = False,
     ) -> FuncTool:
         params = {
             "type": "object",  # hard-coded here
@@ -125,6 +132,9 @@ class FunctionToolManager:
             parameters=params,
             description=desc,
             handler=handler,
+            cache_ttl=cache_ttl,
+            cache_scope=cache_scope,
+            parallel=parallel,
         )
 
     def add_func(
@@ -133,6 +143,9 @@ class FunctionToolManager:
         func_args: list,
         desc: str,
         handler: Awaitable,
+        cache_ttl: float = 0,
+        cache_scope: str = "global",
+        parallel: bool = False,
     ) -> None:
         """添加函数调用工具
 
@@ -140,6 +153,9 @@ class FunctionToolManager:
         @param func_args: 函数参数列表，格式为 [{"type": "string", "name": "arg_name", "description": "arg_description"}, ...]
         @param desc: 函数描述
         @param func_obj: 处理函数
+        @param cache_ttl: 结果缓存时间(秒), 0 表示不缓存
+        @param cache_scope: 缓存范围, global 或者 session
+        @param parallel: 是否可以与同一轮的其他工具调用并发执行
         """
         # check if the tool has been added before
         self.remove_func(name)
@@ -150,6 +166,9 @@ class FunctionToolManager:
                 func_args=func_args,
                 desc=desc,
                 handler=handler,
+                cache_ttl=cache_ttl,
+                cache_scope=cache_scope,
+                parallel=parallel,
             )
         )
         logger.info(f"添加函数调用工具: {name}")
@@ -260,6 +279,16 @@ class FunctionToolManager:
             if not (f.origin == "mcp" and f.mcp_server_name == name)
         ]
 
+        # MCP 服务配置中可以声明结果缓存, cache_tools 为空时对该服务的所有工具生效
+        server_config = config
+        if config.get("mcpServers"):
+            server_config = next(iter(config["mcpServers"].values()))
+        cache_ttl = server_config.get("cache_ttl", config.get("cache_ttl", 0))
+        cache_tools = server_config.get("cache_tools", config.get("cache_tools")) or []
+        cache_scope = server_config.get(
+            "cache_scope", config.get("cache_scope", "global")
+        )
+
         # 将 MCP 工具转换为 FuncTool 并添加到 func_list
         for tool in mcp_client.tools:
             func_tool = FuncTool(
@@ -269,6 +298,11 @@ class FunctionToolManager:
                 origin="mcp",
                 mcp_server_name=name,
                 mcp_client=mcp_client,
+                cache_ttl=cache_ttl
+                if not cache_tools or tool.name in cache_tools
+                else 0,
+                cache_scope=cache_scope,
+                parallel=True,
             )
             self.func_list.append(func_tool)
 
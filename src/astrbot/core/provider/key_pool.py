@@ -0,0 +1,155 @@
+import asyncio
+import random
+import time
+import typing as T
+from dataclasses import dataclass, field
+from astrbot import logger
+
+ClientT = T.TypeVar("ClientT")
+
+
+@dataclass
+class KeyState(T.Generic[ClientT]):
+    """一个 API Key 的状态"""
+
+    key: str
+    client: ClientT
+    """这个 Key 专用的客户端实例, 并发请求之间不再共享、修改同一个客户端的 api_key"""
+    in_flight: int = 0
+    """正在进行的请求数"""
+    tokens: float = 0.0
+    """令牌桶中剩余的令牌数"""
+    last_refill: float = field(default_factory=time.monotonic)
+    cooldown_until: float = 0.0
+    """被限流(429)后, 在这个时间点之前不会再被选中"""
+    consecutive_429: int = 0
+    total_requests: int = 0
+    total_429: int = 0
+
+
+class ApiKeyPool(T.Generic[ClientT]):
+    """API Key 池。
+
+    每个 Key 拥有独立的客户端实例。请求时选择当前可用且负载最低的 Key;
+    收到 429 时按照 Retry-After 让该 Key 冷却一段时间, 没有 Retry-After 时按照指数退避冷却。
+    配置了 rpm_limit 时, 每个 Key 使用令牌桶限制每分钟的请求数。
+    """
+
+    def __init__(
+        self,
+        keys: list[str],
+        client_factory: T.Callable[[str], ClientT],
+        rpm_limit: int = 0,
+        max_cooldown: float = 60.0,
+    ):
+        """
+        Args:
+            keys (list[str]): API Key 列表
+            client_factory: 根据 API Key 创建客户端实例
+            rpm_limit (int): 每个 Key 每分钟的最大请求数, 0 表示不限制
+            max_cooldown (float): 单次冷却的最长时间(秒)
+        """
+        self.rpm_limit = rpm_limit
+        self.max_cooldown = max_cooldown
+        self.states: dict[str, KeyState[ClientT]] = {}
+        for key in dict.fromkeys(keys):
+            self.states[key] = KeyState(
+                key=key, client=client_factory(key), tokens=float(rpm_limit)
+            )
+
+    def _refill(self, state: KeyState, now: float):
+        if not self.rpm_limit:
+            return
+        state.tokens = min(
+            float(self.rpm_limit),
+            state.tokens + (now - state.last_refill) * self.rpm_limit / 60,
+        )
+        state.last_refill = now
+
+    def _ready_at(self, state: KeyState, now: float) -> float:
+        """这个 Key 最早可以发出请求的时间"""
+        ready = max(now, state.cooldown_until)
+        if self.rpm_limit and state.tokens < 1:
+            ready = max(ready, now + (1 - state.tokens) * 60 / self.rpm_limit)
+        return ready
+
+    async def acquire(self, keys: T.Iterable[str] | None = None) -> KeyState[ClientT]:
+        """选择一个 Key。所有候选 Key 都在冷却或者超出速率限制时, 等待到最早可用的 Key。
+
+        Args:
+            keys: 候选的 Key, 为 None 时从所有 Key 中选择。传入空列表时没有可用的 Key
+        """
+        if keys is None:
+            keys = self.states.keys()
+        candidates = [self.states[k] for k in keys if k in self.states]
+        if not candidates:
+            raise ValueError("没有可用的 API Key。")
+        while True:
+            now = time.monotonic()
+            for state in candidates:
+                self._refill(state, now)
+            ready = [s for s in candidates if self._ready_at(s, now) <= now]
+            if ready:
+                least = min(s.in_flight for s in ready)
+                state = random.choice([s for s in ready if s.in_flight == least])
+                if self.rpm_limit:
+                    state.tokens -= 1
+                state.in_flight += 1
+                state.total_requests += 1
+                return state
+            wait = min(self._ready_at(s, now) for s in candidates) - now
+            logger.debug(f"所有 API Key 均不可用, 等待 {wait:.1f}s。")
+            await asyncio.sleep(wait)
+
+    def release(self, state: KeyState, success: bool = True):
+        """请求结束后归还 Key"""
+        state.in_flight = max(0, state.in_flight - 1)
+        if success:
+            state.consecutive_429 = 0
+
+    def mark_rate_limited(self, key: str, retry_after: float | None = None):
+        """标记 Key 被限流, 使其冷却一段时间
+
+        Args:
+            key (str): API Key
+            retry_after (float): 服务端返回的 Retry-After(秒), 为空时按照连续限流次数指数退避
+        """
+        state = self.states.get(key)
+        if state is None:
+            return
+        state.consecutive_429 += 1
+        state.total_429 += 1
+        if retry_after is None:
+            retry_after = 2 ** (state.consecutive_429 - 1)
+        cooldown = min(max(retry_after, 0.0), self.max_cooldown)
+        state.cooldown_until = max(state.cooldown_until, time.monotonic() + cooldown)
+
+    def stats(self) -> list[dict]:
+        now = time.monotonic()
+        return [
+            {
+                "key": (state.key or "")[:8] + "...",
+                "in_flight": state.in_flight,
+                "cooldown": round(max(0.0, state.cooldown_until - now), 1),
+                "requests": state.total_requests,
+                "rate_limited": state.total_429,
+            }
+            for state in self.states.values()
+        ]
+
+
+def parse_retry_after(e: Exception) -> float | None:
+    """从异常携带的 HTTP 响应中读取 Retry-After(秒)"""
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if value := headers.get("retry-after-ms"):
+            return float(value) / 1000
+        if value := headers.get("retry-after"):
+            return float(value)
+    except (TypeError, ValueError):
+        # Retry-After 也可能是 HTTP 日期格式, 这种情况使用默认的退避策略
+        return None
+    return None
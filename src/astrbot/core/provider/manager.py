@@ -9,6 +9,7 @@ from astrbot.core.db import BaseDatabase
 from .entities import ProviderType
 from .provider import Provider, STTProvider, TTSProvider, EmbeddingProvider
 from .register import llm_tools, provider_cls_map
+from astrbot.core.utils.startup import startup_report
 from ..persona_mgr import PersonaManager
 
 
@@ -154,9 +155,26 @@ class ProviderManager:
         return provider
 
     async def initialize(self):
-        # 逐个初始化提供商
-        for provider_config in self.providers_config:
-            await self.load_provider(provider_config)
+        # 并发初始化提供商
+        enabled_configs = [cfg for cfg in self.providers_config if cfg["enable"]]
+        await startup_report.run_all(
+            "provider",
+            [
+                (cfg["id"], lambda cfg=cfg: self._load_provider_checked(cfg))
+                for cfg in enabled_configs
+            ],
+        )
+        # 并发加载的完成顺序不确定, 按照配置中的顺序排列, 保证默认选择的提供商与逐个加载时相同
+        order = {cfg["id"]: i for i, cfg in enumerate(self.providers_config)}
+        for insts in (
+            self.provider_insts,
+            self.stt_provider_insts,
+            self.tts_provider_insts,
+            self.embedding_provider_insts,
+        ):
+            insts.sort(
+                key=lambda inst: order.get(inst.provider_config["id"], len(order))
+            )
 
         # 设置默认提供商
         selected_provider_id = sp.get(
@@ -192,6 +210,11 @@ class ProviderManager:
         # 初始化 MCP Client 连接
         asyncio.create_task(self.llm_tools.init_mcp_clients(), name="init_mcp_clients")
 
+    async def _load_provider_checked(self, provider_config: dict):
+        await self.load_provider(provider_config)
+        if provider_config["id"] not in self.inst_map:
+            raise RuntimeError("载入失败")
+
     async def load_provider(self, provider_config: dict):
         if not provider_config["enable"]:
             return
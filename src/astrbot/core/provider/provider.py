@@ -202,6 +202,10 @@ class EmbeddingProvider(AbstractProvider):
         """获取向量的维度"""
         ...
 
+    def get_batch_size(self) -> int:
+        """获取单次批量请求的最大文本数量"""
+        return int(self.provider_config.get("embedding_batch_size", 32))
+
 
 class RerankProvider(AbstractProvider):
     def __init__(self, provider_config: dict, provider_settings: dict) -> None:
@@ -200,4 +200,4 @@ class ProviderDashscope(ProviderOpenAIOfficial):
         raise Exception("暂不支持获得 阿里云百炼 的历史消息记录。")
 
     async def terminate(self):
-        pass
+        await super().terminate()
@@ -2,14 +2,16 @@ import base64
 import json
 import os
 import inspect
-import random
-import asyncio
 import astrbot.core.message.components as Comp
 
 from openai import AsyncOpenAI, AsyncAzureOpenAI
 from openai.types.chat.chat_completion import ChatCompletion
 
-from openai._exceptions import NotFoundError, UnprocessableEntityError
+from openai._exceptions import (
+    NotFoundError,
+    RateLimitError,
+    UnprocessableEntityError,
+)
 from openai.lib.streaming.chat._completions import ChatCompletionStreamState
 from astrbot.core.utils.io import download_image_by_url
 from astrbot.core.message.message_event_result import MessageChain
@@ -20,6 +22,7 @@ from astrbot.core.provider.func_tool_manager import FuncCall
 from typing import AsyncGenerator
 from ..register import register_provider_adapter
 from astrbot.core.provider.entities import LLMResponse, ToolCallsResult
+from astrbot.core.provider.key_pool import ApiKeyPool, parse_retry_after
 
 
 @register_provider_adapter(
@@ -43,22 +46,13 @@ class ProviderOpenAIOfficial(Provider):
         self.timeout = provider_config.get("timeout", 120)
         if isinstance(self.timeout, str):
             self.timeout = int(self.timeout)
-        # 适配 azure openai #332
-        if "api_version" in provider_config:
-            # 使用 azure api
-            self.client = AsyncAzureOpenAI(
-                api_key=self.chosen_api_key,
-                api_version=provider_config.get("api_version", None),
-                base_url=provider_config.get("api_base", None),
-                timeout=self.timeout,
-            )
-        else:
-            # 使用 openai api
-            self.client = AsyncOpenAI(
-                api_key=self.chosen_api_key,
-                base_url=provider_config.get("api_base", None),
-                timeout=self.timeout,
-            )
+        # 每个 Key 使用独立的客户端, 并发请求之间互不影响
+        self.key_pool = ApiKeyPool(
+            self.api_keys or [self.chosen_api_key],
+            self._create_client,
+            rpm_limit=int(provider_config.get("key_rpm_limit", 0) or 0),
+        )
+        self.client = self.key_pool.states[self.chosen_api_key].client
 
         self.default_params = inspect.signature(
             self.client.chat.completions.create
@@ -68,6 +62,23 @@ class ProviderOpenAIOfficial(Provider):
         model = model_config.get("model", "unknown")
         self.set_model(model)
 
+    def _create_client(self, api_key: str | None) -> AsyncOpenAI:
+        # 适配 azure openai #332
+        if "api_version" in self.provider_config:
+            # 使用 azure api
+            return AsyncAzureOpenAI(
+                api_key=api_key,
+                api_version=self.provider_config.get("api_version", None),
+                base_url=self.provider_config.get("api_base", None),
+                timeout=self.timeout,
+            )
+        # 使用 openai api
+        return AsyncOpenAI(
+            api_key=api_key,
+            base_url=self.provider_config.get("api_base", None),
+            timeout=self.timeout,
+        )
+
     async def get_models(self):
         try:
             models_str = []
@@ -79,7 +90,9 @@ class ProviderOpenAIOfficial(Provider):
         except NotFoundError as e:
             raise Exception(f"获取模型列表失败：{e}")
 
-    async def _query(self, payloads: dict, tools: FuncCall) -> LLMResponse:
+    async def _query(
+        self, payloads: dict, tools: FuncCall, client: AsyncOpenAI | None = None
+    ) -> LLMResponse:
         if tools:
             model = payloads.get("model", "").lower()
             omit_empty_param_field = "gemini" in model
@@ -110,7 +123,7 @@ class ProviderOpenAIOfficial(Provider):
         if model == "deepseek-reasoner" and "tools" in payloads:
             del payloads["tools"]
 
-        completion = await self.client.chat.completions.create(
+        completion = await (client or self.client).chat.completions.create(
             **payloads, stream=False, extra_body=extra_body
         )
 
@@ -126,7 +139,7 @@ class ProviderOpenAIOfficial(Provider):
         return llm_response
 
     async def _query_stream(
-        self, payloads: dict, tools: FuncCall
+        self, payloads: dict, tools: FuncCall, client: AsyncOpenAI | None = None
     ) -> AsyncGenerator[LLMResponse, None]:
         """流式查询API，逐步返回结果"""
         if tools:
@@ -154,7 +167,7 @@ class ProviderOpenAIOfficial(Provider):
         for key in to_del:
             del payloads[key]
 
-        stream = await self.client.chat.completions.create(
+        stream = await (client or self.client).chat.completions.create(
             **payloads, stream=True, extra_body=extra_body
         )
 
@@ -291,16 +304,14 @@ class ProviderOpenAIOfficial(Provider):
         max_retries: int,
     ) -> tuple:
         """处理API错误并尝试恢复"""
-        if "429" in str(e):
+        if isinstance(e, RateLimitError) or "429" in str(e):
             logger.warning(
-                f"API 调用过于频繁，尝试使用其他 Key 重试。当前 Key: {chosen_key[:12]}"
+                f"API 调用过于频繁，尝试使用其他 Key 重试。当前 Key: {(chosen_key or '')[:12]}"
             )
-            # 最后一次不等待
-            if retry_cnt < max_retries - 1:
-                await asyncio.sleep(1)
+            # 让这个 Key 按照 Retry-After 冷却, 冷却期间其他会话也不会再选中它
+            self.key_pool.mark_rate_limited(chosen_key, parse_retry_after(e))
             available_api_keys.remove(chosen_key)
             if len(available_api_keys) > 0:
-                chosen_key = random.choice(available_api_keys)
                 return (
                     False,
                     chosen_key,
@@ -389,15 +400,18 @@ class ProviderOpenAIOfficial(Provider):
 
         llm_response = None
         max_retries = 10
-        available_api_keys = self.api_keys.copy()
-        chosen_key = random.choice(available_api_keys)
+        available_api_keys = list(self.key_pool.states.keys())
+        chosen_key = None
 
         last_exception = None
         retry_cnt = 0
         for retry_cnt in range(max_retries):
+            lease = await self.key_pool.acquire(available_api_keys)
+            chosen_key = lease.key
+            done = False
             try:
-                self.client.api_key = chosen_key
-                llm_response = await self._query(payloads, func_tool)
+                llm_response = await self._query(payloads, func_tool, lease.client)
+                done = True
                 break
             except UnprocessableEntityError as e:
                 logger.warning(f"不可处理的实体错误：{e}，尝试删除图片。")
@@ -426,6 +440,8 @@ class ProviderOpenAIOfficial(Provider):
                 )
                 if success:
                     break
+            finally:
+                self.key_pool.release(lease, success=done)
 
         if retry_cnt == max_retries - 1:
             logger.error(f"API 调用失败，重试 {max_retries} 次仍然失败。")
@@ -452,7 +468,7 @@ class ProviderOpenAIOfficial(Provider):
             image_urls = []
         if contexts is None:
             contexts = []
-        
+
         payloads, context_query = await self._prepare_chat_payload(
             prompt,
             image_urls,
@@ -464,16 +480,21 @@ class ProviderOpenAIOfficial(Provider):
         )
 
         max_retries = 10
-        available_api_keys = self.api_keys.copy()
-        chosen_key = random.choice(available_api_keys)
+        available_api_keys = list(self.key_pool.states.keys())
+        chosen_key = None
 
         last_exception = None
         retry_cnt = 0
         for retry_cnt in range(max_retries):
+            lease = await self.key_pool.acquire(available_api_keys)
+            chosen_key = lease.key
+            done = False
             try:
-                self.client.api_key = chosen_key
-                async for response in self._query_stream(payloads, func_tool):
+                async for response in self._query_stream(
+                    payloads, func_tool, lease.client
+                ):
                     yield response
+                done = True
                 break
             except UnprocessableEntityError as e:
                 logger.warning(f"不可处理的实体错误：{e}，尝试删除图片。")
@@ -502,6 +523,8 @@ class ProviderOpenAIOfficial(Provider):
                 )
                 if success:
                     break
+            finally:
+                self.key_pool.release(lease, success=done)
 
         if retry_cnt == max_retries - 1:
             logger.error(f"API 调用失败，重试 {max_retries} 次仍然失败。")
@@ -537,7 +560,15 @@ class ProviderOpenAIOfficial(Provider):
         return self.api_keys
 
     def set_key(self, key):
-        self.client.api_key = key
+        if key in self.key_pool.states:
+            self.client = self.key_pool.states[key].client
+        else:
+            self.client.api_key = key
+
+    async def terminate(self):
+        # 每个 Key 都有独立的客户端, 需要逐一关闭连接
+        for state in self.key_pool.states.values():
+            await state.client.close()
 
     async def assemble_context(self, text: str, image_urls: list[str] = None) -> dict:
         """组装成符合 OpenAI 格式的 role 为 user 的消息段"""
@@ -0,0 +1,176 @@
+"""
+上下文 Token 估算
+
+在请求 LLM 之前估算上下文的 Token 数量, 按照 Token 预算截断上下文, 避免请求因为超出模型的上下文长度而失败。
+安装了 tiktoken 时使用 BPE 分词器计数, 否则使用基于字符的快速估算。
+可以通过 register_tokenizer 注册其他分词器。
+"""
+
+import hashlib
+import json
+import re
+import typing as T
+from collections import OrderedDict
+from astrbot import logger
+
+# 每条消息的固定开销(role、分隔符等)
+MESSAGE_OVERHEAD = 4
+# 图片按照固定的 Token 数计算
+IMAGE_TOKENS = 512
+
+_CJK_PATTERN = re.compile(
+    r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]"
+)
+
+
+class Tokenizer:
+    """分词器基类"""
+
+    name = "base"
+
+    def count(self, text: str) -> int:
+        raise NotImplementedError
+
+
+class HeuristicTokenizer(Tokenizer):
+    """快速估算: 中日韩字符按照每个字符 1 个 Token 计算, 其他字符按照每 4 个字符 1 个 Token 计算"""
+
+    name = "heuristic"
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        cjk = len(_CJK_PATTERN.findall(text))
+        return cjk + (len(text) - cjk + 3) // 4
+
+
+class TiktokenTokenizer(Tokenizer):
+    """使用 tiktoken 的 BPE 分词器计数"""
+
+    def __init__(self, encoding: str = "cl100k_base"):
+        import tiktoken
+
+        self.encoding = tiktoken.get_encoding(encoding)
+        self.name = f"tiktoken:{encoding}"
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+_tokenizer_factories: dict[str, T.Callable[[str], Tokenizer]] = {
+    "heuristic": lambda _: HeuristicTokenizer(),
+    "tiktoken": lambda arg: TiktokenTokenizer(arg or "cl100k_base"),
+}
+
+
+def register_tokenizer(name: str, factory: T.Callable[[str], Tokenizer]):
+    """注册分词器。factory 接收冒号后的参数, 如 "tiktoken:o200k_base" 中的 "o200k_base" """
+    _tokenizer_factories[name] = factory
+
+
+def get_tokenizer(spec: str = "auto") -> Tokenizer:
+    """根据名称获取分词器。auto 表示在安装了 tiktoken 时使用 tiktoken, 否则使用快速估算
+
+    Args:
+        spec (str): 分词器名称, 可以带参数, 如 "tiktoken:o200k_base"
+    """
+    spec = spec or "auto"
+    if spec == "auto":
+        try:
+            return TiktokenTokenizer()
+        except Exception:
+            return HeuristicTokenizer()
+    name, _, arg = spec.partition(":")
+    factory = _tokenizer_factories.get(name)
+    if factory is None:
+        logger.warning(f"未知的分词器 {spec}, 将使用快速估算。")
+        return HeuristicTokenizer()
+    try:
+        return factory(arg)
+    except Exception as e:
+        logger.warning(f"初始化分词器 {spec} 失败: {e}, 将使用快速估算。")
+        return HeuristicTokenizer()
+
+
+class TokenCounter:
+    """计算 OpenAI 格式消息的 Token 数。
+
+    历史记录中的消息在每一轮请求中都会重复出现, 因此按照消息内容的哈希缓存每条消息的 Token 数,
+    每一轮只需要对新增的消息分词。
+    """
+
+    def __init__(self, tokenizer: Tokenizer, cache_size: int = 8192):
+        self.tokenizer = tokenizer
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, int] = OrderedDict()
+
+    def count_text(self, text: str) -> int:
+        return self.tokenizer.count(text)
+
+    def count_message(self, message: dict) -> int:
+        key = hashlib.sha1(
+            json.dumps(
+                message, ensure_ascii=False, sort_keys=True, default=str
+            ).encode()
+        ).hexdigest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+        tokens = self._count_message(message)
+        self._cache[key] = tokens
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return tokens
+
+    def _count_message(self, message: dict) -> int:
+        tokens = MESSAGE_OVERHEAD
+        content = message.get("content")
+        if isinstance(content, str):
+            tokens += self.tokenizer.count(content)
+        elif isinstance(content, list):
+            for part in content:
+                if not isinstance(part, dict):
+                    continue
+                if part.get("type") == "text":
+                    tokens += self.tokenizer.count(part.get("text", ""))
+                elif "image_url" in part or part.get("type") == "image_url":
+                    tokens += IMAGE_TOKENS
+        for tool_call in message.get("tool_calls") or []:
+            function = (
+                tool_call.get("function", {}) if isinstance(tool_call, dict) else {}
+            )
+            tokens += self.tokenizer.count(function.get("name", ""))
+            arguments = function.get("arguments", "")
+            if not isinstance(arguments, str):
+                arguments = json.dumps(arguments, ensure_ascii=False)
+            tokens += self.tokenizer.count(arguments)
+        return tokens
+
+    def count_messages(self, messages: list[dict]) -> int:
+        return sum(self.count_message(message) for message in messages)
+
+    def truncate(self, contexts: list[dict], budget: int) -> list[dict]:
+        """从最旧的对话开始丢弃, 直到上下文的 Token 数不超过预算。
+
+        按照整轮对话丢弃, 截断后的上下文总是以 role 为 user 的消息开头。
+
+        Args:
+            contexts (list[dict]): 历史上下文
+            budget (int): Token 预算
+        """
+        counts = [self.count_message(message) for message in contexts]
+        total = sum(counts)
+        if total <= budget:
+            return contexts
+        start = 0
+        while start < len(contexts) and total > budget:
+            total -= counts[start]
+            start += 1
+            # 跳到下一轮对话的开头
+            while start < len(contexts) and contexts[start].get("role") != "user":
+                total -= counts[start]
+                start += 1
+        return contexts[start:]
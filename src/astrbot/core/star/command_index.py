@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import re
+from .filter.command import CommandFilter
+from .filter.command_group import CommandGroupFilter
+from .star_handler import StarHandlerMetadata, StarHandlerRegistry
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class _TrieNode:
+    __slots__ = ("children", "handlers", "exact_handlers", "lazy_plugins")
+
+    def __init__(self):
+        self.children: dict[str, _TrieNode] = {}
+        self.handlers: set[str] = set()
+        """指令名到此结束的指令 handler, 消息与指令名相同或者以 `指令名 ` 开头时命中"""
+        self.exact_handlers: set[str] = set()
+        """指令组 handler, 只有消息与指令组名完全相同时命中"""
+        self.lazy_plugins: set[str] = set()
+        """尚未载入的延迟载入插件的模块路径, 命中规则与指令 handler 相同"""
+
+
+class CommandIndex:
+    """指令索引。
+
+    将所有指令(包括别名、指令组路径)的完整指令名编译为一棵前缀树, 匹配一条消息时只需要沿着消息逐字符查找,
+    耗时与消息长度成正比, 与已注册的指令数量无关。
+
+    索引只用于快速找出可能匹配的指令 handler, 命中的 handler 仍然需要执行自身的 filter 来解析参数。
+    Handler 注册表发生变化(插件加载、卸载)后, 索引会在下一次匹配时自动重建。
+
+    延迟载入的插件没有注册 handler, 它的指令名来自插件清单, 通过 add_lazy_plugin 登记。
+    """
+
+    def __init__(self):
+        self._root = _TrieNode()
+        self._command_handlers: set[str] = set()
+        self._lazy_plugins: dict[str, tuple[list[str], list[str]]] = {}
+        self._lazy_version = 0
+        self._version = (-1, -1)
+
+    def ensure(self, registry: StarHandlerRegistry):
+        """注册表发生变化时重建索引"""
+        if self._version != (registry.version, self._lazy_version):
+            self.rebuild(registry)
+
+    def rebuild(self, registry: StarHandlerRegistry):
+        self._root = _TrieNode()
+        self._command_handlers = set()
+        for handler in registry:
+            self._add_handler(handler)
+        for module_path, (names, exact_names) in self._lazy_plugins.items():
+            for name in names:
+                self._insert(name).lazy_plugins.add(module_path)
+            for name in exact_names:
+                self._insert(name).lazy_plugins.add(module_path)
+        self._version = (registry.version, self._lazy_version)
+
+    def add_lazy_plugin(
+        self, module_path: str, names: list[str], exact_names: list[str]
+    ):
+        """登记一个延迟载入的插件的指令名与指令组名"""
+        self._lazy_plugins[module_path] = (names, exact_names)
+        self._lazy_version += 1
+
+    def remove_lazy_plugin(self, module_path: str):
+        if self._lazy_plugins.pop(module_path, None) is not None:
+            self._lazy_version += 1
+
+    def clear_lazy_plugins(self):
+        self._lazy_plugins.clear()
+        self._lazy_version += 1
+
+    def _add_handler(self, handler: StarHandlerMetadata):
+        for event_filter in handler.event_filters:
+            if isinstance(event_filter, CommandFilter):
+                for name in self.command_names(event_filter):
+                    self._insert(name).handlers.add(handler.handler_full_name)
+            elif isinstance(event_filter, CommandGroupFilter):
+                for name in event_filter.get_complete_command_names():
+                    # 指令组按照去除多余空白后的消息比较, 这里同样规范化
+                    name = _WHITESPACE.sub(" ", name.strip())
+                    self._insert(name).exact_handlers.add(handler.handler_full_name)
+            else:
+                continue
+            self._command_handlers.add(handler.handler_full_name)
+
+    @staticmethod
+    def command_names(command_filter: CommandFilter) -> list[str]:
+        names = []
+        for candidate in [command_filter.command_name, *command_filter.alias]:
+            for parent_command_name in command_filter.parent_command_names:
+                if parent_command_name:
+                    names.append(f"{parent_command_name} {candidate}")
+                else:
+                    names.append(candidate)
+        return names
+
+    def _insert(self, name: str) -> _TrieNode:
+        node = self._root
+        for ch in name:
+            child = node.children.get(ch)
+            if child is None:
+                child = node.children[ch] = _TrieNode()
+            node = child
+        return node
+
+    def is_command_handler(self, handler: StarHandlerMetadata) -> bool:
+        """这个 handler 是否带有指令或者指令组 filter"""
+        return handler.handler_full_name in self._command_handlers
+
+    def match(self, message_str: str) -> set[str]:
+        """找出可能匹配这条消息的指令 handler 的全名"""
+        message_str = _WHITESPACE.sub(" ", message_str.strip())
+        matched: set[str] = set()
+        node = self._root
+        for ch in message_str:
+            if ch == " " and node.handlers:
+                matched.update(node.handlers)
+            node = node.children.get(ch)
+            if node is None:
+                return matched
+        # 消息与指令名完全相同
+        matched.update(node.handlers)
+        matched.update(node.exact_handlers)
+        return matched
+
+    def match_lazy_plugins(self, message_str: str) -> set[str]:
+        """找出指令可能匹配这条消息的延迟载入插件的模块路径。
+
+        指令组的子指令也以完整的指令名登记, 因此这里只要消息以指令名开头就算命中, 真正是否匹配由载入后的 filter 判断。
+        """
+        if not self._lazy_plugins:
+            return set()
+        message_str = _WHITESPACE.sub(" ", message_str.strip())
+        matched: set[str] = set()
+        node = self._root
+        for ch in message_str:
+            if ch == " " and node.lazy_plugins:
+                matched.update(node.lazy_plugins)
+            node = node.children.get(ch)
+            if node is None:
+                return matched
+        matched.update(node.lazy_plugins)
+        return matched
+
+
+command_index = CommandIndex()
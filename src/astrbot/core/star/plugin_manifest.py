@@ -0,0 +1,194 @@
+"""
+插件清单
+
+插件每次被真正载入后, 会把它注册的 handler(事件类型、指令名、别名、指令组路径)、LLM 工具、
+导入耗时与内存增量写入 data/plugin_manifest.json。
+
+开启 plugin_lazy_load 后, 启动时对于清单仍然有效(插件目录下的文件没有变化)且满足延迟载入条件的插件,
+只根据清单把它的指令登记到指令索引, 不导入模块、不实例化插件类, 直到第一条匹配它的指令的消息到来时才真正载入。
+
+满足延迟载入条件的插件:
+- 不是保留插件;
+- 只注册了消息事件的指令 / 指令组 handler, 没有注册 LLM 工具、事件钩子、正则等需要检查每一条消息的 handler;
+- 没有重写 initialize();
+- 导入与实例化时没有注册平台适配器、提供商、Web API, 也没有创建后台任务。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+
+from astrbot.core.config import VERSION
+from astrbot.core.provider.register import llm_tools
+from astrbot.core.utils.astrbot_path import get_astrbot_data_path
+
+from .command_index import CommandIndex
+from .filter.command import CommandFilter
+from .filter.command_group import CommandGroupFilter
+from .star import StarMetadata
+from .star_handler import EventType, star_handlers_registry
+
+logger = logging.getLogger("astrbot")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def plugin_signature(plugin_dir: str) -> str:
+    """根据插件目录下所有文件的路径、大小与修改时间计算签名, 文件发生变化后签名随之变化"""
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(plugin_dir):
+        dirs[:] = sorted(
+            d for d in dirs if d != "__pycache__" and not d.startswith(".")
+        )
+        for fname in sorted(files):
+            fpath = os.path.join(root, fname)
+            try:
+                stat = os.stat(fpath)
+            except OSError:
+                continue
+            rel = os.path.relpath(fpath, plugin_dir)
+            digest.update(f"{rel}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+
+class PluginManifest:
+    def __init__(self, path: str | None = None):
+        self.path = path or os.path.join(
+            get_astrbot_data_path(), "plugin_manifest.json"
+        )
+        self.plugins: dict[str, dict] = {}
+        """key 是插件的模块路径"""
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取插件清单 {self.path} 失败: {e}")
+            return
+        # AstrBot 升级后 handler 的注册方式可能发生变化, 旧的清单全部作废
+        if data.get("astrbot_version") == VERSION:
+            self.plugins = data.get("plugins", {})
+
+    def save(self):
+        if not self._dirty:
+            return
+        try:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"astrbot_version": VERSION, "plugins": self.plugins},
+                    f,
+                    ensure_ascii=False,
+                    indent=2,
+                )
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except Exception as e:
+            logger.warning(f"保存插件清单 {self.path} 失败: {e}")
+
+    def get(self, module_path: str) -> dict | None:
+        return self.plugins.get(module_path)
+
+    def remove(self, module_path: str):
+        if self.plugins.pop(module_path, None) is not None:
+            self._dirty = True
+
+    def update(
+        self,
+        metadata: StarMetadata,
+        signature: str,
+        stats: dict,
+        side_effects: list[str],
+    ) -> dict:
+        """根据插件当前注册的 handler 与 LLM 工具生成清单条目"""
+        module_path = metadata.module_path
+        handlers = []
+        for handler in star_handlers_registry.get_handlers_by_module_name(module_path):
+            commands: list[str] = []
+            exact_commands: list[str] = []
+            for event_filter in handler.event_filters:
+                if isinstance(event_filter, CommandFilter):
+                    commands.extend(CommandIndex.command_names(event_filter))
+                elif isinstance(event_filter, CommandGroupFilter):
+                    exact_commands.extend(
+                        _WHITESPACE.sub(" ", name.strip())
+                        for name in event_filter.get_complete_command_names()
+                    )
+            handlers.append(
+                {
+                    "handler_name": handler.handler_name,
+                    "event_type": handler.event_type.name,
+                    "desc": handler.desc,
+                    "commands": commands,
+                    "exact_commands": exact_commands,
+                }
+            )
+        tools = [
+            tool.name
+            for tool in llm_tools.func_list
+            if getattr(tool, "handler_module_path", None) == module_path
+        ]
+        from . import Star
+
+        star_cls_type = metadata.star_cls_type
+        has_initialize = bool(
+            star_cls_type
+            and getattr(star_cls_type, "initialize", None) is not Star.initialize
+        )
+        entry = {
+            "name": metadata.name,
+            "author": metadata.author,
+            "desc": metadata.desc,
+            "version": metadata.version,
+            "repo": metadata.repo,
+            "root_dir_name": metadata.root_dir_name,
+            "reserved": metadata.reserved,
+            "signature": signature,
+            "handlers": handlers,
+            "llm_tools": tools,
+            "has_initialize": has_initialize,
+            "side_effects": side_effects,
+            "stats": stats,
+        }
+        self.plugins[module_path] = entry
+        self._dirty = True
+        return entry
+
+    @staticmethod
+    def lazy_ineligible_reason(entry: dict) -> str | None:
+        """返回插件不能延迟载入的原因, 可以延迟载入时返回 None"""
+        if entry.get("reserved"):
+            return "保留插件"
+        if entry.get("llm_tools"):
+            return "注册了 LLM 工具"
+        if entry.get("has_initialize"):
+            return "重写了 initialize()"
+        if entry.get("side_effects"):
+            return "载入时注册了 " + ", ".join(entry["side_effects"])
+        handlers = entry.get("handlers") or []
+        if not handlers:
+            return "没有注册 handler"
+        for handler in handlers:
+            if handler["event_type"] != EventType.AdapterMessageEvent.name:
+                return f"注册了 {handler['event_type']} 事件钩子"
+            if not handler["commands"] and not handler["exact_commands"]:
+                return f"{handler['handler_name']} 不是指令"
+        return None
+
+    def get_lazy_entry(self, module_path: str, plugin_dir: str) -> dict | None:
+        """清单有效且满足延迟载入条件时返回清单条目"""
+        entry = self.plugins.get(module_path)
+        if not entry:
+            return None
+        if self.lazy_ineligible_reason(entry) is not None:
+            return None
+        if entry.get("signature") != plugin_signature(plugin_dir):
+            return None
+        return entry
@@ -357,9 +357,20 @@ def register_llm_tool(name: str = None, **kwargs):
     event.stop_event()
     yield
     ```
+
+    结果缓存：只读、结果只与参数有关的工具可以传入 cache_ttl(秒)，在缓存时间内相同参数的调用直接返回上一次的结果。
+    cache_scope 为 "session" 时每个会话单独缓存，默认为 "global"。
+    ```
+    @llm_tool(name="get_weather", cache_ttl=600)
+    ```
+
+    并发调用：模型在一次回复中请求多个工具时，默认逐个执行。不依赖执行顺序、不通过 event 直接回复的工具可以传入 parallel=True，与同一轮的其他可并发工具同时执行。
     """
 
     name_ = name
+    cache_ttl = kwargs.get("cache_ttl", 0)
+    cache_scope = kwargs.get("cache_scope", "global")
+    parallel = kwargs.get("parallel", False)
     registering_agent = None
     if kwargs.get("registering_agent"):
         registering_agent = kwargs["registering_agent"]
@@ -384,7 +395,13 @@ def register_llm_tool(name: str = None, **kwargs):
         if not registering_agent:
             md = get_handler_or_create(awaitable, EventType.OnCallingFuncToolEvent)
             llm_tools.add_func(
-                llm_tool_name, args, docstring.description.strip(), md.handler
+                llm_tool_name,
+                args,
+                docstring.description.strip(),
+                md.handler,
+                cache_ttl=cache_ttl,
+                cache_scope=cache_scope,
+                parallel=parallel,
             )
         else:
             assert isinstance(registering_agent, RegisteringAgent)
@@ -393,7 +410,13 @@ def register_llm_tool(name: str = None, **kwargs):
                 registering_agent._agent.tools = []
             registering_agent._agent.tools.append(
                 llm_tools.spec_to_func(
-                    llm_tool_name, args, docstring.description.strip(), awaitable
+                    llm_tool_name,
+                    args,
+                    docstring.description.strip(),
+                    awaitable,
+                    cache_ttl=cache_ttl,
+                    cache_scope=cache_scope,
+                    parallel=parallel,
                 )
             )
 
@@ -6,8 +6,42 @@ from typing import TYPE_CHECKING
 
 from astrbot.core.config import AstrBotConfig
 
+
+class StarMap(dict):
+    """插件元数据表。
+
+    插件被添加、移除, 或者插件的启用状态发生变化时, version 会递增, 依赖插件状态的缓存可以据此失效。
+    """
+
+    version = 0
+
+    def bump(self):
+        self.version += 1
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.bump()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.bump()
+
+    def pop(self, *args):
+        result = super().pop(*args)
+        self.bump()
+        return result
+
+    def clear(self):
+        super().clear()
+        self.bump()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.bump()
+
+
 star_registry: list[StarMetadata] = []
-star_map: dict[str, StarMetadata] = {}
+star_map: dict[str, StarMetadata] = StarMap()
 """key 是模块路径，__module__"""
 
 if TYPE_CHECKING:
@@ -56,6 +90,11 @@ class StarMetadata:
     star_handler_full_names: list[str] = field(default_factory=list)
     """注册的 Handler 的全名列表"""
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in ("activated", "reserved", "name"):
+            star_map.bump()
+
     def __str__(self) -> str:
         return f"Plugin {self.name} ({self.version}) by {self.author}: {self.desc}"
 
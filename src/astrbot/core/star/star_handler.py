@@ -1,4 +1,5 @@
 from __future__ import annotations
+import bisect
 import enum
 from dataclasses import dataclass, field
 from typing import Any, Awaitable, TypeVar, Generic
@@ -12,6 +13,17 @@ class StarHandlerRegistry(Generic[T]):
     def __init__(self):
         self.star_handlers_map: dict[str, StarHandlerMetadata] = {}
         self._handlers: list[StarHandlerMetadata] = []
+        # 按事件类型分桶, 桶内按优先级从高到低排列
+        self._buckets: dict[EventType, list[StarHandlerMetadata]] = {}
+        # (事件类型, 是否只返回已激活的, 插件白名单) -> Handler 列表
+        self._memo: dict[tuple, list[StarHandlerMetadata]] = {}
+        self._memo_version: tuple[int, int] = (-1, -1)
+        self.version = 0
+        """每次添加、移除 Handler 时递增, 用于判断依赖注册表的索引是否需要重建"""
+
+    @staticmethod
+    def _sort_key(handler: StarHandlerMetadata) -> int:
+        return -handler.extras_configs["priority"]
 
     def append(self, handler: StarHandlerMetadata):
         """添加一个 Handler，并保持按优先级有序"""
@@ -19,8 +31,14 @@ class StarHandlerRegistry(Generic[T]):
             handler.extras_configs["priority"] = 0
 
         self.star_handlers_map[handler.handler_full_name] = handler
-        self._handlers.append(handler)
-        self._handlers.sort(key=lambda h: -h.extras_configs["priority"])
+        # 插入到相同优先级的 Handler 之后, 与稳定排序的结果一致
+        bisect.insort_right(self._handlers, handler, key=self._sort_key)
+        bisect.insort_right(
+            self._buckets.setdefault(handler.event_type, []),
+            handler,
+            key=self._sort_key,
+        )
+        self.version += 1
 
     def _print_handlers(self):
         for handler in self._handlers:
@@ -31,12 +49,32 @@ class StarHandlerRegistry(Generic[T]):
         event_type: EventType,
         only_activated=True,
         plugins_name: list[str] | None = None,
+    ) -> list[StarHandlerMetadata]:
+        if plugins_name is not None and plugins_name != ["*"]:
+            whitelist = tuple(plugins_name)
+        else:
+            whitelist = None
+        # 注册表或者插件状态发生变化时, 清空缓存
+        version = (self.version, star_map.version)
+        if version != self._memo_version:
+            self._memo.clear()
+            self._memo_version = version
+        key = (event_type, only_activated, whitelist)
+        cached = self._memo.get(key)
+        if cached is None:
+            cached = self._memo[key] = self._filter_handlers(
+                event_type, only_activated, plugins_name
+            )
+        return list(cached)
+
+    def _filter_handlers(
+        self,
+        event_type: EventType,
+        only_activated: bool,
+        plugins_name: list[str] | None,
     ) -> list[StarHandlerMetadata]:
         handlers = []
-        for handler in self._handlers:
-            # 过滤事件类型
-            if handler.event_type != event_type:
-                continue
+        for handler in self._buckets.get(event_type, []):
             # 过滤启用状态
             if only_activated:
                 plugin = star_map.get(handler.handler_module_path)
@@ -75,10 +113,16 @@ class StarHandlerRegistry(Generic[T]):
     def clear(self):
         self.star_handlers_map.clear()
         self._handlers.clear()
+        self._buckets.clear()
+        self.version += 1
 
     def remove(self, handler: StarHandlerMetadata):
         self.star_handlers_map.pop(handler.handler_full_name, None)
         self._handlers = [h for h in self._handlers if h != handler]
+        bucket = self._buckets.get(handler.event_type)
+        if bucket is not None:
+            self._buckets[handler.event_type] = [h for h in bucket if h != handler]
+        self.version += 1
 
     def __iter__(self):
         return iter(self._handlers)
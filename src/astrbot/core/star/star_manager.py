@@ -9,25 +9,32 @@ import json
 import logging
 import os
 import sys
+import time
 import traceback
 from types import ModuleType
 from typing import Any
 
+import psutil
 import yaml
 
 from astrbot.core import logger, pip_installer, sp
 from astrbot.core.config.astrbot_config import AstrBotConfig
+from astrbot.core.platform.register import platform_cls_map
+from astrbot.core.provider.register import provider_cls_map
 from astrbot.core.provider.register import llm_tools
 from astrbot.core.utils.astrbot_path import (
     get_astrbot_config_path,
     get_astrbot_plugin_path,
 )
 from astrbot.core.utils.io import remove_dir
+from astrbot.core.utils.startup import startup_report
 from astrbot.core.agent.handoff import HandoffTool, FunctionTool
 
 from . import StarMetadata
+from .command_index import command_index
 from .context import Context
 from .filter.permission import PermissionType, PermissionTypeFilter
+from .plugin_manifest import PluginManifest, plugin_signature
 from .star import star_map, star_registry
 from .star_handler import star_handlers_registry
 from .updater import PluginUpdater
@@ -62,6 +69,13 @@ class PluginManager:
         self._pm_lock = asyncio.Lock()
         """StarManager操作互斥锁"""
 
+        self.manifest = PluginManifest()
+        """插件清单, 记录插件注册的指令与载入耗时, 用于延迟载入"""
+        self.lazy_plugins: dict[str, dict] = {}
+        """尚未载入的延迟载入插件。key 是模块路径, value 是插件清单条目"""
+        self.load_stats: dict[str, dict] = {}
+        """插件的导入耗时(ms)、实例化耗时(ms)与常驻内存增量(KB)。key 是模块路径"""
+
         self.failed_plugin_info = ""
         if os.getenv("ASTRBOT_RELOAD", "0") == "1":
             asyncio.create_task(self._watch_plugins_changes())
@@ -300,6 +314,7 @@ class PluginManager:
         async with self._pm_lock:
             specified_module_path = None
             if specified_plugin_name:
+                await self._load_lazy_plugin_by_name(specified_plugin_name)
                 for smd in star_registry:
                     if smd.name == specified_plugin_name:
                         specified_module_path = smd.module_path
@@ -362,6 +377,14 @@ class PluginManager:
             return False, "未找到任何插件模块"
 
         fail_rec = ""
+        # 载入全部插件时, 各个插件的 initialize() 在导入完成后并发执行
+        defer_initialize = not specified_module_path and not specified_dir_name
+        init_jobs = []
+        lazy_load = defer_initialize and self.config.get("plugin_lazy_load", False)
+        if defer_initialize:
+            self.lazy_plugins.clear()
+            command_index.clear_lazy_plugins()
+        process = psutil.Process()
 
         # 导入插件模块，并尝试实例化插件类
         for plugin_module in plugin_modules:
@@ -382,8 +405,23 @@ class PluginManager:
                 if specified_dir_name and root_dir_name != specified_dir_name:
                     continue
 
+                plugin_dir_path = (
+                    os.path.join(self.plugin_store_path, root_dir_name)
+                    if not reserved
+                    else os.path.join(self.reserved_plugin_path, root_dir_name)
+                )
+
+                if lazy_load and path not in inactivated_plugins:
+                    entry = self.manifest.get_lazy_entry(path, plugin_dir_path)
+                    if entry:
+                        self._register_lazy_plugin(path, entry, plugin_dir_path)
+                        continue
+
                 logger.info(f"正在载入插件 {root_dir_name} ...")
 
+                rss_before = process.memory_info().rss
+                snapshot = self._side_effect_snapshot()
+                import_start = time.perf_counter()
                 # 尝试导入模块
                 try:
                     module = __import__(path, fromlist=[module_str])
@@ -395,26 +433,11 @@ class PluginManager:
                     logger.error(traceback.format_exc())
                     logger.error(f"插件 {root_dir_name} 导入失败。原因：{str(e)}")
                     continue
+                instantiate_start = time.perf_counter()
+                import_ms = (instantiate_start - import_start) * 1000
 
                 # 检查 _conf_schema.json
-                plugin_config = None
-                plugin_dir_path = (
-                    os.path.join(self.plugin_store_path, root_dir_name)
-                    if not reserved
-                    else os.path.join(self.reserved_plugin_path, root_dir_name)
-                )
-                plugin_schema_path = os.path.join(
-                    plugin_dir_path, self.conf_schema_fname
-                )
-                if os.path.exists(plugin_schema_path):
-                    # 加载插件配置
-                    with open(plugin_schema_path, "r", encoding="utf-8") as f:
-                        plugin_config = AstrBotConfig(
-                            config_path=os.path.join(
-                                self.plugin_config_path, f"{root_dir_name}_config.json"
-                            ),
-                            schema=json.loads(f.read()),
-                        )
+                plugin_config = self._load_plugin_config(plugin_dir_path, root_dir_name)
 
                 if path in star_map:
                     # 通过 __init__subclass__ 注册插件
@@ -582,17 +605,45 @@ class PluginManager:
 
                 metadata.star_handler_full_names = full_names
 
+                # 记录载入耗时与内存增量, 并更新插件清单。内存增量包含同一时间其他协程分配的内存, 只是近似值
+                stats = {
+                    "import_ms": round(import_ms, 2),
+                    "instantiate_ms": round(
+                        (time.perf_counter() - instantiate_start) * 1000, 2
+                    ),
+                    "rss_kb": (process.memory_info().rss - rss_before) >> 10,
+                }
+                self.load_stats[path] = stats
+                if defer_initialize:
+                    startup_report.record("plugin_import", root_dir_name, import_ms)
+                self.manifest.update(
+                    metadata,
+                    plugin_signature(plugin_dir_path),
+                    stats,
+                    self._side_effects_since(snapshot),
+                )
+
                 # 执行 initialize() 方法
                 if hasattr(metadata.star_cls, "initialize") and metadata.star_cls:
-                    await metadata.star_cls.initialize()
+                    if defer_initialize:
+                        init_jobs.append((root_dir_name, metadata.star_cls.initialize))
+                    else:
+                        await metadata.star_cls.initialize()
 
             except BaseException as e:
-                logger.error(f"----- 插件 {root_dir_name} 载入失败 -----")
-                errors = traceback.format_exc()
-                for line in errors.split("\n"):
-                    logger.error(f"| {line}")
-                logger.error("----------------------------------")
-                fail_rec += f"加载 {root_dir_name} 插件时出现问题，原因 {str(e)}。\n"
+                fail_rec += self._log_load_failure(root_dir_name, e)
+
+        results = await startup_report.run_all("plugin", init_jobs)
+        for (root_dir_name, _), result in zip(init_jobs, results):
+            if isinstance(result, Exception):
+                fail_rec += self._log_load_failure(root_dir_name, result)
+
+        self.manifest.save()
+        if self.lazy_plugins:
+            logger.info(
+                f"{len(self.lazy_plugins)} 个插件将在第一次使用时载入: "
+                + ", ".join(e["root_dir_name"] for e in self.lazy_plugins.values())
+            )
 
         # 清除 pip.main 导致的多余的 logging handlers
         for handler in logging.root.handlers[:]:
@@ -605,6 +656,121 @@ class PluginManager:
             self.failed_plugin_info = fail_rec
             return False, fail_rec
 
+    def _side_effect_snapshot(self) -> tuple:
+        return (
+            set(platform_cls_map),
+            set(provider_cls_map),
+            len(self.context.registered_web_apis),
+            len(self.context._register_tasks),
+            asyncio.all_tasks(),
+        )
+
+    def _side_effects_since(self, snapshot: tuple) -> list[str]:
+        """对比快照, 找出插件在导入与实例化时注册的、延迟载入会导致缺失的内容"""
+        platforms, providers, web_apis, tasks, running = snapshot
+        side_effects = []
+        if set(platform_cls_map) - platforms:
+            side_effects.append("平台适配器")
+        if set(provider_cls_map) - providers:
+            side_effects.append("提供商")
+        if len(self.context.registered_web_apis) > web_apis:
+            side_effects.append("Web API")
+        if len(self.context._register_tasks) > tasks or any(
+            not task.done() for task in asyncio.all_tasks() - running
+        ):
+            side_effects.append("后台任务")
+        return side_effects
+
+    def _load_plugin_config(
+        self, plugin_dir_path: str, root_dir_name: str
+    ) -> AstrBotConfig | None:
+        """根据插件目录下的 _conf_schema.json 载入插件配置, 没有配置时返回 None"""
+        plugin_schema_path = os.path.join(plugin_dir_path, self.conf_schema_fname)
+        if not os.path.exists(plugin_schema_path):
+            return None
+        with open(plugin_schema_path, "r", encoding="utf-8") as f:
+            return AstrBotConfig(
+                config_path=os.path.join(
+                    self.plugin_config_path, f"{root_dir_name}_config.json"
+                ),
+                schema=json.loads(f.read()),
+            )
+
+    def _register_lazy_plugin(
+        self, module_path: str, entry: dict, plugin_dir_path: str
+    ):
+        """根据插件清单登记一个延迟载入的插件。
+
+        它的指令会被登记到指令索引中, 并且用清单中的元数据在 star_map / star_registry 中登记一个占位的 StarMetadata(没有 star_cls),
+        以便插件列表、插件配置等功能在插件真正载入之前也能使用。
+        """
+        names, exact_names = [], []
+        for handler in entry["handlers"]:
+            names.extend(handler["commands"])
+            exact_names.extend(handler["exact_commands"])
+        metadata = StarMetadata(
+            name=entry["name"],
+            author=entry["author"],
+            desc=entry["desc"],
+            version=entry["version"],
+            repo=entry["repo"],
+            module_path=module_path,
+            root_dir_name=entry["root_dir_name"],
+            reserved=entry["reserved"],
+        )
+        try:
+            metadata.config = self._load_plugin_config(
+                plugin_dir_path, entry["root_dir_name"]
+            )
+        except Exception as e:
+            logger.warning(f"插件 {entry['root_dir_name']} 配置载入失败: {e}")
+        star_map[module_path] = metadata
+        star_registry.append(metadata)
+        self.lazy_plugins[module_path] = entry
+        command_index.add_lazy_plugin(module_path, names, exact_names)
+        logger.info(f"插件 {entry['root_dir_name']} 将在第一次使用时载入。")
+
+    async def load_lazy_plugin(self, module_path: str) -> bool:
+        """载入一个延迟载入的插件。插件不是延迟载入的插件或者已经载入时直接返回 True"""
+        if module_path not in self.lazy_plugins:
+            return True
+        async with self._pm_lock:
+            return await self._load_lazy_plugin(module_path)
+
+    async def _load_lazy_plugin(self, module_path: str) -> bool:
+        """载入一个延迟载入的插件。调用方需要持有 _pm_lock"""
+        entry = self.lazy_plugins.get(module_path)
+        if entry is None:
+            return True
+        logger.info(f"正在载入延迟载入的插件 {entry['root_dir_name']} ...")
+        # 移除占位的元数据, 由真正载入时重新登记
+        placeholder = star_map.pop(module_path, None)
+        if placeholder in star_registry:
+            star_registry.remove(placeholder)
+        try:
+            success, _ = await self.load(specified_module_path=module_path)
+        finally:
+            # 载入失败时不再重试, 避免每条消息都尝试载入
+            self.lazy_plugins.pop(module_path, None)
+            command_index.remove_lazy_plugin(module_path)
+        return success
+
+    async def _load_lazy_plugin_by_name(self, plugin_name: str):
+        """载入指定名称的延迟载入插件。调用方需要持有 _pm_lock"""
+        for module_path, entry in list(self.lazy_plugins.items()):
+            if entry["name"] == plugin_name:
+                await self._load_lazy_plugin(module_path)
+
+    @staticmethod
+    def _log_load_failure(root_dir_name: str, e: BaseException) -> str:
+        """输出插件载入失败的日志, 返回失败记录"""
+        logger.error(f"----- 插件 {root_dir_name} 载入失败 -----")
+        errors = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+        for line in errors.split("\n"):
+            logger.error(f"| {line}")
+        logger.error("----------------------------------")
+        return f"加载 {root_dir_name} 插件时出现问题，原因 {str(e)}。\n"
+
     async def install_plugin(self, repo_url: str, proxy: str = ""):
         """从仓库 URL 安装插件
 
@@ -670,6 +836,7 @@ class PluginManager:
             Exception: 当插件不存在、是保留插件时，或删除插件文件夹失败时抛出异常
         """
         async with self._pm_lock:
+            await self._load_lazy_plugin_by_name(plugin_name)
             plugin = self.context.get_registered_star(plugin_name)
             if not plugin:
                 raise Exception("插件不存在。")
@@ -689,6 +856,8 @@ class PluginManager:
 
             # 从 star_registry 和 star_map 中删除
             await self._unbind_plugin(plugin_name, plugin.module_path)
+            self.manifest.remove(plugin.module_path)
+            self.manifest.save()
 
             try:
                 remove_dir(os.path.join(ppath, root_dir_name))
@@ -735,6 +904,8 @@ class PluginManager:
 
     async def update_plugin(self, plugin_name: str, proxy: str = ""):
         """升级一个插件"""
+        async with self._pm_lock:
+            await self._load_lazy_plugin_by_name(plugin_name)
         plugin = self.context.get_registered_star(plugin_name)
         if not plugin:
             raise Exception("插件不存在。")
@@ -752,6 +923,7 @@ class PluginManager:
         并且同时将插件启用的 llm_tool 禁用。
         """
         async with self._pm_lock:
+            await self._load_lazy_plugin_by_name(plugin_name)
             plugin = self.context.get_registered_star(plugin_name)
             if not plugin:
                 raise Exception("插件不存在。")
@@ -0,0 +1,119 @@
+import asyncio
+import ssl
+import logging
+import weakref
+import aiohttp
+import certifi
+
+logger = logging.getLogger("astrbot")
+
+DEFAULT_HTTP_CLIENT_SETTINGS = {
+    "limit": 100,
+    "limit_per_host": 10,
+    "keepalive_timeout": 30,
+    "dns_cache_ttl": 300,
+    "connect_timeout": 10,
+    "timeout": 60,
+    "download_read_timeout": 60,
+}
+
+
+class HttpClientManager:
+    """进程级共享的 HTTP 客户端。
+
+    所有请求复用同一个 aiohttp.ClientSession, 因此可以复用 TCP/TLS 连接(keep-alive)与 DNS 缓存,
+    并且只加载一次 CA 证书。通过 configure() 设置连接数限制与超时。
+    """
+
+    def __init__(self):
+        self.settings = dict(DEFAULT_HTTP_CLIENT_SETTINGS)
+        self._ssl_context: ssl.SSLContext | None = None
+        self._fallback_ssl_context: ssl.SSLContext | None = None
+        # 不同事件循环之间不能共享连接, 例如在线程中使用 asyncio.run 时, 因此每个事件循环各有一个 session
+        self._sessions: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, aiohttp.ClientSession
+        ] = weakref.WeakKeyDictionary()
+
+    def configure(self, settings: dict | None):
+        """更新配置。已经创建的连接池会在下一次获取 session 时按照新配置重建"""
+        new_settings = {**DEFAULT_HTTP_CLIENT_SETTINGS, **(settings or {})}
+        if new_settings != self.settings:
+            self.settings = new_settings
+            self._discard_sessions()
+
+    @property
+    def ssl_context(self) -> ssl.SSLContext:
+        """使用 certifi 提供的 CA 证书的 SSL 上下文"""
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context(cafile=certifi.where())
+        return self._ssl_context
+
+    @property
+    def fallback_ssl_context(self) -> ssl.SSLContext:
+        """certifi 证书验证失败时使用的 SSL 上下文(系统 CA 证书, 放宽加密套件)"""
+        if self._fallback_ssl_context is None:
+            ctx = ssl.create_default_context()
+            ctx.set_ciphers("DEFAULT")
+            self._fallback_ssl_context = ctx
+        return self._fallback_ssl_context
+
+    def timeout(self, total: float | None = None) -> aiohttp.ClientTimeout:
+        """构造超时设置。total 为空时使用配置的默认超时"""
+        return aiohttp.ClientTimeout(
+            total=total if total is not None else self.settings["timeout"],
+            connect=self.settings["connect_timeout"],
+        )
+
+    def download_timeout(self) -> aiohttp.ClientTimeout:
+        """下载图片、文件等大小未知的内容时使用的超时设置。不限制总时间, 只限制两次读取之间的间隔"""
+        return aiohttp.ClientTimeout(
+            total=None,
+            connect=self.settings["connect_timeout"],
+            sock_read=self.settings["download_read_timeout"],
+        )
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """获取当前事件循环的共享 ClientSession。不要关闭或者使用 async with 包裹返回的 session"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                ssl=self.ssl_context,
+                limit=self.settings["limit"],
+                limit_per_host=self.settings["limit_per_host"],
+                keepalive_timeout=self.settings["keepalive_timeout"],
+                ttl_dns_cache=self.settings["dns_cache_ttl"],
+                use_dns_cache=True,
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout(),
+                trust_env=True,
+            )
+            self._sessions[loop] = session
+        return session
+
+    def _discard_sessions(self):
+        sessions = list(self._sessions.items())
+        self._sessions.clear()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for loop, session in sessions:
+            if session.closed or loop.is_closed():
+                continue
+            if loop is running:
+                loop.create_task(session.close())
+            else:
+                asyncio.run_coroutine_threadsafe(session.close(), loop)
+
+    async def close(self):
+        """关闭所有连接"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        self._discard_sessions()
+        if session and not session.closed:
+            await session.close()
+
+
+http_client = HttpClientManager()
@@ -1,5 +1,7 @@
+import asyncio
+import functools
+import io
 import os
-import ssl
 import shutil
 import socket
 import time
@@ -7,18 +9,26 @@ from typing import Any
 import aiohttp
 import base64
 import zipfile
-import uuid
 import psutil
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
-import certifi
-
 from PIL import Image
 from .astrbot_path import get_astrbot_data_path
+from .http_client import http_client
+from .media_cache import media_cache
 
 logger = logging.getLogger("astrbot")
 
+# 媒体文件读写、编解码使用的线程池。限制线程数量, 避免大量图片同时处理时占满 CPU 与内存
+_media_executor = ThreadPoolExecutor(
+    max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="astrbot-media"
+)
+
+# 分块编码 base64 时每块的大小, 需要是 3 的倍数, 这样各块的编码结果可以直接拼接
+_BASE64_CHUNK_SIZE = 3 * 256 * 1024
+
 
 def on_error(func: Any, path: str, exc_info: Any) -> None:
     """
@@ -52,29 +62,27 @@ def port_checker(port: int, host: str = "localhost"):
         return False
 
 
-def save_temp_img(img: Image.Image | str) -> str:
-    temp_dir = os.path.join(get_astrbot_data_path(), "temp")
-    # 获得文件创建时间，清除超过 12 小时的
-    try:
-        for f in os.listdir(temp_dir):
-            path = os.path.join(temp_dir, f)
-            if os.path.isfile(path):
-                ctime = os.path.getctime(path)
-                if time.time() - ctime > 3600 * 12:
-                    os.remove(path)
-    except Exception as e:
-        print(f"清除临时文件失败: {e}")
-
-    # 获得时间戳
-    timestamp = f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
-    p = os.path.join(temp_dir, f"{timestamp}.jpg")
-
+def save_temp_img(img: Image.Image | bytes) -> str:
+    """保存图片到媒体缓存, 返回文件路径。相同内容的图片只会保存一份"""
     if isinstance(img, Image.Image):
-        img.save(p)
-    else:
-        with open(p, "wb") as f:
-            f.write(img)
-    return p
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG")
+        img = buf.getvalue()
+    return media_cache.put(img)
+
+
+def _cacheable_url(resp: aiohttp.ClientResponse) -> bool:
+    """判断是否可以记录 URL 到文件的映射。
+
+    发生了重定向(常见于随机图片 API)或者响应禁止缓存时, 相同的 URL 可能对应不同的内容, 不记录映射。
+    """
+    if resp.status != 200 or resp.history:
+        return False
+    cache_control = resp.headers.get("Cache-Control", "").lower()
+    return not any(
+        directive in cache_control
+        for directive in ("no-store", "no-cache", "max-age=0")
+    )
 
 
 async def download_image_by_url(
@@ -83,113 +91,112 @@ async def download_image_by_url(
     """
     下载图片, 返回 path
     """
+    use_cache = not post and not path
+    if use_cache and (cached := media_cache.lookup("url:" + url)):
+        return cached
+    session = http_client.get_session()
+    timeout = http_client.download_timeout()
+    cacheable = False
     try:
-        ssl_context = ssl.create_default_context(
-            cafile=certifi.where()
-        )  # 使用 certifi 提供的 CA 证书
-        connector = aiohttp.TCPConnector(ssl=ssl_context)  # 使用 certifi 的根证书
-        async with aiohttp.ClientSession(
-            trust_env=True, connector=connector
-        ) as session:
-            if post:
-                async with session.post(url, json=post_data) as resp:
-                    if not path:
-                        return save_temp_img(await resp.read())
-                    else:
-                        with open(path, "wb") as f:
-                            f.write(await resp.read())
-                        return path
-            else:
-                async with session.get(url) as resp:
-                    if not path:
-                        return save_temp_img(await resp.read())
-                    else:
-                        with open(path, "wb") as f:
-                            f.write(await resp.read())
-                        return path
+        if post:
+            async with session.post(url, json=post_data, timeout=timeout) as resp:
+                data = await resp.read()
+        else:
+            async with session.get(url, timeout=timeout) as resp:
+                data = await resp.read()
+                cacheable = _cacheable_url(resp)
     except (aiohttp.ClientConnectorSSLError, aiohttp.ClientConnectorCertificateError):
-        # 关闭SSL验证
-        ssl_context = ssl.create_default_context()
-        ssl_context.set_ciphers("DEFAULT")
-        async with aiohttp.ClientSession() as session:
-            if post:
-                async with session.get(url, ssl=ssl_context) as resp:
-                    return save_temp_img(await resp.read())
-            else:
-                async with session.get(url, ssl=ssl_context) as resp:
-                    return save_temp_img(await resp.read())
-    except Exception as e:
-        raise e
+        # certifi 证书验证失败时, 使用系统证书重试
+        ssl_context = http_client.fallback_ssl_context
+        if post:
+            async with session.post(
+                url, json=post_data, ssl=ssl_context, timeout=timeout
+            ) as resp:
+                data = await resp.read()
+        else:
+            async with session.get(url, ssl=ssl_context, timeout=timeout) as resp:
+                data = await resp.read()
+                cacheable = _cacheable_url(resp)
+    if not path:
+        file_path = await run_in_media_pool(save_temp_img, data)
+        if use_cache and cacheable:
+            media_cache.remember(
+                "url:" + url, file_path, ttl=media_cache.settings["url_ttl"]
+            )
+        return file_path
+    await run_in_media_pool(_write_file, path, data)
+    return path
+
+
+def _write_file(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+async def _save_response(resp: aiohttp.ClientResponse, path: str, show_progress: bool):
+    total_size = int(resp.headers.get("content-length", 0))
+    downloaded_size = 0
+    start_time = time.time()
+    if show_progress:
+        print(f"文件大小: {total_size / 1024:.2f} KB | 文件地址: {resp.url}")
+    with open(path, "wb") as f:
+        while True:
+            chunk = await resp.content.read(8192)
+            if not chunk:
+                break
+            f.write(chunk)
+            downloaded_size += len(chunk)
+            if show_progress:
+                elapsed_time = time.time() - start_time
+                speed = downloaded_size / 1024 / elapsed_time  # KB/s
+                print(
+                    f"\r下载进度: {downloaded_size / total_size:.2%} 速度: {speed:.2f} KB/s",
+                    end="",
+                )
 
 
 async def download_file(url: str, path: str, show_progress: bool = False):
     """
     从指定 url 下载文件到指定路径 path
     """
+    session = http_client.get_session()
     try:
-        ssl_context = ssl.create_default_context(
-            cafile=certifi.where()
-        )  # 使用 certifi 提供的 CA 证书
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
-        async with aiohttp.ClientSession(
-            trust_env=True, connector=connector
-        ) as session:
-            async with session.get(url, timeout=1800) as resp:
-                if resp.status != 200:
-                    raise Exception(f"下载文件失败: {resp.status}")
-                total_size = int(resp.headers.get("content-length", 0))
-                downloaded_size = 0
-                start_time = time.time()
-                if show_progress:
-                    print(f"文件大小: {total_size / 1024:.2f} KB | 文件地址: {url}")
-                with open(path, "wb") as f:
-                    while True:
-                        chunk = await resp.content.read(8192)
-                        if not chunk:
-                            break
-                        f.write(chunk)
-                        downloaded_size += len(chunk)
-                        if show_progress:
-                            elapsed_time = time.time() - start_time
-                            speed = downloaded_size / 1024 / elapsed_time  # KB/s
-                            print(
-                                f"\r下载进度: {downloaded_size / total_size:.2%} 速度: {speed:.2f} KB/s",
-                                end="",
-                            )
+        async with session.get(url, timeout=http_client.download_timeout()) as resp:
+            if resp.status != 200:
+                raise Exception(f"下载文件失败: {resp.status}")
+            await _save_response(resp, path, show_progress)
     except (aiohttp.ClientConnectorSSLError, aiohttp.ClientConnectorCertificateError):
-        # 关闭SSL验证
-        ssl_context = ssl.create_default_context()
-        ssl_context.set_ciphers("DEFAULT")
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, ssl=ssl_context, timeout=120) as resp:
-                total_size = int(resp.headers.get("content-length", 0))
-                downloaded_size = 0
-                start_time = time.time()
-                if show_progress:
-                    print(f"文件大小: {total_size / 1024:.2f} KB | 文件地址: {url}")
-                with open(path, "wb") as f:
-                    while True:
-                        chunk = await resp.content.read(8192)
-                        if not chunk:
-                            break
-                        f.write(chunk)
-                        downloaded_size += len(chunk)
-                        if show_progress:
-                            elapsed_time = time.time() - start_time
-                            speed = downloaded_size / 1024 / elapsed_time  # KB/s
-                            print(
-                                f"\r下载进度: {downloaded_size / total_size:.2%} 速度: {speed:.2f} KB/s",
-                                end="",
-                            )
+        # certifi 证书验证失败时, 使用系统证书重试
+        async with session.get(
+            url,
+            ssl=http_client.fallback_ssl_context,
+            timeout=http_client.download_timeout(),
+        ) as resp:
+            await _save_response(resp, path, show_progress)
     if show_progress:
         print()
 
 
+async def run_in_media_pool(func, *args, **kwargs):
+    """在媒体线程池中执行同步的文件读写、编解码操作, 避免阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _media_executor, functools.partial(func, *args, **kwargs)
+    )
+
+
 def file_to_base64(file_path: str) -> str:
+    """读取文件并编码为 base64。大文件会分块读取和编码, 不会一次性读入整个文件"""
+    parts = ["base64://"]
     with open(file_path, "rb") as f:
-        data_bytes = f.read()
-        base64_str = base64.b64encode(data_bytes).decode()
-    return "base64://" + base64_str
+        while chunk := f.read(_BASE64_CHUNK_SIZE):
+            parts.append(base64.b64encode(chunk).decode())
+    return "".join(parts)
+
+
+async def file_to_base64_async(file_path: str) -> str:
+    """file_to_base64 的异步版本, 在媒体线程池中读取和编码文件"""
+    return await run_in_media_pool(file_to_base64, file_path)
 
 
 def get_local_ip_addresses():
@@ -248,17 +255,16 @@ async def download_dashboard(
         )
         if proxy:
             url = f"{proxy}/{url}"
-        async with aiohttp.ClientSession(trust_env=True) as session:
-            async with session.get(url) as resp:
-                if resp.status == 200:
-                    releases = await resp.json()
-                    for release in releases:
-                        if version in release["tag_name"]:
-                            download_url = release["assets"][0]["browser_download_url"]
-                            await download_file(download_url, path, show_progress=True)
-                else:
-                    logger.warning(f"未找到指定的版本的 Dashboard 构建文件: {version}")
-                    return
+        async with http_client.get_session().get(url) as resp:
+            if resp.status == 200:
+                releases = await resp.json()
+                for release in releases:
+                    if version in release["tag_name"]:
+                        download_url = release["assets"][0]["browser_download_url"]
+                        await download_file(download_url, path, show_progress=True)
+            else:
+                logger.warning(f"未找到指定的版本的 Dashboard 构建文件: {version}")
+                return
 
     with zipfile.ZipFile(path, "r") as z:
         z.extractall(extract_path)
@@ -0,0 +1,259 @@
+"""
+内容寻址的媒体缓存
+
+图片、语音等媒体文件以内容的 SHA-256 命名保存在 data/temp/media 下, 相同内容只保存一份。
+同时记录 URL、base64 数据到文件的映射, 重复出现的 URL 或 base64 数据可以直接复用已有文件, 不需要重新下载或解码。
+
+缓存按照最近访问时间淘汰(LRU), 总大小超过上限或者长时间未访问的文件会被后台清理任务删除。
+后台清理任务同时会清理 data/temp 下超过 12 小时的其他临时文件。
+"""
+
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from .astrbot_path import get_astrbot_data_path
+
+logger = logging.getLogger("astrbot")
+
+DEFAULT_MEDIA_CACHE_SETTINGS = {
+    "max_size_mb": 1024,
+    "max_age_hours": 12,
+    "url_ttl": 3600,
+    "janitor_interval": 600,
+}
+
+# 访问时间的更新间隔(秒), 避免每次命中都修改文件时间
+_TOUCH_INTERVAL = 60
+
+
+class MediaCache:
+    def __init__(self, cache_dir: str | None = None, settings: dict | None = None):
+        self.temp_dir = os.path.join(get_astrbot_data_path(), "temp")
+        self.cache_dir = cache_dir or os.path.join(self.temp_dir, "media")
+        self.settings = {**DEFAULT_MEDIA_CACHE_SETTINGS, **(settings or {})}
+        self._lock = threading.Lock()
+        # 文件名 -> (大小, 最近访问时间), 按访问时间从旧到新排列
+        self._entries: OrderedDict[str, tuple[int, float]] | None = None
+        self._total_size = 0
+        # URL / base64 -> (文件名, 过期时间)
+        self._aliases: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._max_aliases = 10000
+        self._janitor_task: asyncio.Task | None = None
+        self._cleanup_task: asyncio.Future | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, settings: dict | None):
+        self.settings = {**DEFAULT_MEDIA_CACHE_SETTINGS, **(settings or {})}
+
+    @property
+    def max_size(self) -> int:
+        return int(self.settings["max_size_mb"] * 1024 * 1024)
+
+    def _load_index(self):
+        """首次使用时扫描一次缓存目录, 之后只在内存中维护索引"""
+        if self._entries is not None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+        entries.sort()
+        self._entries = OrderedDict(
+            (name, (size, mtime)) for mtime, name, size in entries
+        )
+        self._total_size = sum(size for _, _, size in entries)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name)
+
+    def _touch(self, name: str) -> bool:
+        """标记文件被访问。文件已经不存在(例如被使用者删除)时返回 False"""
+        size, last_access = self._entries[name]
+        path = self._path(name)
+        now = time.time()
+        try:
+            if now - last_access > _TOUCH_INTERVAL:
+                os.utime(path, (now, now))
+                last_access = now
+            elif not os.path.exists(path):
+                raise FileNotFoundError(path)
+        except FileNotFoundError:
+            self._entries.pop(name)
+            self._total_size -= size
+            return False
+        self._entries[name] = (size, last_access)
+        self._entries.move_to_end(name)
+        return True
+
+    def put(self, data: bytes, suffix: str = ".jpg", alias: str | None = None) -> str:
+        """保存一段数据, 返回文件的绝对路径。相同内容的数据只会保存一份
+
+        Args:
+            data (bytes): 文件内容
+            suffix (str): 文件后缀
+            alias (str): 可选, 同时记录一个别名(如 URL), 之后可以通过 lookup 直接获取路径
+        """
+        name = hashlib.sha256(data).hexdigest() + suffix
+        path = self._path(name)
+        with self._lock:
+            self._load_index()
+            exists = name in self._entries and self._touch(name)
+        if not exists:
+            # 先写入临时文件再重命名, 避免其他读取者读到写了一半的文件
+            tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            with self._lock:
+                old = self._entries.pop(name, None)
+                if old:
+                    self._total_size -= old[0]
+                self._entries[name] = (len(data), time.time())
+                self._total_size += len(data)
+        if alias:
+            self.remember(alias, path)
+        if self._total_size > self.max_size:
+            self._schedule_cleanup()
+        return path
+
+    def remember(self, alias: str, path: str, ttl: float | None = None):
+        """记录别名到缓存文件的映射
+
+        Args:
+            alias (str): 别名, 如 URL
+            path (str): put 返回的路径
+            ttl (float): 映射的有效期(秒), 为空时永久有效
+        """
+        expire = time.time() + ttl if ttl is not None else float("inf")
+        with self._lock:
+            self._aliases[alias] = (os.path.basename(path), expire)
+            self._aliases.move_to_end(alias)
+            while len(self._aliases) > self._max_aliases:
+                self._aliases.popitem(last=False)
+
+    def lookup(self, alias: str) -> str | None:
+        """通过别名获取已经缓存的文件路径, 未命中时返回 None"""
+        with self._lock:
+            item = self._aliases.get(alias)
+            if item is None:
+                self.misses += 1
+                return None
+            name, expire = item
+            self._load_index()
+            if (
+                expire < time.time()
+                or name not in self._entries
+                or not self._touch(name)
+            ):
+                self._aliases.pop(alias, None)
+                self.misses += 1
+                return None
+            self._aliases.move_to_end(alias)
+            self.hits += 1
+            return self._path(name)
+
+    def put_base64(self, bs64_data: str, suffix: str = ".jpg") -> str:
+        """保存 base64 编码的数据。相同的 base64 数据只会解码一次"""
+        alias = "base64:" + hashlib.sha256(bs64_data.encode()).hexdigest()
+        path = self.lookup(alias)
+        if path:
+            return path
+        return self.put(base64.b64decode(bs64_data), suffix, alias=alias)
+
+    def cleanup(self) -> int:
+        """删除超过大小上限或者长时间未访问的缓存文件, 返回删除的文件数量"""
+        with self._lock:
+            self._load_index()
+            expire_before = time.time() - self.settings["max_age_hours"] * 3600
+            # 清理到上限的 90%, 避免每次写入都触发清理
+            target = self.max_size * 0.9 if self._total_size > self.max_size else None
+            victims = []
+            while self._entries:
+                name, (size, last_access) = next(iter(self._entries.items()))
+                if last_access >= expire_before and (
+                    target is None or self._total_size <= target
+                ):
+                    break
+                self._entries.popitem(last=False)
+                self._total_size -= size
+                victims.append(name)
+        for name in victims:
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"删除缓存文件 {name} 失败: {e}")
+        return len(victims)
+
+    def cleanup_temp_dir(self):
+        """清理 data/temp 下超过 12 小时的其他临时文件"""
+        try:
+            now = time.time()
+            with os.scandir(self.temp_dir) as it:
+                for entry in it:
+                    if entry.is_file() and now - entry.stat().st_ctime > 3600 * 12:
+                        os.remove(entry.path)
+        except Exception as e:
+            logger.warning(f"清除临时文件失败: {e}")
+
+    def _schedule_cleanup(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.cleanup()
+            return
+        if self._cleanup_task is None or self._cleanup_task.done():
+            self._cleanup_task = loop.create_task(asyncio.to_thread(self.cleanup))
+
+    def start_janitor(self):
+        """启动后台清理任务。需要在事件循环中调用"""
+        if self._janitor_task is None or self._janitor_task.done():
+            self._janitor_task = asyncio.create_task(self._janitor())
+
+    async def _janitor(self):
+        while True:
+            try:
+                removed = await asyncio.to_thread(self.cleanup)
+                if removed:
+                    logger.debug(f"媒体缓存清理了 {removed} 个文件。")
+                await asyncio.to_thread(self.cleanup_temp_dir)
+            except Exception as e:
+                logger.warning(f"媒体缓存清理失败: {e}")
+            await asyncio.sleep(self.settings["janitor_interval"])
+
+    async def close(self):
+        if self._janitor_task and not self._janitor_task.done():
+            self._janitor_task.cancel()
+            try:
+                await self._janitor_task
+            except asyncio.CancelledError:
+                pass
+        self._janitor_task = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load_index()
+            total = self.hits + self.misses
+            return {
+                "files": len(self._entries),
+                "size_mb": round(self._total_size / 1024 / 1024, 2),
+                "max_size_mb": self.settings["max_size_mb"],
+                "aliases": len(self._aliases),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+media_cache = MediaCache()
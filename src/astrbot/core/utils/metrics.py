@@ -1,10 +1,10 @@
-import aiohttp
 import sys
 import os
 import socket
 import uuid
 from astrbot.core.config import VERSION
 from astrbot.core import db_helper, logger
+from astrbot.core.utils.http_client import http_client
 
 
 class Metric:
@@ -67,9 +67,10 @@ class Metric:
             pass
 
         try:
-            async with aiohttp.ClientSession(trust_env=True) as session:
-                async with session.post(base_url, json=payload, timeout=3) as response:
-                    if response.status != 200:
-                        pass
+            async with http_client.get_session().post(
+                base_url, json=payload, timeout=http_client.timeout(3)
+            ) as response:
+                if response.status != 200:
+                    pass
         except Exception:
             pass
@@ -1,7 +1,10 @@
 from astrbot.core.db import BaseDatabase
 from astrbot.core.db.po import Preference
+from collections import OrderedDict
+import copy
 import threading
 import asyncio
+import logging
 import os
 from typing import TypeVar, Any, overload
 from .astrbot_path import get_astrbot_data_path
@@ -9,9 +12,38 @@ from .astrbot_path import get_astrbot_data_path
 
 _VT = TypeVar("_VT")
 
+logger = logging.getLogger("astrbot")
+
+_MISSING = object()
+"""缓存中表示数据库中不存在该偏好设置"""
+_REMOVED = object()
+"""待写入队列中表示删除该偏好设置"""
+_NOT_CACHED = object()
+"""缓存未命中。偏好设置的值可能是 None, 不能用 None 表示未命中"""
+
+
+def _copy(value: Any) -> Any:
+    """缓存中的可变对象需要复制, 防止调用方修改后影响缓存"""
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
 
 class SharedPreferences:
-    def __init__(self, db_helper: BaseDatabase, json_storage_path=None):
+    """偏好设置存储。
+
+    - 读取时优先命中内存中的 LRU 缓存(包括不存在的键), 未命中时才查询数据库。
+    - 写入时立即更新缓存, 并在 `flush_interval` 秒后批量写入数据库。同一个键的多次写入只会写入最后一次。
+    - 关闭前需要调用 `flush` 将未写入的偏好设置写入数据库。
+    """
+
+    def __init__(
+        self,
+        db_helper: BaseDatabase,
+        json_storage_path=None,
+        cache_size: int = 4096,
+        flush_interval: float = 1.0,
+    ):
         if json_storage_path is None:
             json_storage_path = os.path.join(
                 get_astrbot_data_path(), "shared_preferences.json"
@@ -19,10 +51,93 @@ class SharedPreferences:
         self.path = json_storage_path
         self.db_helper = db_helper
 
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self._cache: OrderedDict[tuple[str, str, str], Any] = OrderedDict()
+        self._pending: dict[tuple[str, str, str], Any] = {}
+        """等待写入数据库的偏好设置, 值为 _REMOVED 时表示删除。写入数据库完成后才会移除"""
+        # 已弃用的同步接口会在另一个线程中访问缓存
+        self._lock = threading.RLock()
+        self._flush_task: asyncio.Task | None = None
+        self._flush_lock: asyncio.Lock | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        """执行批量写入的事件循环, 已弃用的同步接口通过它安排写入"""
+        self._write_seq = 0
+        """每次写入、删除时递增, 用于判断查询数据库期间是否有写入"""
+        self.hits = 0
+        self.misses = 0
+
         self._sync_loop = asyncio.new_event_loop()
         t = threading.Thread(target=self._sync_loop.run_forever, daemon=True)
         t.start()
 
+    def _cache_get(self, k: tuple[str, str, str]) -> Any:
+        with self._lock:
+            if k in self._pending:
+                v = self._pending[k]
+                return _MISSING if v is _REMOVED else v
+            if k in self._cache:
+                self._cache.move_to_end(k)
+                return self._cache[k]
+            return _NOT_CACHED
+
+    def _cache_set(self, k: tuple[str, str, str], value: Any):
+        with self._lock:
+            self._cache[k] = value
+            self._cache.move_to_end(k)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _schedule_flush(self):
+        self._loop = asyncio.get_running_loop()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            written = await self.flush()
+            # 写入期间又有新的写入时继续写入; 全部写入失败时留到下一次写入时重试
+            if not self._pending or not written:
+                break
+
+    async def flush(self) -> int:
+        """将所有等待写入的偏好设置写入数据库, 返回成功写入的数量"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        self._loop = asyncio.get_running_loop()
+        written = 0
+        async with self._flush_lock:
+            with self._lock:
+                pending = dict(self._pending)
+            for k, value in pending.items():
+                scope, scope_id, key = k
+                try:
+                    if value is _REMOVED:
+                        await self.db_helper.remove_preference(scope, scope_id, key)
+                    else:
+                        await self.db_helper.insert_preference_or_update(
+                            scope, scope_id, key, {"val": value}
+                        )
+                except Exception as e:
+                    logger.error(f"写入偏好设置 {scope}:{scope_id}:{key} 失败: {e}")
+                    continue
+                written += 1
+                with self._lock:
+                    # 写入完成前, 读取未命中缓存时不会用数据库中的旧值覆盖缓存;
+                    # 写入期间有新的写入时保留, 由下一次写入处理
+                    if self._pending.get(k, _NOT_CACHED) is value:
+                        del self._pending[k]
+        return written
+
+    def get_cache_stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._cache),
+            "pending": len(self._pending),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
     async def get_async(
         self,
         scope: str,
@@ -32,11 +147,22 @@ class SharedPreferences:
     ) -> _VT:
         """获取指定范围和键的偏好设置"""
         if scope_id is not None and key is not None:
+            k = (scope, scope_id, key)
+            cached = self._cache_get(k)
+            if cached is not _NOT_CACHED:
+                self.hits += 1
+                return default if cached is _MISSING else _copy(cached)
+            self.misses += 1
+            write_seq = self._write_seq
             result = await self.db_helper.get_preference(scope, scope_id, key)
             if result:
                 ret = result.value["val"]
             else:
                 ret = default
+            with self._lock:
+                # 查询期间有新的写入时, 查询到的可能是旧值(写入可能已经完成并移出了待写入队列), 不缓存
+                if k not in self._pending and self._write_seq == write_seq:
+                    self._cache_set(k, _copy(ret) if result else _MISSING)
             return ret
         else:
             raise ValueError(
@@ -50,7 +176,33 @@ class SharedPreferences:
         Note: 返回 Preference 列表，其中的 value 属性是一个 dict，value["val"] 为值。scope_id 和 key 可以为 None，这时返回该范围下所有的偏好设置。
         """
         ret = await self.db_helper.get_preferences(scope, scope_id, key)
-        return ret
+        # 合并尚未写入数据库的偏好设置
+        with self._lock:
+            pending = {
+                k: v
+                for k, v in self._pending.items()
+                if k[0] == scope
+                and (scope_id is None or k[1] == scope_id)
+                and (key is None or k[2] == key)
+            }
+        if not pending:
+            return ret
+        merged = []
+        for pref in ret:
+            k = (pref.scope, pref.scope_id, pref.key)
+            if k not in pending:
+                merged.append(pref)
+        for (scope_, scope_id_, key_), v in pending.items():
+            if v is not _REMOVED:
+                merged.append(
+                    Preference(
+                        scope=scope_,
+                        scope_id=scope_id_,
+                        key=key_,
+                        value={"val": _copy(v)},
+                    )
+                )
+        return merged
 
     @overload
     async def session_get(
@@ -96,10 +248,14 @@ class SharedPreferences:
         return await self.get_async("global", "global", key, default)
 
     async def put_async(self, scope: str, scope_id: str, key: str, value: Any):
-        """设置指定范围和键的偏好设置"""
-        await self.db_helper.insert_preference_or_update(
-            scope, scope_id, key, {"val": value}
-        )
+        """设置指定范围和键的偏好设置。会在稍后批量写入数据库。"""
+        k = (scope, scope_id, key)
+        value = _copy(value)
+        with self._lock:
+            self._write_seq += 1
+            self._pending[k] = value
+            self._cache_set(k, value)
+        self._schedule_flush()
 
     async def session_put(self, umo: str, key: str, value: Any):
         await self.put_async("umo", umo, key, value)
@@ -108,8 +264,13 @@ class SharedPreferences:
         await self.put_async("global", "global", key, value)
 
     async def remove_async(self, scope: str, scope_id: str, key: str):
-        """删除指定范围和键的偏好设置"""
-        await self.db_helper.remove_preference(scope, scope_id, key)
+        """删除指定范围和键的偏好设置。会在稍后批量写入数据库。"""
+        k = (scope, scope_id, key)
+        with self._lock:
+            self._write_seq += 1
+            self._pending[k] = _REMOVED
+            self._cache_set(k, _MISSING)
+        self._schedule_flush()
 
     async def session_remove(self, umo: str, key: str):
         await self.remove_async("umo", umo, key)
@@ -120,8 +281,20 @@ class SharedPreferences:
 
     async def clear_async(self, scope: str, scope_id: str):
         """清空指定范围的所有偏好设置"""
+        # 等待正在进行的写入完成, 避免已清空的偏好设置被重新写入
+        await self.flush()
+        self._invalidate(scope, scope_id)
         await self.db_helper.clear_preferences(scope, scope_id)
 
+    def _invalidate(self, scope: str, scope_id: str):
+        """丢弃指定范围的缓存和等待写入的偏好设置"""
+        with self._lock:
+            self._write_seq += 1
+            for k in [k for k in self._pending if k[0] == scope and k[1] == scope_id]:
+                del self._pending[k]
+            for k in [k for k in self._cache if k[0] == scope and k[1] == scope_id]:
+                del self._cache[k]
+
     # ====
     # DEPRECATED METHODS
     # ====
@@ -141,6 +314,10 @@ class SharedPreferences:
             raise ValueError(
                 "scope_id and key cannot be None when getting a specific preference."
             )
+        cached = self._cache_get((scope or "unknown", scope_id or "unknown", key))
+        if cached is not _NOT_CACHED:
+            self.hits += 1
+            return default if cached is _MISSING else _copy(cached)
         result = asyncio.run_coroutine_threadsafe(
             self.get_async(scope or "unknown", scope_id or "unknown", key, default),
             self._sync_loop,
@@ -158,23 +335,48 @@ class SharedPreferences:
 
         return result
 
+    def _write_sync(self, k: tuple[str, str, str], value: Any):
+        """已弃用的同步接口的写入。
+
+        和异步接口一样先放入待写入队列, 由批量写入写入数据库,
+        避免正在进行的批量写入在之后用它取得的旧值覆盖数据库。
+        """
+        with self._lock:
+            self._write_seq += 1
+            self._pending[k] = value
+            self._cache_set(k, _MISSING if value is _REMOVED else value)
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._schedule_flush)
+            return
+        # 还没有进行过批量写入, 直接在同步接口的事件循环中写入数据库
+        if value is _REMOVED:
+            coro = self.db_helper.remove_preference(*k)
+        else:
+            coro = self.db_helper.insert_preference_or_update(*k, {"val": value})
+        asyncio.run_coroutine_threadsafe(coro, self._sync_loop).result()
+        with self._lock:
+            if self._pending.get(k, _NOT_CACHED) is value:
+                del self._pending[k]
+
     def put(self, key, value, scope: str | None = None, scope_id: str | None = None):
-        """设置偏好设置（已弃用）"""
-        asyncio.run_coroutine_threadsafe(
-            self.put_async(scope or "unknown", scope_id or "unknown", key, value),
-            self._sync_loop,
-        ).result()
+        """设置偏好设置（已弃用）
+
+        和异步接口一样会在稍后批量写入数据库。
+        """
+        k = (scope or "unknown", scope_id or "unknown", key)
+        self._write_sync(k, _copy(value))
 
     def remove(self, key, scope: str | None = None, scope_id: str | None = None):
         """删除偏好设置（已弃用）"""
-        asyncio.run_coroutine_threadsafe(
-            self.remove_async(scope or "unknown", scope_id or "unknown", key),
-            self._sync_loop,
-        ).result()
+        k = (scope or "unknown", scope_id or "unknown", key)
+        self._write_sync(k, _REMOVED)
 
     def clear(self, scope: str | None = None, scope_id: str | None = None):
         """清空偏好设置（已弃用）"""
+        scope, scope_id = scope or "unknown", scope_id or "unknown"
+        self._invalidate(scope, scope_id)
         asyncio.run_coroutine_threadsafe(
-            self.clear_async(scope or "unknown", scope_id or "unknown"),
+            self.db_helper.clear_preferences(scope, scope_id),
             self._sync_loop,
         ).result()
@@ -0,0 +1,133 @@
+"""
+启动调度与耗时报告
+
+启动时数据库、渲染器等基础组件按顺序初始化; 互不依赖的提供商、平台适配器、插件的 initialize() 在限制并发数的前提下并发初始化。
+每个组件的初始化耗时都会被记录, 启动完成后输出耗时报告。
+
+用法:
+    async with startup_report.phase("数据库"):
+        await db.initialize()
+
+    await startup_report.run_all(
+        "provider", [(provider_id, lambda: load_provider(cfg)), ...], limit=8
+    )
+"""
+
+import asyncio
+import logging
+import time
+import typing as T
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, asdict
+
+logger = logging.getLogger("astrbot")
+
+DEFAULT_STARTUP_CONCURRENCY = 8
+
+
+@dataclass
+class StartupRecord:
+    group: str
+    """phase / provider / platform / plugin"""
+    name: str
+    duration_ms: float
+    ok: bool = True
+    error: str = ""
+
+
+class StartupReport:
+    def __init__(self, concurrency: int = DEFAULT_STARTUP_CONCURRENCY):
+        self.concurrency = concurrency
+        self.records: list[StartupRecord] = []
+        self.started_at = time.perf_counter()
+        self.finished_at: float | None = None
+
+    def reset(self, concurrency: int | None = None):
+        if concurrency is not None:
+            self.concurrency = max(1, concurrency)
+        self.records = []
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+
+    def record(self, group: str, name: str, duration_ms: float, error: str = ""):
+        self.records.append(
+            StartupRecord(group, name, round(duration_ms, 2), not error, error)
+        )
+
+    @asynccontextmanager
+    async def phase(self, name: str, group: str = "phase"):
+        """记录一个启动阶段的耗时。异常会继续向上抛出"""
+        start = time.perf_counter()
+        error = ""
+        try:
+            yield
+        except BaseException as e:
+            error = str(e) or type(e).__name__
+            raise
+        finally:
+            self.record(group, name, (time.perf_counter() - start) * 1000, error)
+
+    async def run_all(
+        self,
+        group: str,
+        jobs: T.Iterable[tuple[str, T.Callable[[], T.Awaitable[T.Any]]]],
+        limit: int | None = None,
+    ) -> list[T.Any]:
+        """并发执行一组互不依赖的初始化任务, 同时执行的任务数不超过 limit。
+
+        单个任务失败不会影响其他任务, 失败的任务返回异常对象, 由调用者决定如何处理。
+
+        Args:
+            group (str): 组件类型, 如 provider、platform
+            jobs: (组件名称, 返回协程的函数) 的列表
+            limit (int): 并发数, 为空时使用 concurrency
+        """
+        semaphore = asyncio.Semaphore(max(1, limit or self.concurrency))
+
+        async def run(name: str, factory: T.Callable[[], T.Awaitable[T.Any]]):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    result = await factory()
+                except Exception as e:
+                    self.record(
+                        group, name, (time.perf_counter() - start) * 1000, str(e)
+                    )
+                    return e
+                self.record(group, name, (time.perf_counter() - start) * 1000)
+                return result
+
+        return await asyncio.gather(*(run(name, factory) for name, factory in jobs))
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    @property
+    def total_ms(self) -> float:
+        end = self.finished_at or time.perf_counter()
+        return round((end - self.started_at) * 1000, 2)
+
+    def summary(self) -> dict:
+        return {
+            "total_ms": self.total_ms,
+            "concurrency": self.concurrency,
+            "records": [asdict(r) for r in self.records],
+        }
+
+    def log_summary(self, top: int = 10):
+        """输出启动耗时报告: 各阶段耗时与最慢的组件"""
+        logger.info(f"启动耗时 {self.total_ms / 1000:.2f}s。")
+        for r in self.records:
+            if r.group == "phase":
+                logger.info(f"  [阶段] {r.name}: {r.duration_ms:.0f}ms")
+        components = sorted(
+            (r for r in self.records if r.group != "phase"),
+            key=lambda r: r.duration_ms,
+            reverse=True,
+        )
+        for r in components[:top]:
+            status = "" if r.ok else f" (失败: {r.error})"
+            logger.info(f"  [{r.group}] {r.name}: {r.duration_ms:.0f}ms{status}")
+
+
+startup_report = StartupReport()
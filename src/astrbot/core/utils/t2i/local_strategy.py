@@ -1,8 +1,14 @@
 import re
 import os
+import asyncio
+import functools
+import hashlib
+import multiprocessing
 import aiohttp
 import ssl
 import certifi
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
 from abc import ABC, abstractmethod
 from astrbot.core.config import VERSION
@@ -10,13 +16,20 @@ from astrbot.core.config import VERSION
 from . import RenderStrategy
 from PIL import ImageFont, Image, ImageDraw
 from astrbot.core.utils.io import save_temp_img
+from astrbot.core.utils.media_cache import media_cache
 from astrbot.core.utils.astrbot_path import get_astrbot_data_path
+from astrbot.core.log import LogManager
+
+logger = LogManager.GetLogger(log_name="astrbot")
+
+DEFAULT_LOCAL_RENDER_SETTINGS = {"workers": 2, "cache_ttl": 3600}
 
 
 class FontManager:
     """字体管理类，负责加载和缓存字体"""
 
     _font_cache = {}
+    _named_font_cache = {}
 
     @classmethod
     def get_font(cls, size: int) -> ImageFont.FreeTypeFont:
@@ -60,13 +73,54 @@ class FontManager:
         except Exception:
             raise RuntimeError("无法加载任何字体")
 
+    @classmethod
+    def get_named_font(
+        cls, font_names: tuple[str, ...], size: int
+    ) -> ImageFont.FreeTypeFont | None:
+        """按顺序尝试加载字体列表中的字体(如粗体、斜体), 都加载失败时返回 None。结果会被缓存"""
+        key = (font_names, size)
+        if key in cls._named_font_cache:
+            return cls._named_font_cache[key]
+        font = None
+        for font_name in font_names:
+            try:
+                font = ImageFont.truetype(font_name, size)
+                break
+            except Exception:
+                continue
+        cls._named_font_cache[key] = font
+        return font
+
+    @classmethod
+    def warm_up(cls, sizes: list[int]):
+        """预先加载常用大小的字体"""
+        for size in sizes:
+            cls.get_font(size)
+            cls.get_named_font(BOLD_FONTS, size)
+            cls.get_named_font(ITALIC_FONTS, size)
+
+
+BOLD_FONTS = (
+    "msyhbd.ttc",  # 微软雅黑粗体 (Windows)
+    "Arial-Bold.ttf",  # Arial粗体
+    "DejaVuSans-Bold.ttf",  # Linux粗体
+)
+ITALIC_FONTS = (
+    "msyhi.ttc",  # 微软雅黑斜体 (Windows)
+    "Arial-Italic.ttf",  # Arial斜体
+    "DejaVuSans-Oblique.ttf",  # Linux斜体
+)
+# 正文、页脚、各级标题的字体大小
+WARM_UP_FONT_SIZES = [26, 20, 42, 38, 34, 30, 22]
+
 
 class TextMeasurer:
     """测量文本尺寸的工具类"""
 
     @staticmethod
+    @functools.lru_cache(maxsize=65536)
     def get_text_size(text: str, font: ImageFont.FreeTypeFont) -> tuple[int, int]:
-        """获取文本的尺寸"""
+        """获取文本的尺寸。字体对象由 FontManager 缓存, 相同字体与文本的测量结果会被缓存"""
         try:
             # PIL 9.0.0 以上版本
             return (
@@ -83,9 +137,17 @@ class TextMeasurer:
         text: str, font: ImageFont.FreeTypeFont, max_width: int
     ) -> list[str]:
         """将文本拆分为多行，确保每行不超过指定宽度"""
+        # 计算高度和绘制时会对同一段文本拆分两次, 返回副本避免缓存被修改
+        return list(TextMeasurer._split_text_to_fit_width(text, font, max_width))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _split_text_to_fit_width(
+        text: str, font: ImageFont.FreeTypeFont, max_width: int
+    ) -> tuple[str, ...]:
         lines = []
         if not text:
-            return lines
+            return ()
 
         remaining_text = text
         while remaining_text:
@@ -95,19 +157,21 @@ class TextMeasurer:
                 lines.append(remaining_text)
                 break
 
-            # 尝试逐字计算能放入当前行的最多字符
-            for i in range(len(remaining_text), 0, -1):
-                width = TextMeasurer.get_text_size(remaining_text[:i], font)[0]
+            # 文本宽度随长度单调增加, 二分查找能放入当前行的最多字符
+            low, high = 0, len(remaining_text) - 1
+            while low < high:
+                mid = (low + high + 1) // 2
+                width = TextMeasurer.get_text_size(remaining_text[:mid], font)[0]
                 if width <= max_width:
-                    lines.append(remaining_text[:i])
-                    remaining_text = remaining_text[i:]
-                    break
-            else:
-                # 如果单个字符都放不下，强制放一个字符
-                lines.append(remaining_text[0])
-                remaining_text = remaining_text[1:]
+                    low = mid
+                else:
+                    high = mid - 1
+            # 如果单个字符都放不下，强制放一个字符
+            i = max(low, 1)
+            lines.append(remaining_text[:i])
+            remaining_text = remaining_text[i:]
 
-        return lines
+        return tuple(lines)
 
 
 class MarkdownElement(ABC):
@@ -193,19 +257,7 @@ class BoldTextElement(MarkdownElement):
     ) -> int:
         # 尝试使用粗体字体，如果没有则绘制两次模拟粗体效果
         try:
-            bold_fonts = [
-                "msyhbd.ttc",  # 微软雅黑粗体 (Windows)
-                "Arial-Bold.ttf",  # Arial粗体
-                "DejaVuSans-Bold.ttf",  # Linux粗体
-            ]
-
-            bold_font = None
-            for font_name in bold_fonts:
-                try:
-                    bold_font = ImageFont.truetype(font_name, font_size)
-                    break
-                except Exception:
-                    continue
+            bold_font = FontManager.get_named_font(BOLD_FONTS, font_size)
 
             if bold_font:
                 lines = TextMeasurer.split_text_to_fit_width(
@@ -258,19 +310,7 @@ class ItalicTextElement(MarkdownElement):
     ) -> int:
         # 尝试使用斜体字体，如果没有则使用倾斜变换模拟斜体效果
         try:
-            italic_fonts = [
-                "msyhi.ttc",  # 微软雅黑斜体 (Windows)
-                "Arial-Italic.ttf",  # Arial斜体
-                "DejaVuSans-Oblique.ttf",  # Linux斜体
-            ]
-
-            italic_font = None
-            for font_name in italic_fonts:
-                try:
-                    italic_font = ImageFont.truetype(font_name, font_size)
-                    break
-                except Exception:
-                    continue
+            italic_font = FontManager.get_named_font(ITALIC_FONTS, font_size)
 
             if italic_font:
                 lines = TextMeasurer.split_text_to_fit_width(
@@ -630,6 +670,7 @@ class ImageElement(MarkdownElement):
         super().__init__(content)
         self.image_url = image_url
         self.image = None
+        self.image_data: bytes | None = None
 
     async def load_image(self):
         """加载图片"""
@@ -642,13 +683,16 @@ class ImageElement(MarkdownElement):
             ) as session:
                 async with session.get(self.image_url) as resp:
                     if resp.status == 200:
-                        image_data = await resp.read()
-                        self.image = Image.open(BytesIO(image_data))
+                        self.set_image_data(await resp.read())
                     else:
                         print(f"Failed to load image: HTTP {resp.status}")
         except Exception as e:
             print(f"Failed to load image: {e}")
 
+    def set_image_data(self, image_data: bytes):
+        self.image_data = image_data
+        self.image = Image.open(BytesIO(image_data))
+
     def calculate_height(self, image_width: int, font_size: int) -> int:
         if self.image is None:
             return font_size + 20  # 图片加载失败的默认高度
@@ -705,6 +749,15 @@ class MarkdownParser:
 
     @staticmethod
     async def parse(text: str) -> list[MarkdownElement]:
+        elements = MarkdownParser.parse_elements(text)
+        images = [e for e in elements if isinstance(e, ImageElement)]
+        if images:
+            await asyncio.gather(*(e.load_image() for e in images))
+        return elements
+
+    @staticmethod
+    def parse_elements(text: str) -> list[MarkdownElement]:
+        """解析文本, 不加载图片"""
         elements = []
         lines = text.split("\n")
 
@@ -716,9 +769,7 @@ class MarkdownParser:
             image_match = re.search(r"!\s*\[(.*?)\]\s*\((.*?)\)", line)
             if image_match:
                 image_url = image_match.group(2)
-                element = ImageElement(line, image_url)
-                await element.load_image()
-                elements.append(element)
+                elements.append(ImageElement(line, image_url))
                 i += 1
                 continue
 
@@ -855,7 +906,10 @@ class MarkdownRenderer:
     async def render(self, markdown_text: str) -> Image.Image:
         # 解析Markdown文本
         elements = await MarkdownParser.parse(markdown_text)
+        return self.draw(elements)
 
+    def draw(self, elements: list[MarkdownElement]) -> Image.Image:
+        """将解析后的元素绘制为图像。只进行 CPU 计算, 可以在其他线程或进程中执行"""
         # 计算总高度
         total_height = 20  # 初始边距
         for element in elements:
@@ -912,20 +966,138 @@ class MarkdownRenderer:
         return image
 
 
+def _init_render_worker():
+    """渲染进程启动时预先加载字体"""
+    FontManager.warm_up(WARM_UP_FONT_SIZES)
+
+
+def render_markdown(
+    markdown_text: str, font_size: int, width: int, images: dict[str, bytes]
+) -> bytes:
+    """将 Markdown 文本渲染为 JPEG 图片。在渲染进程中执行
+
+    Args:
+        markdown_text (str): Markdown 文本
+        font_size (int): 字体大小
+        width (int): 图片宽度
+        images (dict[str, bytes]): 已经下载的图片, URL -> 图片数据
+    """
+    elements = MarkdownParser.parse_elements(markdown_text)
+    for element in elements:
+        if isinstance(element, ImageElement) and element.image_url in images:
+            try:
+                element.set_image_data(images[element.image_url])
+            except Exception as e:
+                print(f"Failed to load image: {e}")
+    image = MarkdownRenderer(font_size=font_size, width=width).draw(elements)
+    buf = BytesIO()
+    image.save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def _get_mp_context():
+    """获取渲染进程使用的 multiprocessing 上下文
+
+    主进程中已经运行着多个线程, 直接 fork 出的子进程可能继承被其他线程持有的锁, 因此不使用 fork。
+    spawn 启动的每个渲染进程都会重新导入主模块(main.py)和 astrbot.core, 各自创建一份配置、数据库连接和 SharedPreferences 的事件循环线程,
+    启动一个进程需要一秒多, 每个进程占用约 70 MB 内存。支持 forkserver 的平台上, 由 forkserver 进程预先导入本模块, 这些初始化只进行一次,
+    渲染进程从 forkserver 进程 fork 出来, 不需要重新导入。Windows 不支持 forkserver, 仍然使用 spawn。
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    ctx = multiprocessing.get_context("forkserver")
+    ctx.set_forkserver_preload([__name__])
+    return ctx
+
+
 class LocalRenderStrategy(RenderStrategy):
-    """本地渲染策略实现"""
+    """本地渲染策略实现
+
+    排版和绘制在进程池中进行, 不会阻塞事件循环; 图片在主进程中下载后传给渲染进程。
+    渲染结果保存在媒体缓存中, 相同的文本在缓存时间内直接复用。含有图片的文本不缓存, 因为同一个图片 URL 的内容可能会变化。
+    """
+
+    template_name = "markdown"
+
+    def __init__(self, settings: dict | None = None):
+        self.settings = {**DEFAULT_LOCAL_RENDER_SETTINGS, **(settings or {})}
+        self._pool: ProcessPoolExecutor | None = None
+
+    def configure(self, settings: dict | None):
+        workers = self.settings["workers"]
+        self.settings = {**DEFAULT_LOCAL_RENDER_SETTINGS, **(settings or {})}
+        if self._pool and workers != self.settings["workers"]:
+            self.close()
+
+    def start(self):
+        """提前启动渲染进程并加载字体, 避免第一次渲染时等待进程启动"""
+        pool = self._get_pool()
+        if pool:
+            pool.submit(_init_render_worker)
+
+    def _get_pool(self) -> ProcessPoolExecutor | None:
+        workers = self.settings["workers"]
+        if workers <= 0:
+            return None
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=_get_mp_context(),
+                initializer=_init_render_worker,
+            )
+        return self._pool
+
+    def close(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
 
     async def render_custom_template(
         self, tmpl_str: str, tmpl_data: dict, return_url: bool = True
     ) -> str:
         raise NotImplementedError
 
-    async def render(self, text: str, return_url: bool = False) -> str:
-        # 创建渲染器
-        renderer = MarkdownRenderer(font_size=26, width=800)
-
-        # 渲染Markdown文本
-        image = await renderer.render(text)
-
-        # 保存图像并返回路径/URL
-        return save_temp_img(image)
+    async def render(
+        self,
+        text: str,
+        return_url: bool = False,
+        font_size: int = 26,
+        width: int = 800,
+    ) -> str:
+        elements = MarkdownParser.parse_elements(text)
+        image_elements = [e for e in elements if isinstance(e, ImageElement)]
+
+        cache_ttl = self.settings["cache_ttl"]
+        alias = None
+        if cache_ttl > 0 and not image_elements:
+            digest = hashlib.sha256(text.encode()).hexdigest()
+            alias = f"t2i:{self.template_name}:{width}:{font_size}:{digest}"
+            if path := media_cache.lookup(alias):
+                return path
+
+        # 图片在主进程中异步下载
+        if image_elements:
+            await asyncio.gather(*(e.load_image() for e in image_elements))
+        images = {e.image_url: e.image_data for e in image_elements if e.image_data}
+
+        data = await self._render(text, font_size, width, images)
+        path = save_temp_img(data)
+        if alias:
+            media_cache.remember(alias, path, cache_ttl)
+        return path
+
+    async def _render(
+        self, text: str, font_size: int, width: int, images: dict[str, bytes]
+    ) -> bytes:
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        if pool:
+            try:
+                return await loop.run_in_executor(
+                    pool, render_markdown, text, font_size, width, images
+                )
+            except (BrokenProcessPool, RuntimeError, OSError) as e:
+                # 渲染进程异常退出或无法创建进程, 重建进程池, 本次在线程中渲染
+                logger.warning(f"本地文本转图像进程池不可用: {e}，将在线程中渲染。")
+                self.close()
+        return await asyncio.to_thread(render_markdown, text, font_size, width, images)
@@ -1,12 +1,10 @@
-import aiohttp
 import asyncio
-import ssl
-import certifi
 import logging
 import random
 from . import RenderStrategy
 from astrbot.core.config import VERSION
 from astrbot.core.utils.io import download_image_by_url
+from astrbot.core.utils.http_client import http_client
 from astrbot.core.utils.t2i.template_manager import TemplateManager
 
 ASTRBOT_T2I_DEFAULT_ENDPOINT = "https://t2i.soulter.top/text2img"
@@ -36,21 +34,20 @@ class NetworkRenderStrategy(RenderStrategy):
     async def get_official_endpoints(self):
         """获取官方的 t2i 端点列表。"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    "https://api.soulter.top/astrbot/t2i-endpoints"
-                ) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        all_endpoints: list[dict] = data.get("data", [])
-                        self.endpoints = [
-                            ep.get("url")
-                            for ep in all_endpoints
-                            if ep.get("active") and ep.get("url")
-                        ]
-                        logger.info(
-                            f"Successfully got {len(self.endpoints)} official T2I endpoints."
-                        )
+            async with http_client.get_session().get(
+                "https://api.soulter.top/astrbot/t2i-endpoints"
+            ) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    all_endpoints: list[dict] = data.get("data", [])
+                    self.endpoints = [
+                        ep.get("url")
+                        for ep in all_endpoints
+                        if ep.get("active") and ep.get("url")
+                    ]
+                    logger.info(
+                        f"Successfully got {len(self.endpoints)} official T2I endpoints."
+                    )
         except Exception as e:
             logger.error(f"Failed to get official endpoints: {e}")
 
@@ -87,19 +84,14 @@ class NetworkRenderStrategy(RenderStrategy):
         for endpoint in endpoints:
             try:
                 if return_url:
-                    ssl_context = ssl.create_default_context(cafile=certifi.where())
-                    connector = aiohttp.TCPConnector(ssl=ssl_context)
-                    async with aiohttp.ClientSession(
-                        trust_env=True, connector=connector
-                    ) as session:
-                        async with session.post(
-                            f"{endpoint}/generate", json=post_data
-                        ) as resp:
-                            if resp.status == 200:
-                                ret = await resp.json()
-                                return f"{endpoint}/{ret['data']['id']}"
-                            else:
-                                raise Exception(f"HTTP {resp.status}")
+                    async with http_client.get_session().post(
+                        f"{endpoint}/generate", json=post_data
+                    ) as resp:
+                        if resp.status == 200:
+                            ret = await resp.json()
+                            return f"{endpoint}/{ret['data']['id']}"
+                        else:
+                            raise Exception(f"HTTP {resp.status}")
                 else:
                     # download_image_by_url 失败时抛异常
                     return await download_image_by_url(
@@ -0,0 +1,164 @@
+"""
+轻量的耗时追踪
+
+记录 pipeline 阶段、插件 handler、提供商 text_chat 与工具调用的耗时(span), 按照 (类型, 名称) 聚合为直方图,
+并在内存中保留最近的慢事件。可以导出为 Prometheus 文本格式。
+
+用法:
+    with tracer.span("provider", provider_id, session_id=umo):
+        resp = await provider.text_chat(...)
+
+    async for item in trace_async_gen(agen, "tool", tool_name, session_id=umo):
+        ...
+"""
+
+import time
+import typing as T
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from .latency_histogram import LatencyHistogram
+
+
+@dataclass
+class Span:
+    kind: str
+    """stage / star_handler / provider / tool"""
+    name: str
+    duration_ms: float
+    session_id: str = ""
+    error: bool = False
+    timestamp: float = 0.0
+    """结束时的 Unix 时间戳"""
+
+
+class Tracer:
+    def __init__(self, slow_threshold_ms: float = 3000, ring_size: int = 200):
+        """
+        Args:
+            slow_threshold_ms (float): 耗时超过该值的 span 会被记录到慢事件列表
+            ring_size (int): 慢事件列表的长度
+        """
+        self.slow_threshold_ms = slow_threshold_ms
+        self.histograms: dict[tuple[str, str], LatencyHistogram] = {}
+        self.errors: dict[tuple[str, str], int] = {}
+        self.slow_spans: deque[Span] = deque(maxlen=ring_size)
+
+    def record(
+        self,
+        kind: str,
+        name: str,
+        duration_ms: float,
+        session_id: str = "",
+        error: bool = False,
+    ):
+        key = (kind, name)
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = LatencyHistogram()
+        hist.observe(duration_ms)
+        if error:
+            self.errors[key] = self.errors.get(key, 0) + 1
+        if duration_ms >= self.slow_threshold_ms or error:
+            self.slow_spans.append(
+                Span(
+                    kind=kind,
+                    name=name,
+                    duration_ms=round(duration_ms, 2),
+                    session_id=session_id,
+                    error=error,
+                    timestamp=time.time(),
+                )
+            )
+
+    @contextmanager
+    def span(self, kind: str, name: str, session_id: str = ""):
+        """记录一段代码的耗时。代码块抛出异常时, span 会被标记为 error"""
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(
+                kind, name, (time.perf_counter() - start) * 1000, session_id, error
+            )
+
+    def get_slow_spans(self) -> list[dict]:
+        """最近的慢事件, 最新的在前"""
+        return [asdict(span) for span in reversed(self.slow_spans)]
+
+    def get_summary(self) -> dict[str, dict[str, dict]]:
+        result: dict[str, dict[str, dict]] = {}
+        for (kind, name), hist in self.histograms.items():
+            data = hist.to_dict()
+            data.pop("buckets")
+            data["errors"] = self.errors.get((kind, name), 0)
+            result.setdefault(kind, {})[name] = data
+        return result
+
+    def to_prometheus(self) -> str:
+        """导出为 Prometheus 文本格式"""
+        lines = [
+            "# HELP astrbot_span_duration_milliseconds Duration of traced spans.",
+            "# TYPE astrbot_span_duration_milliseconds histogram",
+        ]
+        for (kind, name), hist in sorted(self.histograms.items()):
+            labels = f'kind="{_escape(kind)}",name="{_escape(name)}"'
+            for le, count in hist.cumulative():
+                lines.append(
+                    f'astrbot_span_duration_milliseconds_bucket{{{labels},le="{le}"}} {count}'
+                )
+            lines.append(
+                f"astrbot_span_duration_milliseconds_sum{{{labels}}} {hist.sum:.3f}"
+            )
+            lines.append(
+                f"astrbot_span_duration_milliseconds_count{{{labels}}} {hist.count}"
+            )
+        lines.append(
+            "# HELP astrbot_span_errors_total Number of traced spans that raised."
+        )
+        lines.append("# TYPE astrbot_span_errors_total counter")
+        for (kind, name), count in sorted(self.errors.items()):
+            lines.append(
+                f'astrbot_span_errors_total{{kind="{_escape(kind)}",name="{_escape(name)}"}} {count}'
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+async def trace_async_gen(
+    agen: T.AsyncGenerator,
+    kind: str,
+    name: str,
+    session_id: str = "",
+) -> T.AsyncGenerator:
+    """包装一个异步生成器, 只统计生成器自身的执行时间, 不包括调用方在两次 yield 之间花费的时间"""
+    elapsed = 0.0
+    error = False
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = await agen.__anext__()
+            except StopAsyncIteration:
+                elapsed += time.perf_counter() - start
+                break
+            except BaseException:
+                elapsed += time.perf_counter() - start
+                error = True
+                raise
+            elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        if hasattr(agen, "aclose"):
+            await agen.aclose()
+        tracer.record(kind, name, elapsed * 1000, session_id, error)
+
+
+tracer = Tracer()
@@ -233,6 +233,30 @@ class PluginRoute(Route):
         for plugin in self.plugin_manager.context.get_all_stars():
             if plugin_name and plugin.name != plugin_name:
                 continue
+            # 尚未载入的延迟载入插件只有占位的元数据, 处理器信息来自插件清单
+            lazy_entry = self.plugin_manager.lazy_plugins.get(plugin.module_path)
+            if lazy_entry:
+                handlers = [
+                    {
+                        "event_type": handler["event_type"],
+                        "event_type_h": self.translated_event_type[
+                            EventType.AdapterMessageEvent
+                        ],
+                        "handler_full_name": "",
+                        "desc": handler["desc"],
+                        "handler_name": handler["handler_name"],
+                        "type": "指令" if handler["commands"] else "指令组",
+                        "cmd": (handler["commands"] or handler["exact_commands"])[0],
+                        "has_admin": False,
+                    }
+                    for handler in lazy_entry["handlers"]
+                ]
+                load_stats = lazy_entry["stats"]
+            else:
+                handlers = await self.get_plugin_handlers_info(
+                    plugin.star_handler_full_names
+                )
+                load_stats = self.plugin_manager.load_stats.get(plugin.module_path)
             _t = {
                 "name": plugin.name,
                 "repo": "" if plugin.repo is None else plugin.repo,
@@ -242,9 +266,9 @@ class PluginRoute(Route):
                 "reserved": plugin.reserved,
                 "activated": plugin.activated,
                 "online_vesion": "",
-                "handlers": await self.get_plugin_handlers_info(
-                    plugin.star_handler_full_names
-                ),
+                "handlers": handlers,
+                "lazy": lazy_entry is not None,
+                "load_stats": load_stats,
             }
             _plugin_resp.append(_t)
         return (
@@ -5,13 +5,16 @@ import threading
 import aiohttp
 from .route import Route, Response, RouteContext
 from astrbot.core import logger
-from quart import request
+from quart import request, Response as QuartResponse
 from astrbot.core.core_lifecycle import AstrBotCoreLifecycle
 from astrbot.core.db import BaseDatabase
 from astrbot.core.config import VERSION
 from astrbot.core.utils.io import get_dashboard_version
 from astrbot.core import DEMO_MODE
 from astrbot.core.db.migration.helper import check_migration_needed_v4
+from astrbot.core.utils.tracing import tracer
+from astrbot.core.utils.startup import startup_report
+from astrbot.core.pipeline import ContentSafetyCheckStage
 
 
 class StatRoute(Route):
@@ -26,6 +29,12 @@ class StatRoute(Route):
             "/stat/get": ("GET", self.get_stat),
             "/stat/version": ("GET", self.get_version),
             "/stat/start-time": ("GET", self.get_start_time),
+            "/stat/event-bus": ("GET", self.get_event_bus_metrics),
+            "/stat/pipeline": ("GET", self.get_pipeline_metrics),
+            "/stat/providers": ("GET", self.get_provider_metrics),
+            "/stat/metrics": ("GET", self.get_prometheus_metrics),
+            "/stat/traces": ("GET", self.get_traces),
+            "/stat/startup": ("GET", self.get_startup_report),
             "/stat/restart-core": ("POST", self.restart_core),
             "/stat/test-ghproxy-connection": ("POST", self.test_ghproxy_connection),
         }
@@ -75,9 +84,71 @@ class StatRoute(Route):
             .__dict__
         )
 
+    async def get_startup_report(self):
+        """启动时各个阶段与组件的初始化耗时"""
+        return Response().ok(startup_report.summary()).__dict__
+
     async def get_start_time(self):
         return Response().ok({"start_time": self.core_lifecycle.start_time}).__dict__
 
+    async def get_event_bus_metrics(self):
+        return Response().ok(self.core_lifecycle.event_bus.get_metrics()).__dict__
+
+    async def get_pipeline_metrics(self):
+        return (
+            Response()
+            .ok(
+                {
+                    conf_id: {
+                        **scheduler.get_stage_metrics(),
+                        "content_safety": self._content_safety_metrics(scheduler),
+                    }
+                    for conf_id, scheduler in self.core_lifecycle.pipeline_scheduler_mapping.items()
+                }
+            )
+            .__dict__
+        )
+
+    @staticmethod
+    def _content_safety_metrics(scheduler) -> list[dict]:
+        """远程内容审核服务的缓存命中率与熔断状态"""
+        for stage in scheduler.stages:
+            if isinstance(stage, ContentSafetyCheckStage):
+                return stage.strategy_selector.stats()
+        return []
+
+    async def get_provider_metrics(self):
+        """各个提供商的 API Key 池状态"""
+        return (
+            Response()
+            .ok(
+                {
+                    provider.meta().id: provider.key_pool.stats()
+                    for provider in self.core_lifecycle.provider_manager.provider_insts
+                    if getattr(provider, "key_pool", None)
+                }
+            )
+            .__dict__
+        )
+
+    async def get_prometheus_metrics(self):
+        return QuartResponse(
+            tracer.to_prometheus(), mimetype="text/plain; version=0.0.4"
+        )
+
+    async def get_traces(self):
+        return (
+            Response()
+            .ok(
+                {
+                    "summary": tracer.get_summary(),
+                    "slow_spans": tracer.get_slow_spans(),
+                    "slow_threshold_ms": tracer.slow_threshold_ms,
+                }
+            )
+            .__dict__
+        )
+
     async def get_stat(self):
         offset_sec = request.args.get("offset_sec", 86400)
         offset_sec = int(offset_sec)
@@ -3,6 +3,7 @@ import traceback
 from quart import request
 
 from astrbot.core import logger
+from astrbot.core.agent.tool_cache import tool_result_cache
 from astrbot.core.core_lifecycle import AstrBotCoreLifecycle
 from astrbot.core.star import star_map
 
@@ -26,6 +27,8 @@ class ToolsRoute(Route):
             "/tools/list": ("GET", self.get_tool_list),
             "/tools/toggle-tool": ("POST", self.toggle_tool),
             "/tools/mcp/sync-provider": ("POST", self.sync_provider),
+            "/tools/cache/stats": ("GET", self.get_cache_stats),
+            "/tools/cache/clear": ("POST", self.clear_cache),
         }
         self.register_routes()
         self.tool_mgr = self.core_lifecycle.provider_manager.llm_tools
@@ -286,7 +289,13 @@ class ToolsRoute(Route):
         """获取所有注册的工具列表"""
         try:
             tools = self.tool_mgr.func_list
-            tools_dict = [tool.__dict__() for tool in tools]
+            tools_dict = []
+            for tool in tools:
+                tool_dict = tool.__dict__()
+                counter = tool_result_cache.counter(tool.name)
+                tool_dict["cache_hits"] = counter.hits
+                tool_dict["cache_misses"] = counter.misses
+                tools_dict.append(tool_dict)
             return Response().ok(data=tools_dict).__dict__
         except Exception as e:
             logger.error(traceback.format_exc())
@@ -319,6 +328,20 @@ class ToolsRoute(Route):
             logger.error(traceback.format_exc())
             return Response().error(f"操作工具失败: {str(e)}").__dict__
 
+    async def get_cache_stats(self):
+        """获取工具结果缓存的命中统计"""
+        return Response().ok(data=tool_result_cache.stats()).__dict__
+
+    async def clear_cache(self):
+        """清空工具结果缓存。传入 name 时只清空指定工具的缓存"""
+        try:
+            data = await request.json
+            tool_result_cache.clear((data or {}).get("name"))
+            return Response().ok(None, "已清空工具结果缓存。").__dict__
+        except Exception as e:
+            logger.error(traceback.format_exc())
+            return Response().error(f"清空工具结果缓存失败: {str(e)}").__dict__
+
     async def sync_provider(self):
         """同步 MCP 提供者配置"""
         try:
@@ -0,0 +1,129 @@
+import json
+import pytest
+import pytest_asyncio
+from types import SimpleNamespace
+from sqlalchemy import update
+from astrbot.core.conversation_mgr import ConversationManager
+from astrbot.core.db.po import ConversationV2
+from astrbot.core.db.sqlite import SQLiteDatabase
+from astrbot.core.pipeline.process_stage.method.llm_request import LLMRequestSubStage
+from astrbot.core.provider.entities import LLMResponse, ProviderRequest
+
+HISTORY = [
+    {"role": "user", "content": "hi"},
+    {"role": "assistant", "content": "hello"},
+    {"role": "user", "content": "how are you"},
+    {"role": "assistant", "content": "fine"},
+]
+
+
+@pytest_asyncio.fixture
+async def db(tmp_path):
+    db = SQLiteDatabase(str(tmp_path / "data_v4.db"))
+    await db.initialize()
+    return db
+
+
+@pytest.mark.asyncio
+async def test_listing_queries_include_history(db):
+    conv = await db.create_conversation("umo", "test_platform", content=HISTORY[:2])
+    await db.append_conversation_messages(conv.conversation_id, HISTORY[2:])
+
+    convs = await db.get_conversations(user_id="umo")
+    assert convs[0].content == HISTORY
+
+    convs, total = await db.get_filtered_conversations()
+    assert total == 1
+    assert convs[0].content == HISTORY
+
+    convs = await db.get_all_conversations()
+    assert convs[0].content == HISTORY
+
+
+@pytest.mark.asyncio
+async def test_legacy_empty_content_is_migrated(db):
+    conv = await db.create_conversation("umo", "test_platform")
+    cid = conv.conversation_id
+    # 旧版本创建的会话, content 默认为 []
+    async with db.get_db() as session:
+        async with session.begin():
+            await session.execute(
+                update(ConversationV2)
+                .where(ConversationV2.conversation_id == cid)
+                .values(content=[])
+            )
+
+    await db.append_conversation_messages(cid, HISTORY[:2])
+    await db.append_conversation_messages(cid, HISTORY[2:])
+
+    assert (await db.get_conversation_by_id(cid)).content == HISTORY
+    assert (await db.get_conversations(user_id="umo"))[0].content == HISTORY
+    assert (await db.get_filtered_conversations())[0][0].content == HISTORY
+    assert (await db.get_all_conversations())[0].content == HISTORY
+
+
+@pytest.mark.asyncio
+async def test_get_conversation_last_turns(db):
+    conv = await db.create_conversation("umo", "test_platform", content=HISTORY)
+
+    windowed = await db.get_conversation_by_id(conv.conversation_id, last_turns=1)
+    assert windowed.content == HISTORY[2:]
+
+    full = await db.get_conversation_by_id(conv.conversation_id)
+    assert full.content == HISTORY
+
+
+@pytest.mark.asyncio
+async def test_rewrite_keeps_history_outside_the_window(db):
+    conv_mgr = ConversationManager(db)
+    conv = await db.create_conversation("umo", "test_platform", content=HISTORY)
+    cid = conv.conversation_id
+
+    # 请求时只读取了最近一轮对话, 插件修改了这一轮的内容
+    windowed = await conv_mgr.get_conversation("umo", cid, last_turns=1)
+    edited = [
+        {"role": "user", "content": "how are you?"},
+        {"role": "assistant", "content": "fine"},
+    ]
+    req = ProviderRequest(prompt="bye", contexts=edited, conversation=windowed)
+
+    stage = LLMRequestSubStage()
+    stage.conv_manager = conv_mgr
+    stage.max_context_length = 1
+    event = SimpleNamespace(unified_msg_origin="umo")
+    await stage._save_to_history(
+        event, req, LLMResponse(role="assistant", completion_text="goodbye")
+    )
+
+    full = await db.get_conversation_by_id(cid)
+    assert full.content == HISTORY[:2] + edited + [
+        {"role": "user", "content": "bye"},
+        {"role": "assistant", "content": "goodbye"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_token_truncation_does_not_delete_history(db):
+    conv_mgr = ConversationManager(db)
+    conv = await db.create_conversation("umo", "test_platform", content=HISTORY)
+    cid = conv.conversation_id
+    conversation = await conv_mgr.get_conversation("umo", cid)
+
+    # Token 预算丢弃了所有的历史记录, 只影响这一次请求
+    req = ProviderRequest(prompt="bye", contexts=[], conversation=conversation)
+    stage = LLMRequestSubStage()
+    stage.conv_manager = conv_mgr
+    stage.max_context_length = -1
+    event = SimpleNamespace(unified_msg_origin="umo")
+    await stage._save_to_history(
+        event,
+        req,
+        LLMResponse(role="assistant", completion_text="goodbye"),
+        json.loads(conversation.history),
+    )
+
+    full = await db.get_conversation_by_id(cid)
+    assert full.content == HISTORY + [
+        {"role": "user", "content": "bye"},
+        {"role": "assistant", "content": "goodbye"},
+    ]
@@ -0,0 +1,102 @@
+import json
+import pytest
+from astrbot.core import event_spool as event_spool_module
+from astrbot.core.event_spool import EventSpool
+from astrbot.core.message.components import At, Image, Reply
+from astrbot.core.platform import (
+    AstrBotMessage,
+    AstrMessageEvent,
+    Group,
+    MessageMember,
+    MessageType,
+    PlatformMetadata,
+)
+
+
+class RawConnection:
+    """模拟平台原始消息对象中无法序列化的连接"""
+
+
+def make_event(platform_name: str, raw_message=None) -> AstrMessageEvent:
+    message_obj = AstrBotMessage()
+    message_obj.type = MessageType.GROUP_MESSAGE
+    message_obj.self_id = "bot"
+    message_obj.session_id = "g1"
+    message_obj.message_id = "m1"
+    message_obj.group = Group(
+        group_id="g1", members=[MessageMember(user_id="u1", nickname="a")]
+    )
+    message_obj.sender = MessageMember(user_id="u1", nickname="a")
+    message_obj.message = [
+        At(qq="bot"),
+        Reply(id="m0", chain=[Image.fromBase64("aGVsbG8=")], sender_id="u2"),
+        Image.fromBase64("d29ybGQ="),
+    ]
+    message_obj.message_str = "hello"
+    message_obj.raw_message = raw_message
+    meta = PlatformMetadata(name=platform_name, description="", id=f"{platform_name}_1")
+    return AstrMessageEvent("hello", message_obj, meta, "g1")
+
+
+class FakePlatform:
+    def __init__(self, platform_id: str):
+        self.platform_id = platform_id
+        self.received: list[AstrBotMessage] = []
+
+    def meta(self):
+        return PlatformMetadata(name="aiocqhttp", description="", id=self.platform_id)
+
+    async def handle_msg(self, message_obj: AstrBotMessage):
+        self.received.append(message_obj)
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_spool_module, "SPOOL_REPLAY_DELAY", 0)
+    return EventSpool(str(tmp_path / "event_spool.json"))
+
+
+@pytest.mark.asyncio
+async def test_save_and_replay(spool: EventSpool):
+    assert spool.save([make_event("aiocqhttp", {"post_type": "message"})]) == 1
+    # 暂存文件是 JSON, 追加保存不会覆盖之前的事件
+    assert spool.save([make_event("aiocqhttp", RawConnection())]) == 1
+    with open(spool.path, encoding="utf-8") as f:
+        assert len(json.load(f)["events"]) == 2
+
+    platform = FakePlatform("aiocqhttp_1")
+    assert await spool.replay([platform]) == 2
+    assert not spool.pop_all()
+
+    message_obj = platform.received[0]
+    assert message_obj.type == MessageType.GROUP_MESSAGE
+    assert message_obj.group_id == "g1"
+    assert message_obj.group.members[0].nickname == "a"
+    assert message_obj.sender.user_id == "u1"
+    assert message_obj.message_str == "hello"
+    assert message_obj.raw_message == {"post_type": "message"}
+    at, reply, image = message_obj.message
+    assert isinstance(at, At) and at.qq == "bot"
+    assert isinstance(reply, Reply) and reply.sender_id == "u2"
+    assert isinstance(reply.chain[0], Image)
+    assert reply.chain[0].file == "base64://aGVsbG8="
+    assert isinstance(image, Image) and image.file == "base64://d29ybGQ="
+    # 无法序列化的原始消息对象会被去掉
+    assert platform.received[1].raw_message is None
+
+
+@pytest.mark.asyncio
+async def test_skip_platforms_requiring_raw_message(spool: EventSpool):
+    assert spool.save([make_event("discord"), make_event("lark")]) == 0
+    assert await spool.replay([FakePlatform("discord_1")]) == 0
+
+
+def test_expired_and_unknown_events_are_dropped(spool: EventSpool):
+    spool.save([make_event("aiocqhttp"), make_event("aiocqhttp")])
+    with open(spool.path, encoding="utf-8") as f:
+        data = json.load(f)
+    data["events"][0]["spooled_at"] -= 3600
+    data["events"][1]["message_obj"]["message"][0]["component"] = "NotAComponent"
+    with open(spool.path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    assert spool.pop_all(max_age=600) == []
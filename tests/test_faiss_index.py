@@ -0,0 +1,95 @@
+import json
+import numpy as np
+import pytest
+from astrbot.core.db.vec_db.faiss_impl.document_storage import DocumentStorage
+from astrbot.core.db.vec_db.faiss_impl.embedding_storage import EmbeddingStorage
+from astrbot.core.db.vec_db.faiss_impl.index_factory import (
+    INDEX_TYPES,
+    export_vectors,
+)
+
+DIMENSION = 16
+INDEX_PARAMS = {"nlist": 4, "nprobe": 4, "pq_m": 4, "pq_nbits": 4, "train_size": 64}
+
+
+def _vectors(n: int) -> np.ndarray:
+    vectors = np.random.default_rng(0).random((n, DIMENSION), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def _assert_search(storage: EmbeddingStorage, vectors, ids, live: set[int]):
+    exact = storage.current_index_type != "ivf_pq"
+    for vector, id in zip(vectors, ids):
+        _, indices = await storage.search(vector.reshape(1, -1).copy(), 5)
+        found = [int(i) for i in indices[0] if i >= 0]
+        assert found
+        assert set(found) <= live
+        if exact and id in live:
+            assert found[0] == id
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+async def test_insert_delete_search_compact(tmp_path, index_type):
+    storage = EmbeddingStorage(
+        DIMENSION,
+        str(tmp_path / "index.faiss"),
+        save_delay=0,
+        index_type=index_type,
+        index_params=INDEX_PARAMS,
+        compact_threshold=1.0,
+    )
+    await storage.initialize()
+    vectors = _vectors(200)
+    # 使用不连续的 ID, 以便发现内部编号与文档 ID 错位的问题
+    ids = [i * 7 + 3 for i in range(200)]
+    await storage.insert_batch(vectors, ids)
+    assert storage.current_index_type == index_type
+
+    await storage.delete(ids[:50])
+    live = set(ids[50:])
+    await _assert_search(storage, vectors, ids, live)
+
+    await storage.rebuild()
+    assert storage.current_index_type == index_type
+    assert set(export_vectors(storage.index)[1].tolist()) == live
+    await _assert_search(storage, vectors, ids, live)
+
+    # 压缩之后继续删除
+    await storage.delete(ids[50:100])
+    live = set(ids[100:])
+    await _assert_search(storage, vectors, ids, live)
+    assert storage.stats()["live_vectors"] == len(live)
+
+    # 从磁盘重新加载
+    await storage.checkpoint()
+    reloaded = EmbeddingStorage(
+        DIMENSION,
+        str(tmp_path / "index.faiss"),
+        index_type=index_type,
+        index_params=INDEX_PARAMS,
+    )
+    await reloaded.initialize()
+    assert reloaded.current_index_type == index_type
+    await _assert_search(reloaded, vectors, ids, live)
+
+
+@pytest.mark.asyncio
+async def test_metadata_filters(tmp_path):
+    storage = DocumentStorage(str(tmp_path / "doc.db"))
+    await storage.initialize()
+    for i, (file_name, user_id) in enumerate([("a", "u1"), ("b", "u1"), ("a", "u2")]):
+        await storage.connection.execute(
+            "INSERT INTO documents (doc_id, text, metadata) VALUES (?, ?, ?)",
+            (str(i), "text", json.dumps({"file-name": file_name, "user_id": user_id})),
+        )
+    await storage.connection.commit()
+
+    # 键不是合法的标识符时同样可以过滤, 并且查询时不会建立索引
+    assert await storage.get_ids_by_metadata({"file-name": "a"}) == [1, 3]
+    assert await storage.get_ids_by_metadata({"file-name": "a", "user_id": "u2"}) == [3]
+    async with storage.connection.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE name LIKE 'idx_documents_meta_%'"
+    ) as cursor:
+        assert (await cursor.fetchone())[0] == 0
+    await storage.close()
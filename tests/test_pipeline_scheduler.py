@@ -0,0 +1,140 @@
+import pytest
+from astrbot.core.message.message_event_result import MessageEventResult
+from astrbot.core.pipeline.scheduler import PipelineScheduler
+from astrbot.core.pipeline.stage import Stage
+from astrbot.core.platform.astr_message_event import AstrMessageEvent
+from astrbot.core.platform.astrbot_message import (
+    AstrBotMessage,
+    MessageMember,
+    MessageType,
+)
+from astrbot.core.platform.platform_metadata import PlatformMetadata
+
+
+def make_event() -> AstrMessageEvent:
+    abm = AstrBotMessage()
+    abm.type = MessageType.FRIEND_MESSAGE
+    abm.self_id = "bot"
+    abm.session_id = "test_sid"
+    abm.message_id = "1"
+    abm.sender = MessageMember(user_id="123456", nickname="tester")
+    abm.message = []
+    abm.message_str = "hi"
+    abm.raw_message = None
+    return AstrMessageEvent(
+        message_str="hi",
+        message_obj=abm,
+        platform_meta=PlatformMetadata("test_platform", "test"),
+        session_id="test_sid",
+    )
+
+
+class Check(Stage):
+    """普通阶段, stop 为 True 时终止事件"""
+
+    def __init__(self, log: list, stop: bool = False):
+        self.log = log
+        self.stop = stop
+
+    async def initialize(self, ctx):
+        pass
+
+    async def process(self, event):
+        self.log.append("check")
+        if self.stop:
+            event.stop_event()
+
+
+class Process(Stage):
+    """模拟插件 Handler: 设置结果后 yield, mode 决定如何终止事件"""
+
+    def __init__(self, log: list, mode: str | None = None):
+        self.log = log
+        self.mode = mode
+
+    async def initialize(self, ctx):
+        pass
+
+    async def process(self, event):
+        self.log.append("process")
+        if self.mode == "plain_result":
+            event.set_result(MessageEventResult().stop_event())
+        else:
+            event.set_result(MessageEventResult())
+            if self.mode == "stop_event":
+                event.stop_event()
+        yield
+        self.log.append("process post")
+
+
+class Decorate(Stage):
+    def __init__(self, log: list):
+        self.log = log
+
+    async def initialize(self, ctx):
+        pass
+
+    async def process(self, event):
+        if event.get_result() is not None:
+            self.log.append("decorate")
+        yield
+        self.log.append("decorate post")
+
+
+class Respond(Stage):
+    def __init__(self, log: list):
+        self.log = log
+
+    async def initialize(self, ctx):
+        pass
+
+    async def process(self, event):
+        if event.get_result() is not None:
+            self.log.append("send")
+            event.clear_result()
+
+
+def make_scheduler(*stages: Stage) -> PipelineScheduler:
+    scheduler = PipelineScheduler(None)
+    scheduler.stages = list(stages)
+    scheduler._compile()
+    return scheduler
+
+
+@pytest.mark.asyncio
+async def test_onion_order():
+    log = []
+    scheduler = make_scheduler(Check(log), Process(log), Decorate(log), Respond(log))
+    await scheduler._process_stages(make_event())
+    assert log == [
+        "check",
+        "process",
+        "decorate",
+        "send",
+        "decorate post",
+        "process post",
+        # 与逐层递归一致, 生成器结束后会继续执行它之后的阶段
+        "decorate post",
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["plain_result", "stop_event"])
+async def test_stopped_result_is_still_sent(mode):
+    log = []
+    scheduler = make_scheduler(
+        Check(log), Process(log, mode), Decorate(log), Respond(log)
+    )
+    await scheduler._process_stages(make_event())
+    # 事件已终止, 生成器阶段不再执行后置处理
+    assert log == ["check", "process", "decorate", "send"]
+
+
+@pytest.mark.asyncio
+async def test_plain_stage_stop_skips_later_stages():
+    log = []
+    scheduler = make_scheduler(
+        Check(log, stop=True), Process(log), Decorate(log), Respond(log)
+    )
+    await scheduler._process_stages(make_event())
+    assert log == ["check"]
@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from astrbot.core.db.po import Preference
+from astrbot.core.utils.shared_preferences import SharedPreferences
+
+
+class FakePreferenceDB:
+    """只实现 SharedPreferences 用到的接口的内存数据库, 可以阻塞写入"""
+
+    def __init__(self):
+        self.data: dict[tuple, dict] = {}
+        self.reads = 0
+        self.write_gate = asyncio.Event()
+        self.write_gate.set()
+
+    async def get_preference(self, scope, scope_id, key):
+        self.reads += 1
+        value = self.data.get((scope, scope_id, key))
+        if value is None:
+            return None
+        return Preference(scope=scope, scope_id=scope_id, key=key, value=value)
+
+    async def insert_preference_or_update(self, scope, scope_id, key, value):
+        await self.write_gate.wait()
+        self.data[(scope, scope_id, key)] = value
+
+    async def remove_preference(self, scope, scope_id, key):
+        await self.write_gate.wait()
+        self.data.pop((scope, scope_id, key), None)
+
+
+@pytest.mark.asyncio
+async def test_evicted_key_is_not_recached_stale_during_flush(tmp_path):
+    db = FakePreferenceDB()
+    db.data[("global", "global", "a")] = {"val": "old"}
+    sp = SharedPreferences(db, str(tmp_path / "sp.json"), cache_size=1)
+
+    await sp.global_put("a", "new")
+    db.write_gate.clear()
+    flush = asyncio.create_task(sp.flush())
+    await asyncio.sleep(0)
+    # 写入数据库期间, "a" 被挤出缓存
+    await sp.global_get("b")
+    assert await sp.global_get("a") == "new"
+
+    db.write_gate.set()
+    await flush
+    assert db.data[("global", "global", "a")] == {"val": "new"}
+    assert await sp.global_get("a") == "new"
+
+
+@pytest.mark.asyncio
+async def test_read_during_write_does_not_cache_old_value(tmp_path):
+    db = FakePreferenceDB()
+    db.data[("global", "global", "a")] = {"val": "old"}
+    sp = SharedPreferences(db, str(tmp_path / "sp.json"))
+
+    read = asyncio.create_task(sp.global_get("a"))
+    await sp.global_put("a", "new")
+    await sp.flush()
+    await read
+    assert await sp.global_get("a") == "new"
+
+
+@pytest.mark.asyncio
+async def test_none_value_is_cached(tmp_path):
+    db = FakePreferenceDB()
+    db.data[("global", "global", "a")] = {"val": None}
+    sp = SharedPreferences(db, str(tmp_path / "sp.json"))
+
+    assert await sp.global_get("a", "default") is None
+    assert await sp.global_get("a", "default") is None
+    assert db.reads == 1
+
+
+@pytest.mark.asyncio
+async def test_sync_put_during_flush_is_not_overwritten(tmp_path):
+    db = FakePreferenceDB()
+    sp = SharedPreferences(db, str(tmp_path / "sp.json"), flush_interval=0.01)
+
+    await sp.global_put("a", "old")
+    db.write_gate.clear()
+    flush = asyncio.create_task(sp.flush())
+    await asyncio.sleep(0)
+    # 批量写入已经取得了旧值, 此时通过已弃用的同步接口写入新值
+    await asyncio.to_thread(sp.put, "a", "new", "global", "global")
+    assert await sp.global_get("a") == "new"
+
+    db.write_gate.set()
+    await flush
+    await sp.flush()
+    assert db.data[("global", "global", "a")] == {"val": "new"}
+    assert await sp.global_get("a") == "new"
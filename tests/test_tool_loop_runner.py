@@ -0,0 +1,147 @@
+import asyncio
+import base64
+import mcp
+import pytest
+from types import SimpleNamespace
+from astrbot.core.agent.hooks import BaseAgentRunHooks
+from astrbot.core.agent.run_context import ContextWrapper
+from astrbot.core.agent.runners.tool_loop_agent_runner import ToolLoopAgentRunner
+from astrbot.core.agent.tool import FunctionTool, ToolSet
+from astrbot.core.agent.tool_executor import BaseFunctionToolExecutor
+from astrbot.core.provider.entities import LLMResponse, ProviderRequest
+
+
+class SleepExecutor(BaseFunctionToolExecutor):
+    """等待 delay 秒后把工具名作为图片数据返回, 并记录开始与结束的顺序"""
+
+    log: list[str] = []
+
+    @classmethod
+    async def execute(cls, tool, run_context, **tool_args):
+        cls.log.append(f"start {tool.name}")
+        await asyncio.sleep(tool_args["delay"])
+        cls.log.append(f"end {tool.name}")
+        data = base64.b64encode(tool.name.encode()).decode()
+        yield mcp.types.CallToolResult(
+            content=[
+                mcp.types.ImageContent(type="image", data=data, mimeType="image/png")
+            ]
+        )
+
+
+class FakeEvent:
+    def __init__(self):
+        self.result = None
+
+    def set_result(self, result):
+        self.result = result
+
+    def get_result(self):
+        return self.result
+
+    def clear_result(self):
+        self.result = None
+
+
+async def run_tools(tools: list[FunctionTool], delays: list[float], **kwargs):
+    SleepExecutor.log = []
+    runner = ToolLoopAgentRunner()
+    req = ProviderRequest(prompt="", func_tool=ToolSet(tools))
+    await runner.reset(
+        provider=SimpleNamespace(),
+        request=req,
+        run_context=ContextWrapper(context=None, event=FakeEvent()),
+        tool_executor=SleepExecutor,
+        agent_hooks=BaseAgentRunHooks(),
+        **kwargs,
+    )
+    llm_response = LLMResponse(
+        role="assistant",
+        tools_call_name=[tool.name for tool in tools],
+        tools_call_args=[{"delay": delay} for delay in delays],
+        tools_call_ids=[f"call_{tool.name}" for tool in tools],
+    )
+    outputs = [item async for item in runner._handle_function_tools(req, llm_response)]
+    # 发送给用户的消息, 还原为工具名
+    messages = [
+        base64.b64decode(item.chain[0].file.removeprefix("base64://")).decode()
+        for item in outputs[:-1]
+    ]
+    return messages, outputs[-1]
+
+
+def make_tool(name: str, parallel: bool) -> FunctionTool:
+    return FunctionTool(name=name, parameters={}, description="", parallel=parallel)
+
+
+@pytest.mark.asyncio
+async def test_parallel_tools_keep_call_order_in_results():
+    tools = [make_tool(name, True) for name in ("a", "b", "c")]
+    messages, blocks = await run_tools(tools, [0.2, 0.1, 0.0], tool_call_concurrency=4)
+    # 发送给用户的消息按照完成顺序, 返回给模型的结果按照调用顺序
+    assert messages == ["c", "b", "a"]
+    assert [b.tool_call_id for b in blocks] == ["call_a", "call_b", "call_c"]
+    assert SleepExecutor.log[:3] == ["start a", "start b", "start c"]
+
+
+@pytest.mark.asyncio
+async def test_local_tools_run_one_by_one_by_default():
+    tools = [FunctionTool(name=name, parameters={}, description="") for name in "ab"]
+    messages, blocks = await run_tools(tools, [0.1, 0.0], tool_call_concurrency=4)
+    assert SleepExecutor.log == ["start a", "end a", "start b", "end b"]
+    assert messages == ["a", "b"]
+    assert [b.tool_call_id for b in blocks] == ["call_a", "call_b"]
+
+
+@pytest.mark.asyncio
+async def test_non_parallel_tool_waits_for_earlier_batch():
+    tools = [make_tool("a", True), make_tool("b", True), make_tool("c", False)]
+    await run_tools(tools, [0.1, 0.0, 0.0], tool_call_concurrency=4)
+    assert SleepExecutor.log.index("start c") > SleepExecutor.log.index("end a")
+
+
+@pytest.mark.asyncio
+async def test_tool_call_timeout():
+    tools = [make_tool("slow", True), make_tool("fast", True)]
+    messages, blocks = await run_tools(
+        tools, [5, 0.0], tool_call_concurrency=4, tool_call_timeout=0.1
+    )
+    assert messages == ["fast"]
+    assert blocks[0].tool_call_id == "call_slow"
+    assert "timed out" in blocks[0].content
+    assert blocks[1].tool_call_id == "call_fast"
+    assert "timed out" not in blocks[1].content
+
+
+class DirectSendExecutor(BaseFunctionToolExecutor):
+    """工具 set 只设置事件结果; 工具 send 请求把事件结果直接发送给用户"""
+
+    @classmethod
+    async def execute(cls, tool, run_context, **tool_args):
+        if tool.name == "set":
+            run_context.event.set_result(SimpleNamespace(chain=["leaked"]))
+            return
+        yield None
+
+
+@pytest.mark.asyncio
+async def test_sequential_tool_result_does_not_leak_into_next_tool():
+    tools = [make_tool("set", False), make_tool("send", False)]
+    runner = ToolLoopAgentRunner()
+    req = ProviderRequest(prompt="", func_tool=ToolSet(tools))
+    await runner.reset(
+        provider=SimpleNamespace(),
+        request=req,
+        run_context=ContextWrapper(context=None, event=FakeEvent()),
+        tool_executor=DirectSendExecutor,
+        agent_hooks=BaseAgentRunHooks(),
+        tool_call_concurrency=4,
+    )
+    llm_response = LLMResponse(
+        role="assistant",
+        tools_call_name=["set", "send"],
+        tools_call_args=[{}, {}],
+        tools_call_ids=["call_set", "call_send"],
+    )
+    outputs = [item async for item in runner._handle_function_tools(req, llm_response)]
+    assert outputs == []